@@ -1,12 +1,31 @@
+import functools
 import io
+import os
+import time
+import uuid
+from datetime import date
 import pandas as pd
-import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, date
-import base64
-import streamlit.components.v1 as components
+
+from eps_calculo import (
+    COLS_AGREGACAO, COLS_PAINEL, DEFAULT_DATA_LIMITE_UI, DEFAULT_META_PCT, METODOS_META, NIVEIS_META, REGRAS_DEDUP,
+    CacheLRU, CuboEps, IndiceGrupos, agregar_em_blocos, alocar_meta_hierarquica, aplicar_delta, carregar_dados,
+    carregar_varios, colunas_meta, combinar_hashes, comparar_datasets, hash_conteudo, indice_matriculas,
+    ler_pendentes_em_blocos, limite_calculo, limites_periodicos, preparar_df, primeira_dependencia,
+    relatorio_memoria, resumir_meta, rotulo_meta, tabela_meta, varrer_datas_limite, varrer_em_blocos
+)
+from eps_exportacao import (
+    FORMATOS_DADOS, MIME_XLSX, MIME_ZIP, _sanitize_filename, _sanitize_sheet_title, escrever_xlsx, exportar_dados,
+    exportar_por_prefixo, formato_disponivel, xlsx_rapido
+)
+from eps_graficos import barras_prefixo_base, destacar_barra, donut_eps_plotly, selecionar_barras
+from eps_perfil import Perfilador, perfil_ligado
+from eps_relatorio import kaleido_disponivel, relatorio_zip
+from eps_snapshots import abrir_snapshot, listar_snapshots, rotulo_snapshot, salvar_snapshot, snapshots_disponiveis
+from eps_tarefas import ERRO, PRONTA, GerenciadorTarefas
+
+_INICIO_EXECUCAO = time.perf_counter()
 
 # =========================
 # Configuração da página
@@ -17,6 +36,18 @@ st.set_page_config(
     layout="wide"
 )
 
+# Perfil de desempenho (opcional): ?perfil=1 na URL ou EPS_PERFIL=1. Um perfilador por sessão,
+# para as seções reexecutadas sozinhas (fragmentos) também entrarem no histórico.
+if "perfil" not in st.session_state:
+    st.session_state["perfil"] = Perfilador()
+perfil = st.session_state["perfil"]
+perfil.ativo = perfil_ligado(st.query_params.get("perfil"))
+perfil.nova_execucao()
+
+# Identifica a sessão no cache compartilhado (o dataset que ela usa não é despejado primeiro)
+if "id_sessao" not in st.session_state:
+    st.session_state["id_sessao"] = uuid.uuid4().hex
+
 # Oculta menu, footer, barra superior do Streamlit Cloud e qualquer badge/link do GitHub
 # HIDE_DECORATIONS = """
 # <style>
@@ -31,15 +62,38 @@ st.set_page_config(
 # """
 # st.markdown(HIDE_DECORATIONS, unsafe_allow_html=True)
 
-# Defaults (UI x Cálculo)
-# Defaults (UI x Cálculo base)
-DEFAULT_DATA_LIMITE_UI = date(2026, 6, 30)     # o que APARECE para o usuário
+# Defaults (UI x Cálculo) – a data-limite padrão vem do eps_calculo
 DEFAULT_TOP_N = 44
 
+# Orçamento (em MB) do cache de dados já interpretados – compartilhado entre reruns
+CACHE_MAX_MB = int(os.environ.get("EPS_CACHE_MAX_MB", "512"))
+
+# Leitura em blocos: ligada por padrão para arquivos a partir deste tamanho (MB)
+BLOCOS_MIN_MB = float(os.environ.get("EPS_BLOCOS_MIN_MB", "200"))
+
 # =========================
 # Upload (apenas CSV) – ÚNICO ITEM DA SIDEBAR ANTES DO UPLOAD
 # =========================
-uploaded = st.sidebar.file_uploader("Faça upload do arquivo (CSV)", type=["csv"])
+# Vários arquivos (ex.: um por Ajure) são juntados num só dataset; lista vazia = sem upload
+uploaded = st.sidebar.file_uploader(
+    "Faça upload dos arquivos (CSV)", type=["csv"], accept_multiple_files=True
+) or None
+n_arquivos = len(uploaded) if uploaded else 0
+
+# Sem upload, dá para reabrir um snapshot salvo antes (Arrow por memory-map, sem reler o CSV)
+snapshot = None
+if uploaded is None and snapshots_disponiveis():
+    lista_snapshots = listar_snapshots()
+    if len(lista_snapshots):
+        rotulos_snapshots = {r["caminho"]: rotulo_snapshot(r) for _, r in lista_snapshots.iterrows()}
+        caminho_snapshot = st.sidebar.selectbox(
+            "Ou abra um snapshot salvo",
+            [None] + list(rotulos_snapshots),
+            format_func=lambda c: "—" if c is None else rotulos_snapshots[c]
+        )
+        if caminho_snapshot is not None:
+            snapshot = lista_snapshots.set_index("caminho", drop=False).loc[caminho_snapshot]
+tem_dados = uploaded is not None or snapshot is not None
 
 # Variáveis que serão definidas conforme o estado do upload
 top_n = DEFAULT_TOP_N
@@ -47,7 +101,7 @@ top_n = DEFAULT_TOP_N
 # =========================
 # Sidebar: controles adicionais SÓ APÓS O UPLOAD
 # =========================
-if uploaded is not None:
+if tem_dados:
     st.sidebar.markdown("## 📌 Seções do Dashboard")
     st.sidebar.markdown("""
     📊<a href="#visao-geral" target="_self">Visão Geral</a><br>
@@ -55,7 +109,9 @@ if uploaded is not None:
     🔎<a href="#consulta-uor" target="_self">Consulta por UOR</a><br>
     ⬇️<a href="#downloads" target="_self">Downloads</a><br>
     🏷️<a href="#percentual-prefixo" target="_self">Gráfico de barras</a><br>
+    📈<a href="#curva-datas" target="_self">Curva por data-limite</a><br>
     🧮<a href="#meta-90" target="_self">Tabelas</a><br>
+    📉<a href="#evolucao" target="_self">Evolução</a><br>
     """, unsafe_allow_html=True)
 
     # 👇 Data exibida (somente UI). Não será usada para cálculo.
@@ -71,242 +127,164 @@ if uploaded is not None:
         "Qtde. de Prefixos no gráfico", min_value=1, max_value=200,
         value=DEFAULT_TOP_N, step=1
     )
+
+    # Snapshot já abre por memory-map: leitura em blocos não se aplica
+    modo_blocos = uploaded is not None and st.sidebar.toggle(
+        "Leitura em blocos (arquivos muito grandes)",
+        value=sum(getattr(f, "size", 0) for f in uploaded) >= BLOCOS_MIN_MB * 1024 * 1024,
+        help="Lê o CSV aos poucos e guarda só as contagens por Ajure/Prefixo/UOR/Cargo. "
+             "As linhas pendentes só são lidas quando uma tabela ou download precisa delas."
+    )
+
+    # Mesma Matricula em mais de um registro (ex.: funcionário que mudou de Ajure entre as exportações)
+    regra_dedup = REGRAS_DEDUP[-1]
+    if n_arquivos > 1:
+        regra_dedup = st.sidebar.selectbox(
+            "Matrícula repetida: manter o registro de",
+            REGRAS_DEDUP,
+            index=0,
+            disabled=modo_blocos,
+            help="Os arquivos são lidos em paralelo e juntados na ordem do upload. "
+                 "Na leitura em blocos não há deduplicação."
+        )
+
+    # Correções pontuais aplicadas sobre o dataset aberto, sem reler nem recontar o arquivo inteiro
+    correcoes = st.sidebar.file_uploader(
+        "Correções (CSV delta, por Matrícula)",
+        type=["csv"],
+        key="correcoes",
+        disabled=modo_blocos,
+        help="CSV no mesmo formato, só com as linhas corrigidas ou novas: cada Matrícula substitui o "
+             "registro atual ou entra como nova. Totais, pendentes e meta são atualizados só com essas linhas."
+    )
 else:
     # Antes do upload, mantenha defaults
     data_limite_ui = DEFAULT_DATA_LIMITE_UI
     top_n = DEFAULT_TOP_N
+    modo_blocos = False
+    regra_dedup = REGRAS_DEDUP[-1]
+    correcoes = None
 
 # =========================
 # Funções utilitárias
 # =========================
-COLS = ["Matricula", "Nome_Funcionario", "Avaliavel", "Data_Ultimo_Eps", "Situacao_Eps",
-        "Dias_Para_Vencimento", "Status_Indicador", "Cargo", "Prefixo", "Dependencia",
-        "Codigo_Uor", "Uor", "Prefixo_Ajure", "Ajure"]
-
-def carregar_dados(file_like, encoding="utf-8", sep=","):
-    df = pd.read_csv(file_like, header=None, names=COLS, encoding=encoding, sep=sep)
-    return df
-
-def preparar_df(df: pd.DataFrame):
-    df["Data_Ultimo_Eps"] = pd.to_datetime(df["Data_Ultimo_Eps"], dayfirst=True, errors="coerce")
-    return df
-
-def download_button_blob(label: str, data_bytes: bytes, filename: str,
-                         mime: str = "application/octet-stream",
-                         use_container_width: bool = True, key: str = "dl_blob"):
+@st.cache_resource
+def _cache_dados() -> CacheLRU:
+    # Uma única instância por processo: sobrevive aos reruns e é compartilhada entre as sessões,
+    # então vários usuários com o mesmo arquivo usam um só dataset (e os mesmos agregados)
+    return CacheLRU(CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def _tarefas() -> GerenciadorTarefas:
+    # Também uma por processo: duas sessões pedindo o mesmo arquivo acompanham a mesma tarefa
+    return GerenciadorTarefas()
+
+def hash_upload(arquivos, *extras) -> str:
     """
-    Renderiza um botão (estilo nativo) que força download via Blob,
-    garantindo o nome de arquivo e alta compatibilidade.
+    Hash dos arquivos enviados (combinar_hashes). O hash de cada arquivo fica guardado na sessão
+    pelo file_id, então um rerun não relê nem re-hasheia o upload.
     """
-    b64 = base64.b64encode(data_bytes).decode("utf-8")
-    width_style = "width: 100%;" if use_container_width else ""
-    # Estilo neutro (cinza), sem vermelho
-    html = f"""
-    <button id="{key}" style="padding:0.6rem 1rem; {width_style}
-                              border:1px solid #c7c7c7; border-radius:0.5rem;
-                              background:#f4f4f4; color:#222; font-weight:600; cursor:pointer;">
-      {label}
-    </button>
-    <script>
-    (function(){{
-      const btn = document.getElementById("{key}");
-      if (!btn) return;
-      btn.addEventListener("click", function(){{
-        const b64 = "{b64}";
-        const mime = "{mime}";
-        const filename = "{filename}";
-        const binary = atob(b64);
-        const len = binary.length;
-        const bytes = new Uint8Array(len);
-        for (let i = 0; i < len; i++) bytes[i] = binary.charCodeAt(i);
-        const blob = new Blob([bytes], {{type: mime}});
-        const url = URL.createObjectURL(blob);
-        const a = document.createElement("a");
-        a.href = url;
-        a.download = filename;
-        document.body.appendChild(a);
-        a.click();
-        a.remove();
-        setTimeout(() => URL.revokeObjectURL(url), 1000);
-      }});
-    }})();
-    </script>
+    memo = st.session_state.setdefault("hash_uploads", {})
+    hashes = []
+    for f in arquivos:
+        chave = (getattr(f, "file_id", None) or f.name, f.size)
+        if chave not in memo:
+            memo[chave] = hash_conteudo(f.getvalue())
+        hashes.append(memo[chave])
+    return combinar_hashes(hashes, *extras)
+
+def carregar_dados_cache(arquivos, regra=REGRAS_DEDUP[-1], encoding="utf-8", sep=","):
     """
-    components.html(html, height=60)
-
-def mapear_para_2025(d_ui: date) -> date:
+    carregar_varios (leitura paralela + preparar_df + deduplicação) com cache chaveado pelo hash
+    dos bytes enviados, pela regra de deduplicação e pelas opções de leitura.
+    Retorna (df, relatorio_de_memoria, resumo_dos_arquivos, hash_do_dataset).
     """
-    Recebe a data exibida (UI), normalmente em 2026,
-    e retorna a MESMA data em 2025 (mesmo dia e mês).
-    Se a data for 29/02, ajusta para 28/02/2025 (já que 2025 não é bissexto).
+    # Com um arquivo só a regra não muda nada (não há deduplicação)
+    hash_arquivo = hash_upload(arquivos, *([regra] if len(arquivos) > 1 else []))
+    chave = (hash_arquivo, "carregar+preparar", encoding, sep)
+
+    def _gerar():
+        with perfil.etapa(f"Leitura e datas ({len(arquivos)} arquivo(s))") as etapa:
+            df, resumo = carregar_varios((f.getvalue() for f in arquivos), encoding=encoding, sep=sep, regra=regra)
+            etapa["linhas"] = len(df)
+        # Fases medidas dentro do carregar_varios (com vários arquivos, soma do tempo de cada um)
+        linhas = sum(resumo["linhas_por_arquivo"])
+        perfil.registrar("Leitura do CSV", sum(resumo["segundos_leitura"]), linhas)
+        perfil.registrar("Datas (preparar_df)", sum(resumo["segundos_datas"]), linhas)
+        if len(arquivos) > 1:
+            perfil.registrar("Junção e deduplicação", resumo["segundos_deduplicacao"], len(df))
+        return df, relatorio_memoria(df), resumo
+
+    with perfil.etapa("Dados prontos (cache ou leitura)") as etapa:
+        df, relatorio, resumo = _cache_dados().obter(chave, _gerar)
+        etapa["linhas"] = len(df)
+    return df, relatorio, resumo, hash_arquivo
+
+def abrir_snapshot_cache(registro, colunas=None):
     """
-    try:
-        return date(2025, d_ui.month, d_ui.day)
-    except ValueError:
-        # Caso típico: 29/02 -> 28/02
-        if d_ui.month == 2 and d_ui.day == 29:
-            return date(2025, 2, 28)
-        # Se quiser outra política (ex.: 01/03), troque a linha acima por:
-        # return date(2025, 3, 1)
-        raise
-
-def donut_eps_plotly(
-    porcentagem, 
-    filtro_atual="Todos",
-    cor_precisam="#e72914", 
-    cor_nao_precisam="#0fe267"
-):
-    if filtro_atual == "Todos":
-        filtro_texto = "Geral"
+    abrir_snapshot no cache compartilhado, sob o mesmo hash do upload que gerou o snapshot
+    (o dataset e os agregados são os mesmos). Mesmo retorno de carregar_dados_cache.
+    Com `colunas`, abre só elas (ex.: COLS_PAINEL), numa entrada de cache separada.
+    """
+    hash_arquivo = registro["hash"]
+    if colunas is None:
+        chave = (hash_arquivo, "carregar+preparar", "utf-8", ",")
     else:
-        filtro_texto = str(filtro_atual)
-
-    fig = go.Figure(data=[go.Pie(
-        labels=["Precisam fazer", f"Vencem até {data_limite_ui.strftime('%d/%m')}"],
-        values=[porcentagem, 100 - porcentagem],
-        hole=0.6,
-        sort=False,
-        direction="clockwise",
-        marker=dict(colors=[cor_precisam, cor_nao_precisam], line=dict(color="#7c7c7c", width=2)),
-        textfont_size=18,
-        hoverinfo="label+percent"
-    )])
-
-    fig.update_layout(
-        title=f"Percentual de pessoas que precisam fazer o EPS até {data_limite_ui.strftime('%d/%m/%Y')}",
-        template="plotly_white",
-        height=500,
-        annotations=[
-            dict(
-                text=filtro_texto,
-                x=0.5, y=0.5,
-                showarrow=False,
-                font=dict(size=30, color="#7c7c7c", family="Source Sans")
-            )
-        ],
-        margin=dict(l=40, r=40, t=60, b=40)
-    )
-    return fig
-
-def barras_prefixo_plotly_gradiente(
-    porc_por_prefixo: pd.Series,
-    top_n: int = 40,
-    tema: str = "plotly_white",
-    prefixo_destacar=None,
-    ensure_visible: bool = True,
-):
-    serie = porc_por_prefixo.copy()
-
-    def _label(x):
-        return "NA" if pd.isna(x) else str(x)
-
-    labels_series = pd.Series(serie.index, index=serie.index).apply(_label)
-
-    top_n = max(1, int(top_n))
-    base = serie.sort_values(ascending=True).tail(top_n)
-
-    alvo_label = None
-    if prefixo_destacar is not None and prefixo_destacar != "Todos":
-        alvo_label = "NA" if (isinstance(prefixo_destacar, float) and pd.isna(prefixo_destacar)) or prefixo_destacar == "NA" \
-                     else str(prefixo_destacar)
-
-        if ensure_visible:
-            match = labels_series[labels_series == alvo_label]
-            if not match.empty:
-                raw_idx = match.index[0]
-                if raw_idx not in base.index:
-                    base = pd.concat([base, serie.loc[[raw_idx]]])
-                    base = base[~base.index.duplicated(keep="last")]
-                    base = base.sort_values(ascending=True).tail(min(top_n, base.shape[0]))
-            else:
-                alvo_label = None
-        else:
-            labels_base = base.index.to_series().apply(_label)
-            if alvo_label not in labels_base.values:
-                alvo_label = None
-
-    df_plot = pd.DataFrame({
-        "Prefixo_raw": base.index,
-        "Prefixo": base.index.to_series().apply(_label),
-        "Porcentagem": base.values
-    }).reset_index(drop=True)
-
-    n = len(df_plot)
-    altura = max(420, int(30 * n))
-
-    fig = px.bar(
-        df_plot,
-        x="Porcentagem",
-        y="Prefixo",
-        orientation="h",
-        color="Porcentagem",
-        color_continuous_scale="Plasma_r",
-        text="Porcentagem"
-    )
+        chave = (hash_arquivo, "snapshot", tuple(colunas))
 
-    fig.update_layout(
-        template=tema,
-        height=altura,
-        title=dict(text="Percentual pendente por Prefixo", x=0.5),
-        xaxis=dict(
-            title="Porcentagem",
-            range=[0, 100],
-            ticksuffix="%",
-            showgrid=True,
-            gridcolor="rgba(0,0,0,0.12)",
-            gridwidth=1,
-            zeroline=False
-        ),
-        yaxis=dict(
-            title="Prefixo",
-            categoryorder="array",
-            categoryarray=df_plot["Prefixo"].tolist(),
-            showgrid=True,
-            gridcolor="rgba(0,0,0,0.08)",
-            gridwidth=1
-        ),
-        bargap=0.25,
-        margin=dict(l=90, r=150, t=60, b=40),
-        coloraxis_colorbar=dict(title="%", ticksuffix="%"),
-        showlegend=False
-    )
+    def _gerar():
+        with perfil.etapa("Abrir snapshot (memory-map)") as etapa:
+            df = abrir_snapshot(registro["caminho"], colunas)
+            etapa["linhas"] = len(df)
+        return df, relatorio_memoria(df), {"linhas_por_arquivo": [len(df)], "removidas": 0, "regra": None}
 
-    fig.update_traces(
-        texttemplate="%{x:.1f}%",
-        textposition="outside",
-        cliponaxis=False
-    )
+    with perfil.etapa("Dados prontos (cache ou leitura)") as etapa:
+        df, relatorio, resumo = _cache_dados().obter(chave, _gerar)
+        etapa["linhas"] = len(df)
+    return df, relatorio, resumo, hash_arquivo
 
-    default_line = "#7c7c7c" if tema != "plotly_dark" else "rgba(255,255,255,0.6)"
-    line_colors = [default_line] * n
-    line_widths = [1.2] * n
-
-    if alvo_label is not None:
-        mask = (df_plot["Prefixo"] == alvo_label).values
-        if mask.any():
-            import numpy as _np
-            pos = int(_np.flatnonzero(mask)[0])
-            line_colors[pos] = "#00ff00"
-            line_widths[pos] = 3
-
-    fig.update_traces(marker_line_color=line_colors, marker_line_width=line_widths)
-    return fig
-
-def calcular_porcentagem_eps(dados: pd.DataFrame, dados_antes: pd.DataFrame, prefixo_escolhido=None):
-    if prefixo_escolhido is None or prefixo_escolhido == "Todos":
-        total = len(dados)
-        qtd_antes = len(dados_antes)
-    else:
-        total = (dados["Prefixo"].astype(str) == str(prefixo_escolhido)).sum()
-        qtd_antes = (dados_antes["Prefixo"].astype(str) == str(prefixo_escolhido)).sum()
+def aplicar_correcoes_cache(dados_base, hash_base: str, correcoes):
+    """
+    aplicar_delta com cache: o dataset corrigido fica sob um hash próprio (base + correções), e o índice
+    de matrículas da base também fica no cache (só a primeira correção de cada dataset o monta).
+    Retorna (df, relatorio_de_memoria, info_da_correcao, hash_do_dataset_corrigido).
+    """
+    hash_corrigido = hash_upload([correcoes], hash_base, "correcoes")
+
+    def _gerar():
+        with perfil.etapa("Correções (delta)") as etapa:
+            posicoes = _cache_dados().obter((hash_base, "matriculas"), lambda: indice_matriculas(dados_base))
+            delta = preparar_df(carregar_dados(io.BytesIO(correcoes.getvalue())))
+            df, info = aplicar_delta(dados_base, delta, posicoes)
+            etapa["linhas"] = len(delta)
+        return df, relatorio_memoria(df), info
 
-    porcentagem = (qtd_antes / total * 100) if total > 0 else 0.0
-    return porcentagem, total, qtd_antes
+    df, relatorio, info = _cache_dados().obter((hash_corrigido, "carregar+preparar", "utf-8", ","), _gerar)
+    return df, relatorio, info, hash_corrigido
+
+def download_button_blob(label: str, data_bytes: bytes, filename: str,
+                         mime: str = "application/octet-stream",
+                         use_container_width: bool = True, key: str = "dl_blob"):
+    """
+    Renderiza um botão de download servido pelo próprio Streamlit (endpoint de mídia),
+    sem copiar o arquivo em base64 para dentro do HTML. O nome do arquivo vai no
+    cabeçalho Content-Disposition, então continua garantido.
+    on_click="ignore": baixar o arquivo não dispara um rerun da página.
+    """
+    st.download_button(
+        label=label,
+        data=data_bytes,
+        file_name=filename,
+        mime=mime,
+        key=key,
+        on_click="ignore",
+        use_container_width=use_container_width
+    )
 
 # =========================
 # Conteúdo principal
 # =========================
-if uploaded is None:
+if not tem_dados:
     # Cabeçalho e descrição só aparecem antes do upload
     st.title("📊 Dashboard EPS - Análise por Data e Prefixo")
     st.markdown("""
@@ -362,41 +340,275 @@ if uploaded is None:
                 st.markdown(f"<div class='passo-caption'>{caption}</div>", unsafe_allow_html=True)
                 st.image(url, use_container_width=True)
 
+    # Sem dataset (ex.: o upload foi removido): a sessão deixa de segurar o que usava no cache
+    _cache_dados().liberar_sessao(st.session_state["id_sessao"])
     st.info("⬅️ Faça upload do dados para começar. Lembre-se que eles devem estar no formato CSV.")
     st.stop()
 
 # === Daqui para baixo, SOMENTE quando há upload ===
-try:
-    if hasattr(uploaded, "seek"):
-        uploaded.seek(0)
-    dados = carregar_dados(uploaded, encoding="utf-8", sep=",")
-except Exception as e:
-    st.error(f"Erro ao carregar o CSV: {e}")
-    st.stop()
+# Timestamp usado para FILTRAR/CONTAR (cálculo real):
+# MESMO dia/mês da UI, porém em 2025
+limite = limite_calculo(data_limite_ui)
 
-if len(dados) == 0:
-    st.error("O DataFrame está vazio após o carregamento/limpeza.")
-    st.stop()
+if modo_blocos:
+    # Só contagens agregadas em memória; linhas pendentes são lidas sob demanda
+    try:
+        hash_arquivo = hash_upload(uploaded)
+        # Vários arquivos: cada leitura em blocos passa por um upload depois do outro (sem cópia juntada)
+        conteudos_csv = [f.getvalue() for f in uploaded]
+        def _cubo_em_blocos():
+            contagens_blocos, dep = agregar_em_blocos([io.BytesIO(c) for c in conteudos_csv], limite,
+                                                      encoding="utf-8", sep=",")
+            return CuboEps(contagens_blocos), dep
+
+        with perfil.etapa("Agregação em blocos (cache ou leitura)") as etapa:
+            cubo, tmp = _cache_dados().obter((hash_arquivo, "blocos", limite, "utf-8", ","), _cubo_em_blocos)
+            etapa["linhas"] = cubo.total
+    except Exception as e:
+        st.error(f"Erro ao carregar o CSV: {e}")
+        st.stop()
+
+    if cubo.total == 0:
+        st.error("O DataFrame está vazio após o carregamento/limpeza.")
+        st.stop()
+
+    dados = None
+    st.sidebar.caption("Leitura em blocos: somente contagens em memória.")
+    if correcoes is not None:
+        st.sidebar.warning("As correções não são aplicadas na leitura em blocos.")
+    if n_arquivos > 1:
+        st.sidebar.warning(
+            f"{n_arquivos} arquivos juntados sem deduplicação: na leitura em blocos, "
+            "uma Matrícula presente em mais de um arquivo é contada mais de uma vez."
+        )
+else:
+    try:
+        if snapshot is not None:
+            # Painel só com as colunas de grupo e a data; as listas abrem o resto (dados_completos)
+            dados, memoria_dados, resumo_arquivos, hash_arquivo = abrir_snapshot_cache(
+                snapshot, None if correcoes is not None else COLS_PAINEL
+            )
+        else:
+            dados, memoria_dados, resumo_arquivos, hash_arquivo = carregar_dados_cache(
+                uploaded, regra_dedup, encoding="utf-8", sep=","
+            )
+    except Exception as e:
+        st.error(f"Erro ao carregar o CSV: {e}")
+        st.stop()
+
+    # O dataset original continua no cache (outras sessões, ou outra correção sobre ele)
+    correcao = None
+    if correcoes is not None:
+        dados_base, hash_base = dados, hash_arquivo
+        try:
+            dados, memoria_dados, correcao, hash_arquivo = aplicar_correcoes_cache(dados_base, hash_base, correcoes)
+        except Exception as e:
+            st.error(f"Erro ao aplicar as correções: {e}")
+            st.stop()
+
+    if len(dados) == 0:
+        st.error("O DataFrame está vazio após o carregamento/limpeza.")
+        st.stop()
+
+    def dados_completos() -> pd.DataFrame:
+        """`dados` com todas as colunas, para exportações e comparação (mesmas linhas, mesma ordem)."""
+        if snapshot is None or correcao is not None:
+            return dados
+        return abrir_snapshot_cache(snapshot)[0]
+
+    def linhas_completas(posicoes) -> pd.DataFrame:
+        """Só as linhas `posicoes` com todas as colunas: do snapshot, converte só elas (lista da UOR)."""
+        if snapshot is None or correcao is not None:
+            return dados.iloc[posicoes]
+        return abrir_snapshot(snapshot["caminho"], linhas=posicoes)
+
+    def gerar_indice():
+        if correcao is None:
+            return IndiceGrupos(dados)
+        # Com correções, índice e cubo saem dos da base, refazendo só os grupos das linhas corrigidas
+        base = _cache_dados().obter((hash_base, "indice"), lambda: IndiceGrupos(dados_base))
+        return base.com_delta(len(dados), correcao["linhas_saiu"], correcao["saiu"],
+                              correcao["linhas_entrou"], correcao["entrou"])
+
+    def gerar_cubo():
+        if correcao is None:
+            return CuboEps.de_dados(dados, limite)
+        base = _cache_dados().obter((hash_base, "cubo", limite), lambda: CuboEps.de_dados(dados_base, limite))
+        return base.com_delta(correcao["saiu"], correcao["entrou"], limite)
+
+    # Índice de grupos: um por dataset; máscara de pendentes e cubo de contagens: um por data-limite
+    with perfil.etapa("Índice de grupos", linhas=len(dados)):
+        indice = _cache_dados().obter((hash_arquivo, "indice"), gerar_indice)
+    with perfil.etapa("Filtro da data-limite", linhas=len(dados)):
+        pendente = _cache_dados().obter(
+            (hash_arquivo, "pendente", limite),
+            lambda: (dados["Data_Ultimo_Eps"] < limite).to_numpy()
+        )
+    with perfil.etapa("Cubo de agregação", linhas=len(dados)):
+        cubo = _cache_dados().obter((hash_arquivo, "cubo", limite), gerar_cubo)
 
-dados = preparar_df(dados)
+    tmp = primeira_dependencia(dados)
 
-# Data-limite de cálculo = MESMO dia/mês da UI, porém em 2025
-data_limite_calc = mapear_para_2025(data_limite_ui)
+    st.sidebar.caption(
+        f"Memória dos dados: {memoria_dados['bytes'] / 2**20:.1f} MB "
+        f"(sem tipos: ~{memoria_dados['bytes_sem_tipos'] / 2**20:.1f} MB) · leitor {memoria_dados['motor']}"
+    )
+    if n_arquivos > 1:
+        linhas_arquivos = " + ".join(f"{n:,}" for n in resumo_arquivos["linhas_por_arquivo"])
+        st.sidebar.caption(
+            f"{n_arquivos} arquivos ({linhas_arquivos} linhas) · "
+            f"{resumo_arquivos['removidas']:,} repetidas removidas".replace(",", ".")
+            + f" ({regra_dedup.lower()})"
+        )
+    if correcao is not None:
+        atualizadas, inseridas = (f"{correcao[k]:,}".replace(",", ".") for k in ("atualizadas", "inseridas"))
+        st.sidebar.caption(f"Correções ({correcoes.name}): {atualizadas} atualizadas, {inseridas} novas")
+        ignoradas = correcao["sem_matricula"] + correcao["repetidas"]
+        if ignoradas:
+            st.sidebar.warning(
+                f"{ignoradas:,} linhas das correções ignoradas".replace(",", ".")
+                + f" ({correcao['sem_matricula']} sem Matrícula, {correcao['repetidas']} repetidas: vale a última)."
+            )
 
-# Timestamp usado para FILTRAR/CONTAR (cálculo real)
-limite = pd.Timestamp(datetime.combine(data_limite_calc, datetime.min.time()))
+    # Snapshot: guarda o dataset já interpretado para reabrir depois sem o CSV
+    if snapshot is not None:
+        st.sidebar.caption(f"Snapshot de {snapshot['criado']:%d/%m/%Y %H:%M}" +
+                           (f" ({snapshot['origem']})" if snapshot["origem"] else ""))
+    elif snapshots_disponiveis() and st.sidebar.button(
+        "💾 Salvar snapshot deste dataset",
+        help="Grava os dados já interpretados em disco; depois eles podem ser abertos pela sidebar "
+             "sem novo upload e sem reler o CSV."
+    ):
+        try:
+            origem = [f.name for f in uploaded] + ([correcoes.name] if correcoes is not None else [])
+            caminho_salvo = salvar_snapshot(dados, hash_arquivo, origem)
+            st.sidebar.success(f"Snapshot salvo: {os.path.basename(caminho_salvo)}")
+        except Exception as e:
+            st.sidebar.error(f"Erro ao salvar o snapshot: {e}")
+
+# Datas vazias ou que não puderam ser interpretadas não entram nos pendentes: avisa quantas e quais
+relatorio_datas = (cubo.contagens if modo_blocos else dados).attrs.get("relatorio_datas")
+if relatorio_datas:
+    st.sidebar.caption(
+        f"Datas: formato {relatorio_datas['formato'] or 'não reconhecido'} · "
+        f"{relatorio_datas['vazias']:,} vazias".replace(",", ".")
+    )
+    if relatorio_datas["rejeitadas"]:
+        exemplos = ", ".join(f"“{x}”" for x in relatorio_datas["exemplos_rejeitados"])
+        st.sidebar.warning(
+            f"{relatorio_datas['rejeitadas']:,} registros com Data_Ultimo_Eps inválida".replace(",", ".")
+            + f" ficaram fora dos pendentes (ex.: {exemplos})."
+        )
 
-# Filtrar "antes" (usa 2025!)
-dados_antes = dados[dados["Data_Ultimo_Eps"] < limite].copy()
+_cache_dados().usar_dataset(st.session_state["id_sessao"], hash_arquivo)
+_stats_cache = _cache_dados().estatisticas()
+st.sidebar.caption(
+    f"Cache de dados: {_stats_cache['hits']} acertos / {_stats_cache['misses']} falhas · "
+    f"{_stats_cache['bytes'] / 2**20:.1f} de {_stats_cache['max_bytes'] / 2**20:.0f} MB · "
+    f"{_cache_dados().sessoes_usando(hash_arquivo)} sessão(ões) neste arquivo"
+)
 
-# Métricas gerais
-total = len(dados)
-qtd_antes = len(dados_antes)
-porcentagem = (qtd_antes / total * 100) if total > 0 else 0.0
+def ler_pendentes_cache(filtros=None) -> pd.DataFrame:
+    """Linhas pendentes no modo em blocos (relê o CSV só na primeira vez para cada filtro)."""
+    chave = (hash_arquivo, "pendentes", limite, tuple(sorted((filtros or {}).items())))
+    return _cache_dados().obter(
+        chave,
+        lambda: ler_pendentes_em_blocos([io.BytesIO(c) for c in conteudos_csv], limite, filtros,
+                                        encoding="utf-8", sep=",")
+    )
+
+def obter_pendentes() -> pd.DataFrame:
+    """Todas as linhas pendentes ("dados_antes"), montadas só quando alguém precisa delas."""
+    with perfil.etapa("Pendentes (dados_antes)") as etapa:
+        if modo_blocos:
+            pendentes = ler_pendentes_cache()
+        else:
+            # Filtrar "antes" (usa 2025!)
+            pendentes = _cache_dados().obter((hash_arquivo, "pendentes", limite, ()), lambda: dados_completos()[pendente])
+        etapa["linhas"] = len(pendentes)
+    return pendentes
+
+@st.fragment(run_every=1.0)
+def acompanhar_tarefa(tarefa):
+    """Barra de progresso da tarefa, atualizada a cada segundo; ao terminar, reexecuta a página."""
+    if tarefa.terminada:
+        st.rerun()
+    andamento = f"{tarefa.feitas} de {tarefa.total} {tarefa.texto}" if tarefa.total else tarefa.texto
+    st.progress(tarefa.fracao, text=f"{tarefa.estado.capitalize()}... {andamento} ({tarefa.segundos:.0f}s)")
+
+def tamanho_legivel(n_bytes: int) -> str:
+    if n_bytes < 2**20:
+        return f"{n_bytes / 2**10:.0f} KB"
+    return f"{n_bytes / 2**20:.1f} MB"
+
+def exportacao_sob_demanda(hash_arquivo: str, limite, tipo, gerar, rotulo_gerar: str, rotulo_baixar: str,
+                           nome_arquivo: str, key: str, mime: str = MIME_XLSX, com_pendentes: bool = True):
+    """
+    Só gera o arquivo quando o usuário pede, numa tarefa em segundo plano: a página continua respondendo
+    e mostra o progresso de `gerar(pendentes, progresso)` enquanto isso (`pendentes` é None se
+    `com_pendentes` for False). Os bytes ficam no cache chaveados por (hash do arquivo, data-limite, tipo),
+    então um segundo pedido (ou rerun, ou outra sessão) sai de graça; o que não couber no cache fica na tarefa.
+    """
+    chave = (hash_arquivo, limite, "exportacao", tipo)
+    cache = _cache_dados()
+    tarefa = _tarefas().obter(chave)
+    conteudo = cache.pegar(chave)
+    if conteudo is None and tarefa is not None and tarefa.estado == PRONTA:
+        conteudo = tarefa.resultado
+    if conteudo is None:
+        if tarefa is None or tarefa.terminada:
+            if tarefa is not None and tarefa.estado == ERRO:
+                st.error(f"Falha ao gerar o arquivo: {tarefa.erro}")
+            elif tarefa is not None:
+                st.warning("O arquivo gerado antes já saiu da memória (cache de dados cheio, "
+                           "veja EPS_CACHE_MAX_MB). Gere de novo para baixar.")
+            if not st.button(rotulo_gerar, key=f"gerar_{key}", use_container_width=True):
+                return
+
+            # Cache e pendências resolvidos aqui, no script: a tarefa roda fora do contexto do Streamlit
+            pendentes = obter_pendentes() if com_pendentes else None
+
+            def _gerar_na_tarefa(progresso):
+                with perfil.etapa(f"Exportação {tipo}") as etapa:
+                    conteudo = cache.obter(chave, lambda: gerar(pendentes, progresso))
+                    etapa["bytes"] = len(conteudo)
+                return conteudo
+
+            tarefa = _tarefas().submeter(chave, _gerar_na_tarefa, rotulo=rotulo_baixar)
+        acompanhar_tarefa(tarefa)
+        return
+
+    download_button_blob(
+        label=rotulo_baixar,
+        data_bytes=conteudo,
+        filename=nome_arquivo,
+        mime=mime,
+        key=key
+    )
+    # Tempo da tarefa que gerou o arquivo (sem ele se a tarefa já saiu da lista)
+    gerado = f" · gerado em {tarefa.segundos:.1f}s" if tarefa is not None and tarefa.estado == PRONTA else ""
+    st.caption(f"{tamanho_legivel(len(conteudo))}{gerado}")
+
+def secao_medida(nome: str):
+    """
+    Mede o tempo de uma seção. Combinado com @st.fragment, é o tempo de resposta de uma interação
+    com os widgets da seção (só ela reexecuta). Guarda em st.session_state["latencias"].
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            with perfil.etapa(f"Seção: {nome}"):
+                resultado = func(*args, **kwargs)
+            ms = (time.perf_counter() - inicio) * 1000
+            st.session_state.setdefault("latencias", {})[nome] = ms
+            st.caption(f"⏱️ {nome}: {ms:.0f} ms")
+            return resultado
+        return medida
+    return decorador
 
 # --- Mapeamento Prefixo -> Dependência ---
-tmp = (dados[["Prefixo", "Dependencia"]]
-       .drop_duplicates(subset=["Prefixo"], keep="first"))
+tmp = tmp.copy()
 
 def _fmt_dep(x):
     if pd.isna(x) or str(x).strip() == "":
@@ -428,15 +640,8 @@ else:
 
 valor_filtro = None if prefixo_escolhido == "Todos" else prefixo_escolhido
 
-# Percentuais para donut conforme filtro
-if valor_filtro == "NA":
-    dados_filtrados = dados[dados["Prefixo"].isna()]
-    dados_antes_filtrados = dados_antes[dados_antes["Prefixo"].isna()]
-    porcentagem, total, qtd_antes = calcular_porcentagem_eps(dados_filtrados, dados_antes_filtrados, prefixo_escolhido="NA")
-elif valor_filtro is None:
-    porcentagem, total, qtd_antes = calcular_porcentagem_eps(dados, dados_antes, prefixo_escolhido=None)
-else:
-    porcentagem, total, qtd_antes = calcular_porcentagem_eps(dados, dados_antes, prefixo_escolhido=valor_filtro)
+# Percentuais para donut conforme filtro ("NA" é uma chave explícita do cubo)
+porcentagem, total, qtd_antes = cubo.porcentagem(valor_filtro)
 
 # --- KPIs ---
 st.title("📊 Dashboard EPS")
@@ -449,181 +654,364 @@ c1.metric(f"Total de registros – {rotulo}", f"{total:,}".replace(",", "."))
 c2.metric(f"Quantidade de pessoas pendentes {data_limite_ui.strftime('%d/%m')}", f"{qtd_antes:,}".replace(",", "."))
 c3.metric("Percentual pendente", f"{porcentagem:.1f}%")
 
+@st.fragment
+@secao_medida("Detalhamento")
+def secao_detalhe(cubo: CuboEps, valor_filtro):
+    with st.expander("🔍 Detalhar por Ajure / Prefixo / UOR / Cargo"):
+        nivel_cubo = st.radio("Nível", COLS_AGREGACAO, horizontal=True, key="nivel_cubo")
+        if valor_filtro is None or nivel_cubo == "Prefixo":
+            detalhe = cubo.por(nivel_cubo)
+        else:
+            # Com um Prefixo escolhido, mostra só o recorte dele
+            detalhe = cubo.por("Prefixo", nivel_cubo)
+            detalhe = detalhe[detalhe.index.get_level_values("Prefixo") == valor_filtro].droplevel("Prefixo")
+        detalhe = detalhe.assign(**{"%Pendentes": (detalhe["Pendentes"] / detalhe["Total"] * 100).round(1)})
+        st.dataframe(
+            detalhe.sort_values("Total", ascending=False).style.format({"%Pendentes": "{:.1f}%"}),
+            use_container_width=True
+        )
+
+secao_detalhe(cubo, valor_filtro)
+
 # ===== Gráfico de Donut =====
 st.markdown('<a name="donut-eps"></a>', unsafe_allow_html=True)
 st.divider()
 st.subheader("🍩 Percentual geral")
-fig_donut = donut_eps_plotly(
-    porcentagem,
-    filtro_atual=prefixo_escolhido,
-    cor_precisam="#e72914",
-    cor_nao_precisam="#0fe267"
-)
-st.plotly_chart(
-    fig_donut,
-    use_container_width=True,
-    config={
-        "toImageButtonOptions": {"format": "png", "filename": "donut_eps", "scale": 2},
-        "displaylogo": False
-    }
-)
+with perfil.etapa("Gráfico donut"):
+    fig_donut = donut_eps_plotly(
+        porcentagem,
+        data_limite_ui,
+        filtro_atual=prefixo_escolhido,
+        cor_precisam="#e72914",
+        cor_nao_precisam="#0fe267"
+    )
+    st.plotly_chart(
+        fig_donut,
+        use_container_width=True,
+        config={
+            "toImageButtonOptions": {"format": "png", "filename": "donut_eps", "scale": 2},
+            "displaylogo": False
+        }
+    )
 
 st.markdown('<a name="consulta-uor"></a>', unsafe_allow_html=True)
 st.divider()
-st.subheader("🔎 Consultar pendências por UOR (Prefixo 8553)")
-
-def _sanitize_sheet_title(s: str) -> str:
-    invalid = set('\\/:*?[]:"<>|')
-    out = "".join("_" if ch in invalid else ch for ch in (s or "").strip())
-    out = " ".join(out.split())
-    out = out[:31] if out else "Pendentes"
-    return out
-
-def _sanitize_filename(s: str) -> str:
-    invalid = set('\\/:*?[]:"<>|')
-    out = "".join("_" if ch in invalid else ch for ch in (s or "").strip())
-    out = " ".join(out.split())
-    return out or "Pendentes"
-
-def _fmt_uor(x):
-    return "NA" if pd.isna(x) or str(x).strip() == "" else str(x)
-
-mask_pref_8553 = (dados["Prefixo"].astype(str) == "8553")
-uors_8553 = dados.loc[mask_pref_8553, "Uor"]
-
-if uors_8553.empty:
-    st.warning("Não há UORs cadastradas para o Prefixo 8553 nos dados carregados.")
-else:
-    uors_unicas = sorted({_fmt_uor(x) for x in uors_8553.unique()})
-
-    uor_escolhida = st.selectbox(
-        "Selecione a UOR (apenas Prefixo 8553)",
-        options=uors_unicas,
-        index=0,
-        help="Digite para buscar e selecione a UOR desejada (apenas UORs do Prefixo 8553)."
-    )
-
-    mask_pend_pref = (dados_antes["Prefixo"].astype(str) == "8553")
-    if uor_escolhida == "NA":
-        mask_pend_uor = dados_antes["Uor"].isna()
+st.subheader("🔎 Consultar pendências por UOR")
+
+rotulo_por_prefixo = {_fmt_dep(p): lbl for p, lbl in prefixo_to_label.items()}
+rotulo_por_prefixo["NA"] = "NA – NA"
+
+@st.fragment
+@secao_medida("Consulta por UOR")
+def secao_uor(cubo: CuboEps, hash_arquivo: str, limite, valor_filtro, dados, indice, pendente):
+    """Trocar Prefixo ou UOR reexecuta só esta seção. Sem `dados` (modo em blocos) lê as linhas sob demanda."""
+    # Prefixos com pelo menos uma UOR; começa no Prefixo da sidebar (ou no 8553, a consulta original)
+    prefixos_uor = [p for p in cubo.por("Prefixo").index if cubo.uors_do_prefixo(p)]
+    if valor_filtro in prefixos_uor:
+        prefixo_padrao = valor_filtro
+    elif "8553" in prefixos_uor:
+        prefixo_padrao = "8553"
     else:
-        mask_pend_uor = (dados_antes["Uor"].astype(str) == uor_escolhida)
-
-    df_uor_pend = dados_antes[mask_pend_pref & mask_pend_uor].copy()
+        prefixo_padrao = prefixos_uor[0] if prefixos_uor else None
 
-    c1, c2, c3 = st.columns(3)
-    c1.metric("Prefixo", "8553")
-    c2.metric("UOR selecionada", uor_escolhida)
-    c3.metric("Pendências na UOR", f"{len(df_uor_pend):,}".replace(",", "."))
+    if prefixo_padrao is None:
+        st.warning("Não há UORs cadastradas nos dados carregados.")
+    else:
+        col_pref, col_uor = st.columns(2)
+        prefixo_uor = col_pref.selectbox(
+            "Prefixo",
+            options=prefixos_uor,
+            index=prefixos_uor.index(prefixo_padrao),
+            format_func=lambda p: rotulo_por_prefixo.get(p, f"{p} – NA"),
+            key=f"prefixo_uor_{prefixo_padrao}",
+            help="Digite para buscar o Prefixo."
+        )
+        uors_prefixo = cubo.uors_do_prefixo(prefixo_uor)
 
-    st.dataframe(df_uor_pend, use_container_width=True)
+        uor_escolhida = col_uor.selectbox(
+            "Selecione a UOR",
+            options=uors_prefixo,
+            index=0,
+            help="Digite para buscar e selecione a UOR desejada (UORs do Prefixo escolhido)."
+        )
 
-    nome_base = _sanitize_filename(f"{uor_escolhida} Pendentes")
-    sheet_title = _sanitize_sheet_title(uor_escolhida)
+        if dados is None:
+            df_uor_pend = ler_pendentes_cache({"Prefixo": prefixo_uor, "Uor": uor_escolhida})
+        else:
+            # Posições do grupo (Prefixo, UOR) já estão no índice: só fatia as linhas
+            linhas_uor = indice.linhas_uor(prefixo_uor, uor_escolhida)
+            df_uor_pend = linhas_completas(linhas_uor[pendente[linhas_uor]])
+
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Prefixo", prefixo_uor)
+        c2.metric("UOR selecionada", uor_escolhida)
+        c3.metric("Pendências na UOR", f"{len(df_uor_pend):,}".replace(",", "."))
+
+        st.dataframe(df_uor_pend, use_container_width=True)
+
+        nome_base = _sanitize_filename(f"{prefixo_uor} {uor_escolhida} Pendentes")
+        sheet_title = _sanitize_sheet_title(uor_escolhida)
+
+        try:
+            exportacao_sob_demanda(
+                hash_arquivo, limite, ("uor", prefixo_uor, uor_escolhida),
+                lambda _, progresso: escrever_xlsx([(sheet_title, df_uor_pend)], total_linhas=len(df_uor_pend),
+                                                   progresso=progresso),
+                rotulo_gerar="Gerar Excel (UOR selecionada)",
+                rotulo_baixar="📗 Baixar Excel (UOR selecionada)",
+                nome_arquivo=f"{nome_base}.xlsx",
+                key="dl_uor_blob_neutro",
+                com_pendentes=False
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar Excel da UOR: {e}")
 
-    try:
-        buf_xlsx = io.BytesIO()
-        with pd.ExcelWriter(buf_xlsx, engine="openpyxl") as writer:
-            df_uor_pend.to_excel(writer, sheet_name=sheet_title, index=False)
-        buf_xlsx.seek(0)
-        st.download_button(
-            label="📗 Baixar Excel (UOR selecionada)",
-            data=buf_xlsx,
-            file_name=f"{nome_base}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
-    except Exception as e:
-        st.error(f"Erro ao gerar Excel da UOR: {e}")
+secao_uor(cubo, hash_arquivo, limite, valor_filtro, dados,
+          None if modo_blocos else indice, None if modo_blocos else pendente)
 
 st.markdown('<a name="downloads"></a>', unsafe_allow_html=True)
 st.divider()
 st.subheader("⬇️ Baixar dados das pendências")
 
-col1, col2 = st.columns(2)
-
 cols_to_drop = ["Situacao_Eps", "Status_Indicador"]
 
-with col1:
-    st.caption("Excel com uma planilha por Prefixo (apenas pendentes).")
-    try:
-        # --- Gera o Excel multi-aba em memória ---
-        buf_xlsx_multi = io.BytesIO()
-        with pd.ExcelWriter(buf_xlsx_multi, engine="openpyxl") as writer:
-            for pref, grp in dados_antes.groupby("Prefixo", dropna=False):
-                sheet = "NA" if pd.isna(pref) else str(pref)[:31]
-                grp_export = grp.drop(columns=cols_to_drop, errors="ignore")
-                grp_export.to_excel(writer, sheet_name=sheet, index=False)
-
-        xlsx_bytes_multi = buf_xlsx_multi.getvalue()
-
-        # Opcional: validação do conteúdo (xlsx é um ZIP, começa com 'PK')
-        # st.write("Multi-aba bytes:", len(xlsx_bytes_multi), "Header:", xlsx_bytes_multi[:2])
-        mime_xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        
-        download_button_blob(
-            label="📘 Baixar Excel (1 aba por Prefixo)",
-            data_bytes=xlsx_bytes_multi,
-            filename="dados_pendentes_por_prefixo.xlsx",
-            mime=mime_xlsx,
-            key="dl_multi_blob_neutro"
-        )
-
+def _gerar_por_prefixo(hash_arquivo: str, limite, formato: str):
+    # As partes (uma por Prefixo) são renderizadas em paralelo; o tempo de cada uma vai para o cache.
+    # O cache é resolvido aqui, no script: a função devolvida roda numa tarefa em segundo plano
+    cache, chave_tempos = _cache_dados(), (hash_arquivo, limite, "tempos_exportacao", formato)
+
+    def gerar(pendentes, progresso) -> bytes:
+        conteudo, tempos = exportar_por_prefixo(pendentes, cols_to_drop, formato=formato, progresso=progresso)
+        cache.obter(chave_tempos, lambda: tempos)
+        return conteudo
+    return gerar
+
+def gerar_excel_uma_aba(pendentes, progresso) -> bytes:
+    # XML montado direto (xlsx_rapido): com todas as pendências o openpyxl leva dezenas de vezes mais
+    dados_pend_export = pendentes.drop(columns=cols_to_drop, errors="ignore")
+    return xlsx_rapido(dados_pend_export, "Pendentes", progresso=progresso)
+
+@st.fragment
+@secao_medida("Downloads")
+def secao_downloads(cubo: CuboEps, hash_arquivo: str, limite, data_limite_ui, top_n, modo_blocos: bool):
+    """Os botões "Gerar" reexecutam só esta seção e disparam tarefas; os bytes ficam no cache compartilhado."""
+    if modo_blocos:
+        st.caption("Leitura em blocos: as linhas pendentes são lidas do arquivo ao gerar o primeiro download.")
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.caption("Excel com uma planilha por Prefixo (apenas pendentes).")
+        try:
+            exportacao_sob_demanda(
+                hash_arquivo, limite, "por_prefixo",
+                _gerar_por_prefixo(hash_arquivo, limite, "abas"),
+                rotulo_gerar="Gerar Excel (1 aba por Prefixo)",
+                rotulo_baixar="📘 Baixar Excel (1 aba por Prefixo)",
+                nome_arquivo="dados_pendentes_por_prefixo.xlsx",
+                key="dl_multi_blob_neutro"
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar Excel por Prefixo: {e}")
+
+    with col2:
+        st.caption("ZIP com um Excel por Prefixo (um arquivo para cada agência).")
+        try:
+            exportacao_sob_demanda(
+                hash_arquivo, limite, "zip_por_prefixo",
+                _gerar_por_prefixo(hash_arquivo, limite, "zip"),
+                rotulo_gerar="Gerar ZIP (1 arquivo por Prefixo)",
+                rotulo_baixar="🗂️ Baixar ZIP (1 arquivo por Prefixo)",
+                nome_arquivo="dados_pendentes_por_prefixo.zip",
+                key="dl_zip_blob_neutro",
+                mime=MIME_ZIP
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar ZIP por Prefixo: {e}")
+
+    with col3:
+        st.caption("Excel único (uma aba) com todas as pendências.")
+        try:
+            # 🔹 Uma aba — mantém label e nome de arquivo
+            exportacao_sob_demanda(
+                hash_arquivo, limite, "uma_aba",
+                gerar_excel_uma_aba,
+                rotulo_gerar="Gerar Excel (uma aba)",
+                rotulo_baixar="📗 Baixar Excel (uma aba)",
+                nome_arquivo="dados_pendentes.xlsx",
+                key="dl_single_blob_neutro"
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar Excel único: {e}")
 
-    except Exception as e:
-        st.error(f"Erro ao gerar Excel por Prefixo: {e}")
+    st.caption(
+        "Dados para BI: todas as pendências em Parquet ou CSV compactado (gzip, UTF-8, separado por vírgula), "
+        "num arquivo só ou num ZIP com um arquivo por Prefixo."
+    )
+    opcoes_dados = [("parquet", "Parquet", False), ("parquet", "Parquet", True),
+                    ("csv.gz", "CSV.gz", False), ("csv.gz", "CSV.gz", True)]
+    for coluna, (formato, nome, por_prefixo) in zip(st.columns(4), opcoes_dados):
+        extensao, mime = FORMATOS_DADOS[formato]
+        with coluna:
+            if not formato_disponivel(formato):
+                st.caption(f"Para exportar em {nome} instale o pyarrow (`pip install pyarrow`).")
+                continue
+            try:
+                exportacao_sob_demanda(
+                    hash_arquivo, limite, ("dados", formato, por_prefixo),
+                    lambda pendentes, progresso, f=formato, pp=por_prefixo: exportar_dados(
+                        pendentes, cols_to_drop, f, por_prefixo=pp, progresso=progresso),
+                    rotulo_gerar=f"Gerar {nome}" + (" (1 por Prefixo)" if por_prefixo else ""),
+                    rotulo_baixar=f"📦 Baixar {nome}" + (" (ZIP, 1 por Prefixo)" if por_prefixo else ""),
+                    nome_arquivo="dados_pendentes" + ("_por_prefixo.zip" if por_prefixo else extensao),
+                    key=f"dl_{formato}_{'prefixo' if por_prefixo else 'todos'}",
+                    mime=MIME_ZIP if por_prefixo else mime
+                )
+            except Exception as e:
+                st.error(f"Erro ao gerar {nome}: {e}")
+
+    st.caption(
+        f"Relatório de imagens: donut e barras (top {int(top_n)}) de cada Prefixo em PNG, "
+        "mais um PDF com uma página por Prefixo."
+    )
+    if kaleido_disponivel():
+        try:
+            exportacao_sob_demanda(
+                hash_arquivo, limite, f"relatorio_imagens_{int(top_n)}",
+                # Sem progresso por parte: as figuras são renderizadas pelo kaleido
+                lambda _, progresso: relatorio_zip(cubo, data_limite_ui, int(top_n)),
+                rotulo_gerar="Gerar relatório de imagens (todos os Prefixos)",
+                rotulo_baixar="🖼️ Baixar relatório de imagens (ZIP com PNG + PDF)",
+                nome_arquivo="relatorio_eps_por_prefixo.zip",
+                key="dl_relatorio_imagens",
+                mime=MIME_ZIP,
+                com_pendentes=False
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar o relatório de imagens: {e}")
+    else:
+        st.caption("Para gerar o relatório de imagens instale o kaleido (`pip install kaleido`).")
 
-with col2:
-    st.caption("Excel único (uma aba) com todas as pendências.")
-    try:
-        buf_xlsx_single = io.BytesIO()
-        with pd.ExcelWriter(buf_xlsx_single, engine="openpyxl") as writer:
-            dados_pend_export = dados_antes.drop(columns=cols_to_drop, errors="ignore")
-            dados_pend_export.to_excel(writer, sheet_name="Pendentes", index=False)
-
-        xlsx_bytes_single = buf_xlsx_single.getvalue()
-        # st.write("Uma-aba bytes:", len(xlsx_bytes_single), "Header:", xlsx_bytes_single[:2])
-        
-        # 🔹 Uma aba — mantém label e nome de arquivo
-        download_button_blob(
-            label="📗 Baixar Excel (uma aba)",
-            data_bytes=xlsx_bytes_single,
-            filename="dados_pendentes.xlsx",
-            mime=mime_xlsx,
-            key="dl_single_blob_neutro"
-        )
+    for formato, nome in (("abas", "Excel"), ("zip", "ZIP")):
+        tempos = _cache_dados().pegar((hash_arquivo, limite, "tempos_exportacao", formato))
+        if tempos is None:
+            continue
+        with st.expander(f"⏱️ Tempo de geração por Prefixo ({nome})"):
+            st.caption(f"{len(tempos)} partes · soma {tempos['Segundos'].sum():.2f}s "
+                       f"· maior {tempos['Segundos'].max():.2f}s")
+            st.dataframe(tempos.sort_values("Segundos", ascending=False), use_container_width=True)
 
-    except Exception as e:
-        st.error(f"Erro ao gerar Excel único: {e}")
+secao_downloads(cubo, hash_arquivo, limite, data_limite_ui, top_n, modo_blocos)
 
 # ===== Percentual por Prefixo =====
 st.markdown('<a name="percentual-prefixo"></a>', unsafe_allow_html=True)
 st.divider()
 st.subheader("🏷️ Percentual por Prefixo")
 
-if "Prefixo" not in dados.columns:
-    st.error("Coluna 'Prefixo' não encontrada no CSV.")
-    st.stop()
-
-totais = dados["Prefixo"].value_counts()
-antes = dados_antes["Prefixo"].value_counts()
+totais, antes = cubo.totais_por_prefixo()
 porc_por_prefixo = (antes / totais * 100).fillna(0).sort_index()
 
-fig_barras = barras_prefixo_plotly_gradiente(
-    porc_por_prefixo=porc_por_prefixo,
+# Figura base memorizada por (dataset, data-limite, top_n, Prefixo que entrou à força);
+# o destaque do Prefixo escolhido é só um remendo no marker
+barras_base, alvo_barras, prefixo_extra = selecionar_barras(
+    porc_por_prefixo,
     top_n=top_n,
-    tema="plotly_white",
     prefixo_destacar=None if prefixo_escolhido == "Todos" else prefixo_escolhido,
     ensure_visible=True
 )
-st.plotly_chart(
-    fig_barras,
-    use_container_width=True,
-    config={
-        "toImageButtonOptions": {"format": "png", "filename": "barras_prefixo", "scale": 2},
-        "displaylogo": False
-    }
-)
+with perfil.etapa("Gráfico de barras", linhas=len(barras_base)):
+    fig_barras = destacar_barra(
+        _cache_dados().obter(
+            (hash_arquivo, limite, "barras", int(top_n), prefixo_extra, "plotly_white"),
+            lambda: barras_prefixo_base(barras_base, tema="plotly_white")
+        ),
+        alvo_barras
+    )
+    st.plotly_chart(
+        fig_barras,
+        use_container_width=True,
+        config={
+            "toImageButtonOptions": {"format": "png", "filename": "barras_prefixo", "scale": 2},
+            "displaylogo": False
+        }
+    )
+
+# ===== Curva de pendências por data-limite =====
+st.markdown('<a name="curva-datas"></a>', unsafe_allow_html=True)
+st.divider()
+st.subheader("📈 Curva de pendências por data-limite")
+
+@st.fragment
+@secao_medida("Curva por data-limite")
+def secao_curva(hash_arquivo: str, dados, conteudos_csv, valor_filtro):
+    """Período, frequência e data consultada só reexecutam a curva. Sem `dados` lê o CSV em blocos."""
+    FREQUENCIAS = {"Semanal": "W-SUN", "Quinzenal": "SMS", "Mensal": "MS"}
+    col_periodo, col_freq = st.columns([2, 1])
+    periodo = col_periodo.date_input(
+        "Período das datas-limite",
+        value=(date(2026, 3, 1), date(2026, 12, 31)),
+        format="DD/MM/YYYY"
+    )
+    frequencia = col_freq.selectbox("Frequência", list(FREQUENCIAS), index=0)
+
+    if isinstance(periodo, (tuple, list)) and len(periodo) == 2 and periodo[0] <= periodo[1]:
+        datas_ui, limites_varredura = limites_periodicos(periodo[0], periodo[1], FREQUENCIAS[frequencia])
+
+        with perfil.etapa("Varredura de datas-limite", linhas=len(limites_varredura)):
+            if dados is None:
+                matriz, totais_varredura = _cache_dados().obter(
+                    (hash_arquivo, "varredura", tuple(limites_varredura)),
+                    lambda: varrer_em_blocos([io.BytesIO(c) for c in conteudos_csv], limites_varredura,
+                                             encoding="utf-8", sep=",")
+                )
+            else:
+                matriz, totais_varredura = _cache_dados().obter(
+                    (hash_arquivo, "varredura", tuple(limites_varredura)),
+                    lambda: varrer_datas_limite(dados["Data_Ultimo_Eps"], dados["Prefixo"], limites_varredura)
+                )
+        # Colunas com as datas da UI (o cálculo usa as mesmas datas levadas para 2025)
+        matriz = matriz.set_axis(pd.to_datetime(datas_ui), axis=1)
+
+        if valor_filtro is None or valor_filtro not in matriz.index:
+            curva = matriz.sum(axis=0)
+            base = totais_varredura.sum()
+            titulo_curva = "Todos os Prefixos"
+        else:
+            curva = matriz.loc[valor_filtro]
+            base = totais_varredura.loc[valor_filtro]
+            titulo_curva = f"Prefixo {valor_filtro}"
+        pct_curva = (curva / base * 100) if base > 0 else curva * 0.0
+
+        fig_curva = go.Figure(go.Scatter(
+            x=curva.index, y=pct_curva.round(2), mode="lines+markers",
+            customdata=curva.to_numpy(),
+            hovertemplate="%{x|%d/%m/%Y}<br>%{y:.1f}% pendente<br>%{customdata} registros<extra></extra>"
+        ))
+        fig_curva.update_layout(
+            title=titulo_curva, template="plotly_white", height=380,
+            yaxis_title="% pendente", xaxis_title="Data-limite",
+            margin=dict(l=20, r=20, t=50, b=20)
+        )
+        st.plotly_chart(fig_curva, use_container_width=True, config={"displaylogo": False})
+
+        # Consultar a tabela por Prefixo de uma data qualquer é só escolher a coluna da matriz
+        data_consulta = st.select_slider(
+            "Ver tabela por Prefixo na data-limite",
+            options=list(matriz.columns),
+            value=matriz.columns[-1],
+            format_func=lambda d: d.strftime("%d/%m/%Y")
+        )
+        with st.expander(f"📋 Pendentes por Prefixo em {data_consulta:%d/%m/%Y}"):
+            tabela_data = pd.DataFrame({
+                "Total": totais_varredura,
+                "Pendentes": matriz[data_consulta]
+            }).drop(index="NA", errors="ignore")
+            tabela_data["%Pendentes"] = (tabela_data["Pendentes"] / tabela_data["Total"] * 100).round(1)
+            st.dataframe(tabela_data.sort_values("%Pendentes", ascending=False), use_container_width=True)
+    else:
+        st.caption("Escolha a data inicial e a final do período.")
+
+secao_curva(hash_arquivo, dados, conteudos_csv if modo_blocos else None, valor_filtro)
 
 st.divider()
 
@@ -632,74 +1020,162 @@ with st.expander("📋 Tabela: Percentual pendente por Prefixo"):
     st.dataframe(porc_por_prefixo.round(2).rename("Porcentagem (%)"), use_container_width=True)
 
 st.markdown('<a name="meta-90"></a>', unsafe_allow_html=True)
-with st.expander("🧮 Tabelas de contagem (totais e pendentes)"):
-    col_a, col_b = st.columns(2)
-    col_a.write("**Totais por Prefixo**")
-    col_a.dataframe(totais.rename("Total"), use_container_width=True)
-    col_b.write("**Pendentes por Prefixo**")
-    col_b.dataframe(antes.rename("Pendentes"), use_container_width=True)
-
-    st.markdown("### 📌 Meta: **90% pendentes** por Prefixo")
-    meta_pct = 0.90
-
-    idx = sorted(totais.index.union(antes.index), key=lambda x: str(x))
-    dfm = pd.DataFrame(index=idx)
-    dfm["Total"] = totais.reindex(idx).fillna(0).astype(int)
-    dfm["Pendentes"] = antes.reindex(idx).fillna(0).astype(int)
-    
-    metodo = st.radio(
-        "Como calcular a coluna **Faltam para 90%**?",
-        ["Arredondado", "Compensado (maior resto)"],
-        horizontal=True
-    )
 
-    dfm["Meta_90%_Qtd"] = np.ceil(meta_pct * dfm["Total"]).astype(int)
-    dfm["Faltam_Ceil"] = (dfm["Meta_90%_Qtd"] - dfm["Pendentes"]).clip(lower=0).astype(int)
+@st.fragment
+@secao_medida("Tabelas e meta")
+def secao_tabelas(cubo: CuboEps, hash_arquivo: str, limite):
+    """Meta, método e nível da distribuição reexecutam só as tabelas."""
+    totais, antes = cubo.totais_por_prefixo()
+    with st.expander("🧮 Tabelas de contagem (totais e pendentes)"):
+        col_a, col_b = st.columns(2)
+        col_a.write("**Totais por Prefixo**")
+        col_a.dataframe(totais.rename("Total"), use_container_width=True)
+        col_b.write("**Pendentes por Prefixo**")
+        col_b.dataframe(antes.rename("Pendentes"), use_container_width=True)
+
+        meta_pct = st.number_input(
+            "Meta (% de pendentes)", min_value=1.0, max_value=100.0,
+            value=DEFAULT_META_PCT * 100, step=0.5, format="%.1f"
+        ) / 100
+        rotulo = rotulo_meta(meta_pct)
+        st.markdown(f"### 📌 Meta: **{rotulo} pendentes** por Prefixo")
+
+        metodo = st.radio(
+            f"Como calcular a coluna **Faltam para {rotulo}**?",
+            METODOS_META,
+            horizontal=True
+        )
+
+        df_out = tabela_meta(totais, antes, meta_pct=meta_pct, metodo=metodo)
+        _, faltam_col = colunas_meta(meta_pct, metodo)
+
+        total_geral = df_out["Total"].sum()
+        pendentes_atuais = df_out["Pendentes"].sum()
+        faltam_total = df_out[faltam_col].sum()
 
-    if metodo == "Arredondado":
-        df_out = dfm[["Total", "Pendentes", "Meta_90%_Qtd", "Faltam_Ceil"]].rename(
-            columns={"Faltam_Ceil": "Faltam para 90%"}
+        pendentes_finais = pendentes_atuais + faltam_total
+        pct_final = pendentes_finais / total_geral * 100 if total_geral > 0 else 0
+
+        st.dataframe(
+            df_out.style.format({"%Pendentes": "{:.1f}%"}),
+            use_container_width=True
         )
-    else:
-        ideal = meta_pct * dfm["Total"] - dfm["Pendentes"]
-        ideal_pos = ideal.clip(lower=0)
-        base = np.floor(ideal_pos).astype(int)
-        resto = (ideal_pos - base)
-        total_target = int(round(ideal_pos.sum()))
-        to_allocate = max(0, total_target - int(base.sum()))
-        extra = pd.Series(0, index=dfm.index, dtype=int)
-        if to_allocate > 0:
-            ordem = resto.sort_values(ascending=False).index.tolist()
-            for i, idx_pref in enumerate(ordem):
-                if i >= to_allocate:
-                    break
-                extra.loc[idx_pref] += 1
-        faltam_comp = (base + extra).astype(int).clip(lower=0)
-
-        df_out = dfm[["Total", "Pendentes"]].copy()
-        df_out["Meta_90%_Qtd (compensado)"] = (df_out["Pendentes"] + faltam_comp).astype(int)
-        df_out["Faltam para 90% (compensado)"] = faltam_comp.astype(int)
-
-    if metodo == "Arredondado":
-        faltam_col = "Faltam para 90%"
-        meta_col = "Meta_90%_Qtd"
-    else:
-        faltam_col = "Faltam para 90% (compensado)"
-        meta_col = "Meta_90%_Qtd (compensado)"
+        st.caption(f"Somando o que falta: {pendentes_finais:,} pendentes ({pct_final:.1f}% do total).".replace(",", "."))
 
-    total_geral = df_out["Total"].sum()
-    pendentes_atuais = df_out["Pendentes"].sum()
-    faltam_total = df_out[faltam_col].sum()
+        # Mesma meta distribuída Ajure -> Prefixo -> Uor (a soma de cada nível bate com o nível acima)
+        st.markdown(f"### 🧭 Distribuição de **Faltam para {rotulo}** por Ajure → Prefixo → UOR")
+        alocacao = _cache_dados().obter(
+            (hash_arquivo, "meta_hierarquica", limite, meta_pct),
+            lambda: alocar_meta_hierarquica(cubo.contagens, meta_pct)
+        )
+        nivel_meta = st.radio("Agrupar por", NIVEIS_META, horizontal=True, key="nivel_meta")
+        st.dataframe(
+            resumir_meta(alocacao, nivel_meta).sort_values("Faltam", ascending=False)
+                                              .style.format({"%Pendentes": "{:.1f}%"}),
+            use_container_width=True
+        )
+        st.caption(f"Total a alcançar: {int(alocacao['Faltam'].sum())} registros em {len(alocacao)} UORs.")
 
-    pendentes_finais = pendentes_atuais + faltam_total
-    pct_final = pendentes_finais / total_geral * 100 if total_geral > 0 else 0
+secao_tabelas(cubo, hash_arquivo, limite)
 
-    st.dataframe(
-        df_out.style.format({"%Pendentes": "{:.1f}%"}),
-        use_container_width=True
+# ===== Evolução desde outro dataset (ex.: exportação da semana anterior) =====
+st.markdown('<a name="evolucao"></a>', unsafe_allow_html=True)
+st.divider()
+st.subheader("📉 Evolução desde outro dataset")
+
+@st.fragment
+@secao_medida("Evolução")
+def secao_evolucao(cubo: CuboEps, hash_arquivo: str, dados, limite):
+    """Compara o dataset atual com um snapshot salvo ou outro CSV, funcionário a funcionário (Matricula)."""
+    if dados is None:
+        st.caption("Indisponível na leitura em blocos: a comparação precisa das linhas (Matricula) em memória.")
+        return
+
+    anteriores = listar_snapshots()
+    anteriores = anteriores[anteriores["hash"] != hash_arquivo].set_index("caminho", drop=False)
+    col_snap, col_csv = st.columns(2)
+    caminho_anterior = col_snap.selectbox(
+        "Snapshot anterior",
+        [None, *anteriores.index],
+        format_func=lambda c: "—" if c is None else rotulo_snapshot(anteriores.loc[c]),
+        disabled=anteriores.empty
     )
+    csv_anterior = col_csv.file_uploader("Ou CSV anterior", type=["csv"], key="csv_anterior")
+    if csv_anterior is None and caminho_anterior is None:
+        st.caption("Escolha um snapshot salvo ou envie o CSV anterior para ver o que mudou desde ele.")
+        return
+
+    try:
+        if csv_anterior is not None:
+            outro, _, _, hash_outro = carregar_dados_cache([csv_anterior])
+        else:
+            outro, _, _, hash_outro = abrir_snapshot_cache(anteriores.loc[caminho_anterior])
+    except Exception as e:
+        st.error(f"Erro ao carregar o dataset anterior: {e}")
+        return
+    if hash_outro == hash_arquivo:
+        st.caption("O dataset escolhido é o mesmo que está aberto.")
+        return
+
+    # O cubo do outro dataset usa a mesma chave do principal: se ele for aberto depois, já está pronto
+    cubo_outro = _cache_dados().obter((hash_outro, "cubo", limite), lambda: CuboEps.de_dados(outro, limite))
+    with perfil.etapa("Comparação entre datasets", linhas=len(dados) + len(outro)):
+        diff = _cache_dados().obter(
+            (hash_arquivo, "diff", hash_outro, limite),
+            lambda: comparar_datasets(outro, dados_completos(), limite, cubo_antes=cubo_outro, cubo_depois=cubo)
+        )
+
+    resumo = diff["resumo"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pendentes", f"{resumo['pendentes_depois']:,}".replace(",", "."),
+                delta=resumo["pendentes_depois"] - resumo["pendentes_antes"], delta_color="inverse")
+    col2.metric("Regularizados", f"{resumo['regularizados']:,}".replace(",", "."))
+    col3.metric("Novos pendentes", f"{resumo['novos_pendentes']:,}".replace(",", "."))
+    col4.metric("Entradas / saídas", f"{resumo['entradas']:,} / {resumo['saidas']:,}".replace(",", "."))
+
+    formato = {"%Pendentes_antes": "{:.1f}%", "%Pendentes_depois": "{:.1f}%", "Delta_%": "{:+.1f}"}
+    st.write("**Por Prefixo** (do que mais melhorou para o que mais piorou)")
+    st.dataframe(diff["por_prefixo"].style.format(formato), use_container_width=True)
+    with st.expander("📋 Por Prefixo e UOR"):
+        st.dataframe(diff["por_grupo"].style.format(formato), use_container_width=True)
+
+    for chave, titulo in [("regularizados", "✅ Regularizados"), ("novos_pendentes", "⚠️ Novos pendentes"),
+                          ("entradas", "➕ Entradas"), ("saidas", "➖ Saídas")]:
+        with st.expander(f"{titulo} ({len(diff[chave]):,})".replace(",", ".")):
+            st.dataframe(diff[chave], hide_index=True, use_container_width=True)
+
+secao_evolucao(cubo, hash_arquivo, dados, limite)
 
 st.info("""
 **Observações**
 - Entrada **somente CSV**.
-""")
\ No newline at end of file
+""")
+
+# Tempo da execução completa (upload, sidebar); interações dentro de uma seção só medem a seção
+st.session_state.setdefault("latencias", {})["Página inteira"] = (time.perf_counter() - _INICIO_EXECUCAO) * 1000
+st.sidebar.caption(f"⏱️ Página inteira: {st.session_state['latencias']['Página inteira']:.0f} ms")
+
+# ===== Diagnóstico de desempenho (só com ?perfil=1 ou EPS_PERFIL=1) =====
+if perfil.ativo:
+    with st.sidebar.expander("🩺 Diagnóstico de desempenho"):
+        etapas_execucao = perfil.tabela(perfil.execucao)
+        st.caption(
+            f"Execução {perfil.execucao}: {len(etapas_execucao)} etapas, "
+            f"{etapas_execucao['segundos'].sum():.3f} s medidos"
+        )
+        st.dataframe(
+            etapas_execucao[["etapa", "segundos", "linhas", "memoria_mb"]],
+            hide_index=True,
+            use_container_width=True
+        )
+        historico = perfil.tabela()
+        ultimas = historico["execucao"].unique()[-5:]  # ordem de execução, da mais antiga
+        if len(ultimas) > 1:
+            st.caption("Últimas execuções da sessão (segundos por etapa)")
+            st.dataframe(
+                historico.pivot_table(index="etapa", columns="execucao", values="segundos",
+                                      aggfunc="sum", sort=False)[ultimas],
+                use_container_width=True
+            )
+        if perfil.log:
+            st.caption(f"Também gravado em `{perfil.log}` (uma linha JSON por etapa).")
@@ -0,0 +1,236 @@
+"""
+Benchmarks do pipeline do dashboard: tempo e pico de memória de cada etapa, para vários tamanhos de arquivo.
+
+Gera (ou reaproveita) CSVs sintéticos com gerar_dados.py e grava os resultados em JSON, para comparar
+execuções entre versões:
+
+    python benchmarks/bench_eps.py --linhas 10000 100000 1000000 --saida resultados.json
+    python benchmarks/bench_eps.py --linhas 100000 --comparar resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import eps_calculo as calc  # noqa: E402
+import eps_exportacao as exportacao  # noqa: E402
+from gerar_dados import gerar_csv  # noqa: E402
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+COLS_FORA_DA_EXPORTACAO = ["Situacao_Eps", "Status_Indicador"]
+
+def _pico_pyarrow() -> int:
+    return pa.default_memory_pool().max_memory() if pa is not None else 0
+
+# Medir memória com tracemalloc deixa o código Python bem mais lento (openpyxl chega a 2-3x),
+# então o tempo vem de execuções sem rastreamento e a memória de uma execução à parte
+MEDIR_MEMORIA = True
+
+def medir(etapa: str, linhas_arquivo: int, func, *args, repeticoes: int = 1, **kwargs):
+    """
+    Roda `func` `repeticoes` vezes e devolve (resultado da última, registro).
+    Tempo: menor das repetições. Memória (execução extra, se MEDIR_MEMORIA): pico do tracemalloc
+    (numpy/pandas/Python) mais o crescimento do pico do pool do pyarrow durante a etapa.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func(*args, **kwargs)
+        tempos.append(time.perf_counter() - inicio)
+
+    pico = None
+    if MEDIR_MEMORIA:
+        pico_arrow_antes = _pico_pyarrow()
+        tracemalloc.start()
+        func(*args, **kwargs)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pico += max(0, _pico_pyarrow() - pico_arrow_antes)
+
+    linhas = len(resultado) if hasattr(resultado, "__len__") and not isinstance(resultado, (bytes, dict)) else None
+    registro = {
+        "linhas_arquivo": linhas_arquivo,
+        "etapa": etapa,
+        "segundos": round(min(tempos), 6),
+        "segundos_mediana": round(float(np.median(tempos)), 6),
+        "pico_mb": round(pico / 2**20, 2) if pico is not None else None,
+        "linhas_resultado": linhas,
+    }
+    if isinstance(resultado, (bytes, bytearray)):
+        registro["bytes_resultado"] = len(resultado)
+    memoria = f"{registro['pico_mb']:>9.1f} MB" if pico is not None else ""
+    print(f"  {etapa:<28} {registro['segundos']:>9.3f}s  {memoria}", flush=True)
+    return resultado, registro
+
+def rodar_tamanho(caminho: str, linhas: int, repeticoes: int, com_excel: bool, com_figuras: bool) -> list:
+    limite = calc.limite_calculo(calc.DEFAULT_DATA_LIMITE_UI)
+    r = []
+
+    bruto, reg = medir("carregar_dados", linhas, calc.carregar_dados, caminho, repeticoes=repeticoes)
+    reg["motor_csv"] = bruto.attrs.get("motor_csv")
+    r.append(reg)
+    dados, reg = medir("preparar_df", linhas, lambda: calc.preparar_df(bruto.copy()), repeticoes=repeticoes)
+    r.append(reg)
+
+    pendentes, reg = medir("filtro_data_limite", linhas, lambda: dados[dados["Data_Ultimo_Eps"] < limite],
+                           repeticoes=repeticoes)
+    r.append(reg)
+    cubo, reg = medir("cubo_agregacao", linhas, calc.CuboEps.de_dados, dados, limite, repeticoes=repeticoes)
+    r.append(reg)
+    (totais, antes), reg = medir("totais_por_prefixo", linhas, calc.totais_por_prefixo, cubo.contagens,
+                                 repeticoes=repeticoes)
+    r.append(reg)
+    _, reg = medir("indice_grupos", linhas, calc.IndiceGrupos, dados, repeticoes=repeticoes)
+    r.append(reg)
+
+    for metodo in calc.METODOS_META:
+        _, reg = medir(f"tabela_meta[{metodo.split()[0].lower()}]", linhas, calc.tabela_meta, totais, antes,
+                       metodo=metodo, repeticoes=repeticoes)
+        r.append(reg)
+    _, reg = medir("meta_hierarquica", linhas, calc.alocar_meta_hierarquica, cubo.contagens,
+                   repeticoes=repeticoes)
+    r.append(reg)
+
+    # "Semana seguinte": 5% dos funcionários regularizados e 1% trocados por matrículas novas
+    rng = np.random.default_rng(0)
+    seguinte = dados.copy()
+    seguinte.loc[rng.random(len(seguinte)) < 0.05, "Data_Ultimo_Eps"] = limite
+    novas = rng.random(len(seguinte)) < 0.01
+    seguinte["Matricula"] = seguinte["Matricula"].mask(novas, "N" + seguinte["Matricula"].astype(str))
+    cubo_seguinte = calc.CuboEps.de_dados(seguinte, limite)
+    diff, reg = medir("comparar_datasets", linhas, calc.comparar_datasets, dados, seguinte, limite,
+                      cubo_antes=cubo, cubo_depois=cubo_seguinte, repeticoes=repeticoes)
+    reg["linhas_resultado"] = diff["resumo"]["regularizados"]
+    r.append(reg)
+
+    # Correções: 0,5% das linhas da "semana seguinte" aplicadas como delta (índice de matrículas já pronto)
+    delta = seguinte.sample(frac=0.005, random_state=0).reset_index(drop=True)
+    posicoes = calc.indice_matriculas(dados)
+
+    def _correcao():
+        corrigido, info = calc.aplicar_delta(dados, delta, posicoes)
+        novo_cubo = cubo.com_delta(info["saiu"], info["entrou"], limite)
+        calc.tabela_meta(*novo_cubo.totais_por_prefixo())
+        return corrigido
+
+    _, reg = medir("correcao_delta", linhas, _correcao, repeticoes=repeticoes)
+    reg["linhas_delta"] = len(delta)
+    r.append(reg)
+
+    if com_figuras:
+        import plotly.graph_objects as go
+        import eps_graficos as graficos
+        porc = (antes / totais * 100).fillna(0)
+
+        def _barras(top_n):
+            base, alvo, _ = graficos.selecionar_barras(porc, top_n, "8553")
+            return go.Figure(graficos.destacar_barra(graficos.barras_prefixo_base(base), alvo)).to_json()
+
+        for top_n in (44, 200):
+            json_barras, reg = medir(f"figura_barras[{top_n}]", linhas, _barras, top_n, repeticoes=repeticoes)
+            reg["linhas_resultado"], reg["bytes_resultado"] = None, len(json_barras)
+            r.append(reg)
+        _, reg = medir("figura_donut", linhas, lambda: graficos.donut_eps_plotly(cubo.porcentagem()[0]).to_json(),
+                       repeticoes=repeticoes)
+        reg["linhas_resultado"] = None
+        r.append(reg)
+
+    if com_excel:
+        sem_colunas = pendentes.drop(columns=COLS_FORA_DA_EXPORTACAO, errors="ignore")
+        _, reg = medir("excel_uma_aba", linhas, exportacao.escrever_xlsx, [("Pendentes", sem_colunas)],
+                       total_linhas=len(sem_colunas))
+        r.append(reg)
+        (_, tempos), reg = medir("excel_por_prefixo", linhas, exportacao.exportar_por_prefixo, pendentes,
+                                 COLS_FORA_DA_EXPORTACAO, formato="abas")
+        reg["partes"] = len(tempos)
+        r.append(reg)
+        _, reg = medir("xlsx_rapido_uma_aba", linhas, exportacao.xlsx_rapido, sem_colunas)
+        r.append(reg)
+        for formato in exportacao.FORMATOS_DADOS:
+            if not exportacao.formato_disponivel(formato):
+                continue
+            for por_prefixo in (False, True):
+                etapa = f"{formato}{'_por_prefixo' if por_prefixo else ''}"
+                _, reg = medir(etapa, linhas, exportacao.exportar_dados, pendentes, COLS_FORA_DA_EXPORTACAO,
+                               formato, por_prefixo=por_prefixo)
+                r.append(reg)
+
+    return r
+
+def ambiente() -> dict:
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__ if pa is not None else None,
+    }
+
+def comparar(atual: list, anterior_json: str):
+    """Imprime a razão atual/anterior do tempo de cada (tamanho, etapa) presente nos dois."""
+    with open(anterior_json, encoding="utf-8") as f:
+        anterior = {(x["linhas_arquivo"], x["etapa"]): x for x in json.load(f)["resultados"]}
+    print(f"\nComparação com {anterior_json} (razão < 1 = mais rápido agora):")
+    for x in atual:
+        antes = anterior.get((x["linhas_arquivo"], x["etapa"]))
+        if antes and antes["segundos"] > 0:
+            memoria = ""
+            if x["pico_mb"] is not None and antes["pico_mb"] is not None:
+                memoria = f"memória {x['pico_mb'] - antes['pico_mb']:+.1f} MB"
+            print(f"  {x['linhas_arquivo']:>9} {x['etapa']:<28} {x['segundos'] / antes['segundos']:>6.2f}x  {memoria}")
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bench_eps", description="Mede tempo e memória das etapas do dashboard.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="tamanhos de arquivo a medir (padrão: 10000 100000 1000000)")
+    parser.add_argument("--pasta-dados", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados"),
+                        help="onde ficam os CSVs gerados (reaproveitados entre execuções)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON de resultados (padrão: bench_<data>.json)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições das etapas rápidas (padrão: 3)")
+    parser.add_argument("--sem-excel", action="store_true", help="não mede as exportações (Excel, Parquet, CSV.gz)")
+    parser.add_argument("--sem-figuras", action="store_true", help="não mede a montagem das figuras plotly")
+    parser.add_argument("--sem-memoria", action="store_true",
+                        help="não mede o pico de memória (evita a execução extra com tracemalloc)")
+    parser.add_argument("--comparar", metavar="JSON", help="resultado anterior para comparar")
+    return parser
+
+def main(argv=None) -> int:
+    global MEDIR_MEMORIA
+    args = criar_parser().parse_args(argv)
+    MEDIR_MEMORIA = not args.sem_memoria
+    os.makedirs(args.pasta_dados, exist_ok=True)
+
+    resultados = []
+    for linhas in args.linhas:
+        caminho = os.path.join(args.pasta_dados, f"eps_{linhas}.csv")
+        if not os.path.exists(caminho):
+            print(f"Gerando {caminho}...", flush=True)
+            gerar_csv(caminho, linhas)
+        print(f"{linhas} linhas ({os.path.getsize(caminho) / 2**20:.1f} MB)", flush=True)
+        resultados += rodar_tamanho(caminho, linhas, args.repeticoes, not args.sem_excel, not args.sem_figuras)
+
+    saida = args.saida or f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump({"ambiente": ambiente(), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {saida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Gera CSVs sintéticos no formato do dashboard (sem cabeçalho, colunas de eps_calculo.COLS).
+
+Exemplo:
+    python benchmarks/gerar_dados.py dados_1m.csv --linhas 1000000 --prefixos 300 --taxa-na 0.01
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from eps_calculo import COLS  # noqa: E402
+
+# Distribuição da Data_Ultimo_Eps (dias antes de DATA_BASE)
+DATA_BASE = date(2025, 12, 31)
+DISTRIBUICOES_DATA = {
+    "uniforme": lambda rng, n: rng.integers(0, 730, n),          # qualquer dia dos últimos 2 anos
+    "recentes": lambda rng, n: rng.exponential(120, n).astype(int),  # maioria fez o EPS há pouco
+    "vencidas": lambda rng, n: 365 + rng.integers(0, 365, n),     # todos com mais de 1 ano
+}
+CARGOS = ["Escriturario", "Caixa", "Gerente de Relacionamento", "Gerente Geral", "Assessor", "Analista"]
+AJURES = ["AJURE SP", "AJURE RJ", "AJURE MG", "AJURE RS", "AJURE BA", "AJURE PE", "AJURE DF", "AJURE PR"]
+LINHAS_POR_BLOCO = 500_000
+
+def _bloco(rng, inicio: int, n: int, prefixos: np.ndarray, uors_por_prefixo: int, taxa_na: float,
+           datas: str) -> pd.DataFrame:
+    pos_prefixo = rng.integers(0, len(prefixos), n)
+    prefixo = prefixos[pos_prefixo]
+    # Prefixos com volumes diferentes: a UOR sai de uma distribuição geométrica
+    uor = np.minimum(rng.geometric(min(1.0, 3 / uors_por_prefixo), n) - 1, uors_por_prefixo - 1)
+    ajure_idx = pos_prefixo % len(AJURES)
+
+    dias = DISTRIBUICOES_DATA[datas](rng, n)
+    data = (pd.Timestamp(DATA_BASE) - pd.to_timedelta(dias, unit="D")).strftime("%d/%m/%Y").to_numpy(dtype=object)
+    dias_venc = 365 - dias
+
+    df = pd.DataFrame({
+        "Matricula": np.char.add("F", np.char.zfill((inicio + np.arange(n)).astype(str), 7)),
+        "Nome_Funcionario": np.char.add("Funcionario ", (inicio + np.arange(n)).astype(str)),
+        "Avaliavel": np.where(rng.random(n) < 0.97, "Sim", "Nao"),
+        "Data_Ultimo_Eps": data,
+        "Situacao_Eps": np.where(dias_venc < 0, "Vencido", "Em dia"),
+        "Dias_Para_Vencimento": dias_venc,
+        "Status_Indicador": np.where(dias_venc < 60, "Vermelho", "Verde"),
+        "Cargo": np.array(CARGOS)[rng.integers(0, len(CARGOS), n)],
+        "Prefixo": prefixo.astype(str).astype(object),
+        "Dependencia": np.char.add("Agencia ", prefixo.astype(str)).astype(object),
+        "Codigo_Uor": 100000 + prefixo.astype(np.int64) % 1000 * 100 + uor,
+        "Uor": np.char.add("UOR ", uor.astype(str)).astype(object),
+        "Prefixo_Ajure": 9000 + ajure_idx,
+        "Ajure": np.array(AJURES)[ajure_idx],
+    }, columns=COLS)
+
+    if taxa_na > 0:
+        for col in ["Data_Ultimo_Eps", "Prefixo", "Uor", "Dependencia"]:
+            df.loc[rng.random(n) < taxa_na, col] = ""
+    return df
+
+def gerar_csv(caminho, linhas: int, prefixos: int = 300, uors_por_prefixo: int = 20,
+              taxa_na: float = 0.01, datas: str = "uniforme", semente: int = 0) -> str:
+    """Grava `linhas` registros em blocos (memória constante mesmo com milhões de linhas)."""
+    rng = np.random.default_rng(semente)
+    codigos = rng.choice(np.arange(1000, 10000), size=prefixos, replace=False)
+    codigos[0] = 8553  # o Prefixo que o dashboard consultava fixo
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        for inicio in range(0, linhas, LINHAS_POR_BLOCO):
+            n = min(LINHAS_POR_BLOCO, linhas - inicio)
+            _bloco(rng, inicio, n, codigos, uors_por_prefixo, taxa_na, datas).to_csv(f, header=False, index=False)
+    return str(caminho)
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="gerar_dados", description="Gera um CSV sintético de EPS.")
+    parser.add_argument("saida", help="arquivo CSV a gravar")
+    parser.add_argument("--linhas", type=int, default=100_000, help="quantidade de registros (padrão: 100000)")
+    parser.add_argument("--prefixos", type=int, default=300, help="quantidade de Prefixos (padrão: 300)")
+    parser.add_argument("--uors", type=int, default=20, help="UORs por Prefixo (padrão: 20)")
+    parser.add_argument("--taxa-na", type=float, default=0.01,
+                        help="fração de vazios em data, Prefixo, UOR e Dependência (padrão: 0.01)")
+    parser.add_argument("--datas", choices=sorted(DISTRIBUICOES_DATA), default="uniforme",
+                        help="distribuição da data do último EPS")
+    parser.add_argument("--semente", type=int, default=0)
+    return parser
+
+def main(argv=None) -> int:
+    args = criar_parser().parse_args(argv)
+    gerar_csv(args.saida, args.linhas, args.prefixos, args.uors, args.taxa_na, args.datas, args.semente)
+    print(f"{args.saida}: {args.linhas} linhas, {os.path.getsize(args.saida) / 2**20:.1f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
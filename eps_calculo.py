@@ -0,0 +1,1156 @@
+"""
+Núcleo de cálculo do Dashboard EPS, sem Streamlit nem plotly.
+
+Leitura tipada do CSV, preparo das datas, contagens por Prefixo/Uor/Ajure (em memória
+ou em blocos), índice de grupos, percentuais e a tabela de meta. Usado pelo
+Projeto_EPS.py (dashboard) e pelo eps_cli.py (processamento em lote).
+"""
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow é opcional: sem ele, a leitura usa o parser C do pandas
+    pa = None
+
+# Defaults (UI x Cálculo base)
+DEFAULT_DATA_LIMITE_UI = date(2026, 6, 30)     # o que APARECE para o usuário
+DEFAULT_META_PCT = 0.90
+
+LINHAS_POR_BLOCO = int(os.environ.get("EPS_LINHAS_POR_BLOCO", "200000"))
+
+# =========================
+# Leitura do CSV
+# =========================
+COLS = ["Matricula", "Nome_Funcionario", "Avaliavel", "Data_Ultimo_Eps", "Situacao_Eps",
+        "Dias_Para_Vencimento", "Status_Indicador", "Cargo", "Prefixo", "Dependencia",
+        "Codigo_Uor", "Uor", "Prefixo_Ajure", "Ajure"]
+
+# Esquema de tipos do CSV: colunas muito repetidas viram category (um código por linha
+# + uma cópia de cada valor distinto); texto de alta cardinalidade fica em string Arrow.
+COLS_TEXTO = ["Matricula", "Nome_Funcionario"]
+COLS_INTEIRAS = ["Dias_Para_Vencimento"]
+COLS_CATEGORICAS = [c for c in COLS if c not in COLS_TEXTO + COLS_INTEIRAS]
+
+DTYPE_TEXTO = pd.StringDtype("pyarrow") if pa is not None else pd.StringDtype()
+SCHEMA_DTYPES = {
+    **{c: DTYPE_TEXTO for c in COLS_TEXTO},
+    **{c: "Int32" for c in COLS_INTEIRAS},
+    **{c: "category" for c in COLS_CATEGORICAS},
+}
+
+def _rebobinar(file_like, posicao):
+    if hasattr(file_like, "seek"):
+        file_like.seek(posicao)
+
+def _ordenar_categorias(df: pd.DataFrame) -> pd.DataFrame:
+    # Categorias em ordem alfabética, igual para os dois motores (o pyarrow as cria na ordem de aparição)
+    for col in df.select_dtypes("category").columns:
+        cats = df[col].cat.categories
+        df[col] = df[col].cat.reorder_categories(sorted(cats, key=str))
+    return df
+
+def _ler_csv_pyarrow(file_like, encoding, sep) -> pd.DataFrame:
+    dicionario = pa.dictionary(pa.int32(), pa.string())
+    tipos = {
+        **{c: pa.string() for c in COLS_TEXTO},
+        **{c: pa.int32() for c in COLS_INTEIRAS},
+        **{c: dicionario for c in COLS_CATEGORICAS},
+    }
+    tabela = pa_csv.read_csv(
+        file_like,
+        read_options=pa_csv.ReadOptions(column_names=COLS, encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=sep),
+        convert_options=pa_csv.ConvertOptions(column_types=tipos, strings_can_be_null=True),
+    )
+    mapa_tipos = {pa.string(): DTYPE_TEXTO, pa.int32(): pd.Int32Dtype()}
+    return tabela.to_pandas(types_mapper=mapa_tipos.get)
+
+def carregar_dados(file_like, encoding="utf-8", sep=","):
+    """
+    Lê o CSV já com os tipos do esquema (SCHEMA_DTYPES).
+    Usa o leitor CSV do pyarrow quando disponível; senão, o parser C do pandas.
+    Se o arquivo não couber no esquema (ex.: texto na coluna numérica), cai na leitura sem tipos.
+    O motor usado fica em df.attrs["motor_csv"].
+    """
+    inicio = file_like.tell() if hasattr(file_like, "tell") else 0
+
+    tentativas = []
+    if pa is not None:
+        tentativas.append(("pyarrow", lambda: _ler_csv_pyarrow(file_like, encoding, sep)))
+    tentativas.append(("pandas-c", lambda: pd.read_csv(
+        file_like, header=None, names=COLS, encoding=encoding, sep=sep, dtype=SCHEMA_DTYPES
+    )))
+
+    for motor, ler in tentativas:
+        try:
+            _rebobinar(file_like, inicio)
+            df = _ordenar_categorias(ler())
+            df.attrs["motor_csv"] = motor
+            return df
+        except (ValueError, TypeError):
+            continue
+
+    _rebobinar(file_like, inicio)
+    df = pd.read_csv(file_like, header=None, names=COLS, encoding=encoding, sep=sep)
+    df.attrs["motor_csv"] = "pandas-sem-tipos"
+    return df
+
+def relatorio_memoria(df: pd.DataFrame, tamanho_amostra: int = 20_000) -> dict:
+    """
+    Memória do DataFrame (deep) x o mesmo DataFrame lido sem tipos. A estimativa é medida, não modelada:
+    uma amostra volta a CSV, é relida com o read_csv padrão (o que depende da versão do pandas: texto em
+    object no pandas 2, str no 3) e o resultado é extrapolado para o total de linhas.
+    """
+    n = len(df)
+    bytes_atual = int(df.memory_usage(index=True, deep=True).sum())
+    amostra = df.head(tamanho_amostra)
+    bytes_sem_tipos = 0
+    if len(amostra):
+        texto = amostra.to_csv(index=False, header=False)
+        sem_tipos = pd.read_csv(io.StringIO(texto), header=None, names=list(amostra.columns))
+        bytes_amostra = int(sem_tipos.memory_usage(index=True, deep=True).sum())
+        bytes_sem_tipos = int(bytes_amostra * n / len(amostra))
+    return {
+        "linhas": n,
+        "bytes": bytes_atual,
+        "bytes_sem_tipos": bytes_sem_tipos,
+        "motor": df.attrs.get("motor_csv", "?"),
+    }
+
+# =========================
+# Datas
+# =========================
+# Formatos tentados na detecção, na ordem (no empate fica o que vem antes: dia antes do mês)
+FORMATOS_DATA = ["%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S",
+                 "%d.%m.%Y"]
+MAX_EXEMPLOS_REJEITADOS = 5
+
+def detectar_formato_data(valores, tamanho_amostra: int = 500):
+    """
+    Formato de FORMATOS_DATA que interpreta mais valores da amostra (o primeiro que interpreta todos
+    encerra a busca); None se nenhum interpreta nada. Valores ruins viram rejeitados, não mudam o formato.
+    """
+    amostra = pd.Series(valores, dtype=object).dropna()
+    amostra = amostra[amostra != ""].head(tamanho_amostra)
+    melhor, acertos_melhor = None, 0
+    for formato in FORMATOS_DATA:
+        acertos = int(pd.to_datetime(amostra, format=formato, errors="coerce").notna().sum())
+        if acertos > acertos_melhor:
+            melhor, acertos_melhor = formato, acertos
+        if acertos == len(amostra):
+            break
+    return melhor
+
+def converter_datas(serie: pd.Series):
+    """
+    Converte texto em datas interpretando cada valor distinto uma única vez (as datas se repetem muito)
+    e espalhando o resultado pelas linhas com os códigos. O formato é detectado numa amostra dos distintos;
+    se nenhum formato conhecido serve, cai no to_datetime(dayfirst=True).
+    Retorna (datas, relatorio) – o relatório conta vazias e rejeitadas e traz exemplos das rejeitadas.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        return serie, {"formato": None, "distintos": None, "vazias": int(serie.isna().sum()),
+                       "rejeitadas": 0, "exemplos_rejeitados": []}
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, distintos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, distintos = pd.factorize(serie)
+    texto = pd.Index(distintos).astype(str).str.strip()
+
+    formato = detectar_formato_data(texto)
+    if formato is not None:
+        convertidas = pd.to_datetime(texto, format=formato, errors="coerce")
+    else:
+        convertidas = pd.to_datetime(texto, dayfirst=True, errors="coerce")
+
+    # Código -1 (vazio) pega o NaT acrescentado no fim
+    valores = np.append(convertidas.to_numpy(), np.datetime64("NaT", "ns").astype(convertidas.dtype))
+    datas = pd.Series(valores[codigos], index=serie.index, name=serie.name)
+
+    rejeitado = convertidas.isna() & (texto != "")
+    por_valor = np.bincount(codigos[codigos >= 0], minlength=len(texto))
+    relatorio = {
+        "formato": formato,
+        "distintos": len(texto),
+        "vazias": int((codigos < 0).sum() + por_valor[~rejeitado & convertidas.isna()].sum()),
+        "rejeitadas": int(por_valor[rejeitado].sum()),
+        "exemplos_rejeitados": list(texto[rejeitado][:MAX_EXEMPLOS_REJEITADOS]),
+    }
+    return datas, relatorio
+
+def somar_relatorios_datas(relatorios) -> dict:
+    """Junta os relatórios de vários arquivos ou blocos (formatos diferentes aparecem separados por " | ")."""
+    relatorios = [r for r in relatorios if r]
+    exemplos = []
+    for r in relatorios:
+        exemplos += [x for x in r["exemplos_rejeitados"] if x not in exemplos]
+    formatos = list(dict.fromkeys(r["formato"] for r in relatorios if r["formato"]))
+    return {
+        "formato": " | ".join(formatos) or None,
+        "distintos": max((r["distintos"] or 0 for r in relatorios), default=0),
+        "vazias": sum(r["vazias"] for r in relatorios),
+        "rejeitadas": sum(r["rejeitadas"] for r in relatorios),
+        "exemplos_rejeitados": exemplos[:MAX_EXEMPLOS_REJEITADOS],
+    }
+
+def preparar_df(df: pd.DataFrame):
+    """Converte Data_Ultimo_Eps (converter_datas); o relatório da conversão fica em df.attrs["relatorio_datas"]."""
+    df["Data_Ultimo_Eps"], df.attrs["relatorio_datas"] = converter_datas(df["Data_Ultimo_Eps"])
+    return df
+
+# =========================
+# Vários arquivos (um por Ajure, por exemplo)
+# =========================
+REGRAS_DEDUP = ["Data mais recente", "Primeiro arquivo", "Último arquivo", "Sem deduplicação"]
+THREADS_LEITURA = int(os.environ.get("EPS_THREADS_LEITURA", "0")) or (os.cpu_count() or 1)
+
+def _ler_e_preparar(conteudo: bytes, encoding, sep):
+    # Devolve (df, segundos da leitura, segundos das datas): o perfil mostra as duas fases separadas
+    inicio = time.perf_counter()
+    df = carregar_dados(io.BytesIO(conteudo), encoding=encoding, sep=sep)
+    lido = time.perf_counter()
+    df = preparar_df(df)
+    return df, lido - inicio, time.perf_counter() - lido
+
+def concatenar_tipado(partes) -> pd.DataFrame:
+    """pd.concat que mantém as colunas category (união das categorias, em ordem alfabética)."""
+    partes = list(partes)
+    if len(partes) == 1:
+        return partes[0]
+    tipos = {}
+    for col in partes[0].columns:
+        if all(isinstance(p[col].dtype, pd.CategoricalDtype) for p in partes):
+            cats = sorted(set().union(*(p[col].cat.categories for p in partes)), key=str)
+            tipos[col] = pd.CategoricalDtype(cats)
+    return pd.concat([p.astype(tipos) for p in partes], ignore_index=True)
+
+def deduplicar_matricula(df: pd.DataFrame, regra: str = REGRAS_DEDUP[0]):
+    """
+    Deixa uma linha por Matricula segundo `regra` (REGRAS_DEDUP); linhas sem Matricula ficam todas.
+    "Data mais recente": data vazia conta como a mais antiga e, no empate, fica a linha que vem depois
+    (o arquivo enviado por último). Retorna (df, quantidade_de_linhas_removidas).
+    """
+    if regra == REGRAS_DEDUP[3] or df.empty:
+        return df, 0
+    if regra == REGRAS_DEDUP[0]:
+        # NaT vira o menor int64: ordenação estável por data, mantendo a ordem dos arquivos no empate
+        ordem = np.argsort(df["Data_Ultimo_Eps"].to_numpy().view("int64"), kind="stable")
+    else:
+        ordem = np.arange(len(df))
+    manter = "first" if regra == REGRAS_DEDUP[1] else "last"
+
+    repetida = np.empty(len(df), dtype=bool)
+    repetida[ordem] = df["Matricula"].iloc[ordem].duplicated(keep=manter).to_numpy()
+    repetida &= df["Matricula"].notna().to_numpy()
+    removidas = int(repetida.sum())
+    if removidas:
+        df = df[~repetida].reset_index(drop=True)
+    return df, removidas
+
+def carregar_varios(conteudos, encoding="utf-8", sep=",", regra: str = REGRAS_DEDUP[0], threads: int = None):
+    """
+    Lê e prepara vários CSVs (bytes, na ordem do upload) em paralelo, junta e deduplica por Matricula.
+    Threads bastam: os leitores do pyarrow e do pandas soltam o GIL durante o parse.
+    Retorna (df, resumo) com as linhas de cada arquivo, quantas linhas a deduplicação removeu e os
+    segundos de cada fase (leitura e datas por arquivo, junção + deduplicação no total).
+    """
+    conteudos = list(conteudos)
+    threads = max(1, min(len(conteudos), threads or THREADS_LEITURA))
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            lidos = list(executor.map(lambda c: _ler_e_preparar(c, encoding, sep), conteudos))
+    else:
+        lidos = [_ler_e_preparar(c, encoding, sep) for c in conteudos]
+    partes = [df for df, _, _ in lidos]
+
+    motores = sorted({p.attrs.get("motor_csv", "?") for p in partes})
+    linhas_por_arquivo = [len(p) for p in partes]
+    relatorio_datas = somar_relatorios_datas(p.attrs.get("relatorio_datas") for p in partes)
+    inicio = time.perf_counter()
+    df, removidas = deduplicar_matricula(concatenar_tipado(partes), regra)
+    df.attrs.update(motor_csv="+".join(motores), relatorio_datas=relatorio_datas)
+    return df, {
+        "linhas_por_arquivo": linhas_por_arquivo, "removidas": removidas, "regra": regra,
+        "segundos_leitura": [s for _, s, _ in lidos], "segundos_datas": [s for _, _, s in lidos],
+        "segundos_deduplicacao": time.perf_counter() - inicio,
+    }
+
+# =========================
+# Data-limite
+# =========================
+def mapear_para_2025(d_ui: date) -> date:
+    """
+    Recebe a data exibida (UI), normalmente em 2026,
+    e retorna a MESMA data em 2025 (mesmo dia e mês).
+    Se a data for 29/02, ajusta para 28/02/2025 (já que 2025 não é bissexto).
+    """
+    try:
+        return date(2025, d_ui.month, d_ui.day)
+    except ValueError:
+        # Caso típico: 29/02 -> 28/02
+        if d_ui.month == 2 and d_ui.day == 29:
+            return date(2025, 2, 28)
+        # Se quiser outra política (ex.: 01/03), troque a linha acima por:
+        # return date(2025, 3, 1)
+        raise
+
+def limite_calculo(d_ui: date) -> pd.Timestamp:
+    """Timestamp usado para FILTRAR/CONTAR: a data da UI levada para 2025, à meia-noite."""
+    return pd.Timestamp(datetime.combine(mapear_para_2025(d_ui), datetime.min.time()))
+
+# =========================
+# Cache
+# =========================
+def hash_conteudo(conteudo: bytes) -> str:
+    """Hash do conteúdo do arquivo (identifica o MESMO upload entre reruns)."""
+    return hashlib.blake2b(conteudo, digest_size=16).hexdigest()
+
+def hash_conteudos(conteudos, *extras) -> str:
+    """Hash de vários arquivos (a ordem importa) e de opções que mudam o resultado; um arquivo só = hash_conteudo."""
+    return combinar_hashes([hash_conteudo(c) for c in conteudos], *extras)
+
+def combinar_hashes(hashes, *extras) -> str:
+    """Mesmo resultado de hash_conteudos, a partir dos hashes de cada arquivo já calculados."""
+    hashes = list(hashes)
+    if len(hashes) == 1 and not extras:
+        return hashes[0]
+    return hash_conteudo("|".join(hashes + [str(x) for x in extras]).encode())
+
+def _tamanho_em_bytes(obj) -> int:
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return sum(_tamanho_em_bytes(x) for x in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_tamanho_em_bytes(k) + _tamanho_em_bytes(v) for k, v in obj.items())
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+# Sem aviso de fim de sessão no Streamlit: uma sessão "usa" um dataset até ficar este tempo sem rerun
+SESSAO_TTL_S = float(os.environ.get("EPS_SESSAO_TTL_MIN", "30")) * 60
+
+class CacheLRU:
+    """
+    Cache em memória com orçamento de bytes e despejo LRU
+    (quando estoura o orçamento, sai primeiro o item usado há mais tempo).
+    Os valores são compartilhados entre reruns e sessões: NÃO devem ser alterados por quem os recebe.
+
+    Chaves que são tuplas começando pelo hash do dataset podem ser protegidas por sessão: enquanto
+    alguma sessão ativa usa o dataset (usar_dataset), seus itens só saem depois dos demais. A sessão
+    deixa o dataset ao trocar de dataset, ao chamar liberar_sessao ou, sem nada disso, pelo TTL.
+    Pedidos simultâneos da mesma chave geram o valor uma vez só; os outros esperam o resultado.
+    """
+
+    def __init__(self, max_bytes: int, ttl_sessao: float = SESSAO_TTL_S):
+        self.max_bytes = int(max_bytes)
+        self.ttl_sessao = ttl_sessao
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()   # chave -> (valor, tamanho)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._gerando = {}            # chave -> Event de quem está gerando o valor
+        self._sessoes = {}            # sessão -> (hash do dataset, último uso)
+
+    def obter(self, chave, gerar):
+        """Devolve o valor da chave; se não existir, chama gerar() e guarda o resultado."""
+        while True:
+            with self._lock:
+                if chave in self._itens:
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return self._itens[chave][0]
+                evento = self._gerando.get(chave)
+                if evento is None:
+                    self.misses += 1
+                    evento = self._gerando[chave] = threading.Event()
+                    break
+            # Outra sessão já está gerando esta chave: espera e tenta de novo
+            evento.wait()
+
+        try:
+            valor = gerar()
+            self._guardar(chave, valor)
+        finally:
+            with self._lock:
+                del self._gerando[chave]
+            evento.set()
+        return valor
+
+    def _guardar(self, chave, valor):
+        tamanho = _tamanho_em_bytes(valor)
+        if tamanho > self.max_bytes:
+            # Maior que o orçamento inteiro: devolve sem guardar
+            return
+
+        with self._lock:
+            if chave in self._itens:
+                self._bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            if self._bytes > self.max_bytes:
+                self._despejar()
+
+    def _despejar(self):
+        # Primeiro os itens de datasets que nenhuma sessão ativa usa; se não bastar, os demais (LRU)
+        em_uso = self._datasets_em_uso()
+        for protegidos in (False, True):
+            for chave in list(self._itens):
+                if self._bytes <= self.max_bytes:
+                    return
+                if protegidos or not self._protegida(chave, em_uso):
+                    self._bytes -= self._itens.pop(chave)[1]
+
+    @staticmethod
+    def _protegida(chave, em_uso) -> bool:
+        return isinstance(chave, tuple) and bool(chave) and chave[0] in em_uso
+
+    def usar_dataset(self, sessao, hash_dataset: str):
+        """Registra que `sessao` está usando o dataset agora (troca o que ela usava antes)."""
+        with self._lock:
+            self._sessoes[sessao] = (hash_dataset, time.monotonic())
+
+    def liberar_sessao(self, sessao):
+        """A sessão não usa mais nenhum dataset (sem isso, ela só sai depois de `ttl_sessao` sem uso)."""
+        with self._lock:
+            self._sessoes.pop(sessao, None)
+
+    def _datasets_em_uso(self) -> dict:
+        # hash -> quantidade de sessões ativas (as expiradas são esquecidas aqui)
+        agora = time.monotonic()
+        for sessao in [s for s, (_, t) in self._sessoes.items() if agora - t > self.ttl_sessao]:
+            del self._sessoes[sessao]
+        refs = {}
+        for hash_dataset, _ in self._sessoes.values():
+            refs[hash_dataset] = refs.get(hash_dataset, 0) + 1
+        return refs
+
+    def sessoes_usando(self, hash_dataset: str) -> int:
+        with self._lock:
+            return self._datasets_em_uso().get(hash_dataset, 0)
+
+    def contem(self, chave) -> bool:
+        with self._lock:
+            return chave in self._itens
+
+    def pegar(self, chave, padrao=None):
+        """Valor da chave se ela estiver no cache (sem gerar nada); senão `padrao`."""
+        with self._lock:
+            if chave not in self._itens:
+                return padrao
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return self._itens[chave][0]
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            em_uso = self._datasets_em_uso()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "sessoes": sum(em_uso.values()),
+                "datasets_em_uso": len(em_uso),
+                "bytes_em_uso": sum(t for k, (_, t) in self._itens.items() if self._protegida(k, em_uso)),
+            }
+
+# =========================
+# Agregação (memória cheia ou em blocos)
+# =========================
+# Chaves do cubo de contagens: qualquer nível (ou combinação) sai de uma soma sobre ele
+COLS_AGREGACAO = ["Ajure", "Prefixo", "Uor", "Cargo"]
+# O que o painel (cubo, índice, curva, Dependência de cada Prefixo) lê; o resto só serve às listas
+COLS_PAINEL = COLS_AGREGACAO + ["Dependencia", "Data_Ultimo_Eps"]
+
+def contar_por_grupo(df: pd.DataFrame, limite, chaves=COLS_AGREGACAO) -> pd.DataFrame:
+    """
+    Total de registros e pendentes (Data_Ultimo_Eps < limite) por grupo.
+    Valores ausentes nas chaves formam um grupo próprio (NA).
+    """
+    pendente = (df["Data_Ultimo_Eps"] < limite).astype("int64")
+    return (df[chaves]
+            .assign(Total=1, Pendentes=pendente)
+            .groupby(chaves, dropna=False, observed=True)[["Total", "Pendentes"]]
+            .sum())
+
+def _somar_contagens(parciais, chaves=COLS_AGREGACAO) -> pd.DataFrame:
+    return pd.concat(parciais).groupby(level=chaves, dropna=False, observed=True).sum()
+
+def primeira_dependencia(df: pd.DataFrame) -> pd.DataFrame:
+    """Prefixo -> primeira Dependencia encontrada (mesma regra do drop_duplicates da sidebar)."""
+    return df[["Prefixo", "Dependencia"]].drop_duplicates(subset=["Prefixo"], keep="first")
+
+def ler_em_blocos(file_like, colunas=None, encoding="utf-8", sep=",", linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Gera DataFrames tipados de até `linhas_por_bloco` linhas, lendo o CSV aos poucos.
+    Só as `colunas` pedidas são convertidas; as demais são descartadas pelo parser.
+    `file_like` também pode ser uma lista (vários uploads): os arquivos são lidos um depois
+    do outro, sem juntar os bytes e sem deduplicar.
+    """
+    arquivos = file_like if isinstance(file_like, (list, tuple)) else [file_like]
+    colunas = list(colunas or COLS)
+    for arquivo in arquivos:
+        leitor = pd.read_csv(
+            arquivo, header=None, names=COLS, usecols=colunas, encoding=encoding, sep=sep,
+            dtype={c: SCHEMA_DTYPES[c] for c in colunas}, chunksize=linhas_por_bloco
+        )
+        with leitor:
+            for bloco in leitor:
+                yield bloco
+
+def agregar_em_blocos(file_like, limite, encoding="utf-8", sep=",", linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê o CSV em blocos acumulando Total/Pendentes por Ajure/Prefixo/Uor/Cargo, sem guardar as linhas.
+    O pico de memória depende do tamanho do bloco e do número de grupos, não do tamanho do arquivo.
+    Retorna (contagens, prefixo_dependencia); o relatório das datas fica em contagens.attrs["relatorio_datas"].
+    """
+    colunas = COLS_AGREGACAO + ["Dependencia", "Data_Ultimo_Eps"]
+    parciais, dependencias, relatorios = [], [], []
+    for bloco in ler_em_blocos(file_like, colunas, encoding, sep, linhas_por_bloco):
+        bloco = preparar_df(bloco)
+        relatorios.append(bloco.attrs["relatorio_datas"])
+        parciais.append(contar_por_grupo(bloco, limite))
+        dependencias.append(primeira_dependencia(bloco))
+        # Compacta de tempos em tempos para a lista de parciais não crescer com o arquivo
+        if len(parciais) >= 16:
+            parciais = [_somar_contagens(parciais)]
+            dependencias = [pd.concat(dependencias).drop_duplicates(subset=["Prefixo"], keep="first")]
+
+    if not parciais:
+        vazio = pd.DataFrame(columns=COLS_AGREGACAO + ["Total", "Pendentes"]).set_index(COLS_AGREGACAO)
+        return vazio, pd.DataFrame(columns=["Prefixo", "Dependencia"])
+
+    contagens = _somar_contagens(parciais)
+    contagens.attrs["relatorio_datas"] = somar_relatorios_datas(relatorios)
+    prefixo_dep = pd.concat(dependencias).drop_duplicates(subset=["Prefixo"], keep="first")
+    return contagens, prefixo_dep.reset_index(drop=True)
+
+def _mascara_rotulo(serie: pd.Series, valor) -> pd.Series:
+    # Mesmo rótulo do _rotulo_grupo (usado pelo CuboEps): ausente ou em branco é "NA"
+    texto = serie.astype("string")
+    rotulo = texto.mask(texto.str.strip().eq("").fillna(True), "NA")
+    return rotulo.eq(str(valor)).astype(bool)
+
+def ler_pendentes_em_blocos(file_like, limite, filtros=None, encoding="utf-8", sep=",",
+                            linhas_por_bloco=LINHAS_POR_BLOCO) -> pd.DataFrame:
+    """
+    Materializa só as linhas pendentes (opcionalmente filtradas, ex.: {"Prefixo": "8553", "Uor": "NA"}),
+    lendo o CSV em blocos. "NA" no filtro seleciona valores ausentes ou em branco, como no CuboEps.
+    """
+    partes = []
+    for bloco in ler_em_blocos(file_like, COLS, encoding, sep, linhas_por_bloco):
+        bloco = preparar_df(bloco)
+        mask = bloco["Data_Ultimo_Eps"] < limite
+        for col, valor in (filtros or {}).items():
+            mask &= _mascara_rotulo(bloco[col], valor)
+        if mask.any():
+            partes.append(bloco[mask])
+
+    if not partes:
+        return preparar_df(pd.DataFrame({c: pd.Series(dtype=SCHEMA_DTYPES[c]) for c in COLS}))
+    pendentes = pd.concat(partes, ignore_index=True)
+    # Cada bloco tem suas próprias categorias; o concat as transforma em texto – volta para category
+    for col in COLS_CATEGORICAS:
+        if col in pendentes.columns and col != "Data_Ultimo_Eps":
+            pendentes[col] = pendentes[col].astype("category")
+    return pendentes
+
+def porcentagem_por_contagens(contagens: pd.DataFrame, prefixo_escolhido=None):
+    """Mesmo retorno de calcular_porcentagem_eps, mas a partir das contagens agregadas."""
+    if prefixo_escolhido is None or prefixo_escolhido == "Todos":
+        sel = contagens
+    else:
+        prefixos = contagens.index.get_level_values("Prefixo")
+        if prefixo_escolhido == "NA":
+            sel = contagens[prefixos.isna()]
+        else:
+            sel = contagens[prefixos.astype(str) == str(prefixo_escolhido)]
+
+    total = int(sel["Total"].sum())
+    qtd_antes = int(sel["Pendentes"].sum())
+    porcentagem = (qtd_antes / total * 100) if total > 0 else 0.0
+    return porcentagem, total, qtd_antes
+
+# =========================
+# Índice de grupos (Prefixo e Prefixo+Uor)
+# =========================
+def _rotulo_grupo(x) -> str:
+    return "NA" if pd.isna(x) or str(x).strip() == "" else str(x)
+
+def _posicoes_por_rotulo(grupos: dict, rotular) -> dict:
+    # Chaves diferentes podem virar o mesmo rótulo (ex.: NaN e "" -> "NA"): junta as posições
+    out = {}
+    for chave, posicoes in grupos.items():
+        rotulo = rotular(chave)
+        out[rotulo] = np.sort(np.concatenate([out[rotulo], posicoes])) if rotulo in out else posicoes
+    return out
+
+class IndiceGrupos:
+    """
+    Posições (iloc) das linhas de cada Prefixo e de cada (Prefixo, Uor), montadas uma vez por dataset.
+    As chaves são texto e valores ausentes viram a chave explícita "NA", então filtros, KPIs e
+    listas de pendentes custam O(tamanho do grupo) em vez de um astype(str) na coluna inteira.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_linhas = len(df)
+        grupos_prefixo = df.groupby("Prefixo", dropna=False, observed=True).indices
+        # Com uma só chave category, o .indices omite o grupo NaN mesmo com dropna=False
+        sem_prefixo = np.flatnonzero(df["Prefixo"].isna().to_numpy())
+        if len(sem_prefixo):
+            grupos_prefixo = {**grupos_prefixo, np.nan: sem_prefixo}
+        self.por_prefixo = _posicoes_por_rotulo(grupos_prefixo, _rotulo_grupo)
+        self.por_uor = _posicoes_por_rotulo(
+            df.groupby(["Prefixo", "Uor"], dropna=False, observed=True).indices,
+            lambda chave: (_rotulo_grupo(chave[0]), _rotulo_grupo(chave[1]))
+        )
+        self.uors_por_prefixo = {}
+        for pref, uor in self.por_uor:
+            self.uors_por_prefixo.setdefault(pref, []).append(uor)
+        for uors in self.uors_por_prefixo.values():
+            uors.sort()
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(p.nbytes for p in self.por_prefixo.values())
+                + sum(p.nbytes for p in self.por_uor.values()))
+
+    def linhas_prefixo(self, prefixo) -> np.ndarray:
+        return self.por_prefixo.get(_rotulo_grupo(prefixo), np.empty(0, dtype=np.intp))
+
+    def linhas_uor(self, prefixo, uor) -> np.ndarray:
+        chave = (_rotulo_grupo(prefixo), _rotulo_grupo(uor))
+        return self.por_uor.get(chave, np.empty(0, dtype=np.intp))
+
+    def uors_do_prefixo(self, prefixo) -> list:
+        return self.uors_por_prefixo.get(_rotulo_grupo(prefixo), [])
+
+    def com_delta(self, n_linhas: int, linhas_saiu, saiu: pd.DataFrame, linhas_entrou, entrou: pd.DataFrame):
+        """
+        Novo índice depois de aplicar_delta, sem reagrupar o arquivo: as linhas `saiu` deixam os grupos
+        em que estavam (posições `linhas_saiu`) e as `entrou` passam aos seus (posições `linhas_entrou`
+        no dataset corrigido, com `n_linhas` linhas). Só os grupos tocados são refeitos; este não muda.
+        """
+        novo = object.__new__(IndiceGrupos)
+        novo.n_linhas = n_linhas
+        novo.por_prefixo = dict(self.por_prefixo)
+        novo.por_uor = dict(self.por_uor)
+
+        def _rotulos(parte):
+            prefixos = [_rotulo_grupo(p) for p in parte["Prefixo"]]
+            return prefixos, list(zip(prefixos, (_rotulo_grupo(u) for u in parte["Uor"])))
+
+        for grupos, rotulos_saiu, rotulos_entrou in zip(
+            (novo.por_prefixo, novo.por_uor), _rotulos(saiu), _rotulos(entrou)
+        ):
+            remover, incluir = {}, {}
+            for rotulo, linha in zip(rotulos_saiu, linhas_saiu):
+                remover.setdefault(rotulo, []).append(linha)
+            for rotulo, linha in zip(rotulos_entrou, linhas_entrou):
+                incluir.setdefault(rotulo, []).append(linha)
+            # As posições de cada grupo são ordenadas e sem repetição: busca binária, sem reordenar o grupo
+            for rotulo in remover.keys() | incluir.keys():
+                posicoes = grupos.get(rotulo, np.empty(0, dtype=np.intp))
+                if rotulo in remover:
+                    posicoes = np.delete(posicoes, np.searchsorted(posicoes, remover[rotulo]))
+                if rotulo in incluir:
+                    novas = np.sort(np.asarray(incluir[rotulo], dtype=np.intp))
+                    posicoes = np.insert(posicoes, np.searchsorted(posicoes, novas), novas)
+                if len(posicoes):
+                    grupos[rotulo] = posicoes
+                else:
+                    grupos.pop(rotulo, None)
+
+        novo.uors_por_prefixo = {}
+        for pref, uor in sorted(novo.por_uor):
+            novo.uors_por_prefixo.setdefault(pref, []).append(uor)
+        return novo
+
+def calcular_porcentagem_eps(dados: pd.DataFrame, dados_antes: pd.DataFrame, prefixo_escolhido=None,
+                             indice: IndiceGrupos = None, pendente: np.ndarray = None):
+    """
+    Percentual, total e pendentes (geral ou de um Prefixo).
+    Com `indice` e `pendente` (máscara booleana alinhada a `dados`) a conta usa só as linhas do grupo.
+    """
+    if prefixo_escolhido is None or prefixo_escolhido == "Todos":
+        total = len(dados)
+        qtd_antes = len(dados_antes) if pendente is None else int(pendente.sum())
+    elif indice is not None and pendente is not None:
+        posicoes = indice.linhas_prefixo(prefixo_escolhido)
+        total = len(posicoes)
+        qtd_antes = int(pendente[posicoes].sum())
+    else:
+        total = (dados["Prefixo"].astype(str) == str(prefixo_escolhido)).sum()
+        qtd_antes = (dados_antes["Prefixo"].astype(str) == str(prefixo_escolhido)).sum()
+
+    porcentagem = (qtd_antes / total * 100) if total > 0 else 0.0
+    return porcentagem, total, qtd_antes
+
+def totais_por_prefixo(contagens: pd.DataFrame):
+    """(totais, pendentes) por Prefixo a partir das contagens, em ordem decrescente (como value_counts)."""
+    totais = contagens["Total"].groupby(level="Prefixo", observed=True).sum().sort_values(ascending=False)
+    antes = contagens["Pendentes"].groupby(level="Prefixo", observed=True).sum().sort_values(ascending=False)
+    return totais, antes
+
+# =========================
+# Cubo de agregação (Ajure / Prefixo / Uor / Cargo)
+# =========================
+class CuboEps:
+    """
+    Total e pendentes por (Ajure, Prefixo, Uor, Cargo), calculado uma vez por dataset e data-limite.
+    KPIs, gráficos e tabelas leem daqui: cada nível é uma soma sobre o cubo (algumas milhares de
+    linhas, não o arquivo) feita uma vez e memorizada, com rótulos em texto e "NA" para ausentes.
+    """
+
+    def __init__(self, contagens: pd.DataFrame):
+        self.contagens = contagens
+        self._por_nivel = {}
+        self._uors = None
+        self._totais = None
+
+    @classmethod
+    def de_dados(cls, df: pd.DataFrame, limite) -> "CuboEps":
+        return cls(contar_por_grupo(df, limite, COLS_AGREGACAO))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.contagens.memory_usage(index=True, deep=True).sum()) + sum(
+            int(t.memory_usage(index=True, deep=True).sum()) for t in self._por_nivel.values()
+        )
+
+    @property
+    def total(self) -> int:
+        return int(self.contagens["Total"].sum())
+
+    @property
+    def pendentes(self) -> int:
+        return int(self.contagens["Pendentes"].sum())
+
+    def por(self, *niveis) -> pd.DataFrame:
+        """Total e Pendentes somados por `niveis` (ex.: por("Prefixo"), por("Prefixo", "Uor"))."""
+        niveis = tuple(niveis)
+        if niveis not in self._por_nivel:
+            soma = self.contagens.groupby(level=list(niveis), dropna=False, observed=True)[["Total", "Pendentes"]].sum()
+            # Rótulos em texto; NaN e "" caem juntos em "NA"
+            if len(niveis) == 1:
+                rotulos = soma.index.map(_rotulo_grupo)
+            else:
+                rotulos = pd.MultiIndex.from_tuples(
+                    [tuple(_rotulo_grupo(v) for v in chave) for chave in soma.index], names=list(niveis)
+                )
+            soma.index = rotulos.rename(list(niveis) if len(niveis) > 1 else niveis[0])
+            self._por_nivel[niveis] = soma.groupby(level=list(niveis)).sum()
+        return self._por_nivel[niveis]
+
+    def porcentagem(self, prefixo_escolhido=None):
+        """Mesmo retorno de calcular_porcentagem_eps: (percentual, total, pendentes)."""
+        if prefixo_escolhido is None or prefixo_escolhido == "Todos":
+            total, qtd_antes = self.total, self.pendentes
+        else:
+            por_prefixo = self.por("Prefixo")
+            chave = str(prefixo_escolhido)
+            if chave in por_prefixo.index:
+                total, qtd_antes = (int(v) for v in por_prefixo.loc[chave, ["Total", "Pendentes"]])
+            else:
+                total, qtd_antes = 0, 0
+        porcentagem = (qtd_antes / total * 100) if total > 0 else 0.0
+        return porcentagem, total, qtd_antes
+
+    def uors_do_prefixo(self, prefixo) -> list:
+        if self._uors is None:
+            self._uors = {}
+            for pref, uor in self.por("Prefixo", "Uor").index:
+                self._uors.setdefault(pref, []).append(uor)
+        return self._uors.get(str(prefixo), [])
+
+    def totais_por_prefixo(self):
+        """(totais, pendentes) por Prefixo, como totais_por_prefixo, memorizado."""
+        if self._totais is None:
+            self._totais = totais_por_prefixo(self.contagens)
+        return self._totais
+
+    def com_delta(self, saiu: pd.DataFrame, entrou: pd.DataFrame, limite) -> "CuboEps":
+        """
+        Novo cubo sem as linhas `saiu` e com as `entrou` (ver aplicar_delta), na mesma data-limite:
+        custa o tamanho do delta mais o número de grupos, não o do arquivo. O cubo atual não muda.
+        """
+        contagens = _somar_contagens([
+            self.contagens, -contar_por_grupo(saiu, limite), contar_por_grupo(entrou, limite)
+        ])
+        return CuboEps(contagens[contagens["Total"] > 0])
+
+# =========================
+# Varredura de datas-limite
+# =========================
+def limites_periodicos(inicio_ui: date, fim_ui: date, freq: str = "W-SUN"):
+    """
+    Datas-limite da UI entre inicio e fim (frequência do pandas, ex.: "W-SUN", "SMS", "MS")
+    e os Timestamps de cálculo correspondentes (levados para 2025).
+    """
+    datas_ui = [d.date() for d in pd.date_range(inicio_ui, fim_ui, freq=freq)]
+    if not datas_ui or datas_ui[-1] != fim_ui:
+        datas_ui.append(fim_ui)
+    return datas_ui, [limite_calculo(d) for d in datas_ui]
+
+def _ordenar_rotulos(df: pd.DataFrame) -> pd.DataFrame:
+    return df.loc[sorted(df.index, key=str)]
+
+def _contar_varredura(datas: pd.Series, grupos: pd.Series, limites: np.ndarray):
+    # rótulos e códigos dos grupos (NA vira o grupo "NA")
+    codigos, valores = pd.factorize(grupos, use_na_sentinel=False)
+    rotulos = [_rotulo_grupo(v) for v in valores]
+
+    # Linha pendente para o limite j  <=>  data < limites[j]  <=>  j >= searchsorted(limites, data, "right")
+    m = len(limites)
+    valores_data = datas.to_numpy(dtype="datetime64[ns]")
+    primeiro = np.searchsorted(limites, valores_data, side="right")
+    primeiro[np.isnat(valores_data)] = m          # sem data nunca conta como pendente
+
+    contagem = np.bincount(codigos * (m + 1) + primeiro, minlength=len(rotulos) * (m + 1))
+    contagem = contagem.reshape(len(rotulos), m + 1)
+    pendentes = np.cumsum(contagem, axis=1)[:, :m]
+    totais = contagem.sum(axis=1)
+
+    por_rotulo = pd.DataFrame(pendentes, index=rotulos)
+    por_rotulo["_total"] = totais
+    # rótulos repetidos (ex.: NaN e "") são somados
+    return por_rotulo.groupby(level=0, sort=False).sum()
+
+def varrer_datas_limite(datas: pd.Series, grupos: pd.Series, limites):
+    """
+    Pendentes por grupo para muitas datas-limite numa passada só: as datas são localizadas entre os
+    limites com um searchsorted e as contagens acumuladas ao longo dos limites.
+    Retorna (matriz grupo x limite de pendentes, total de registros por grupo).
+    """
+    limites = pd.DatetimeIndex(limites)
+    ordem = np.argsort(limites.to_numpy(dtype="datetime64[ns]"), kind="stable")
+    limites_ord = limites.to_numpy(dtype="datetime64[ns]")[ordem]
+
+    tabela = _contar_varredura(datas, grupos, limites_ord)
+    totais = tabela.pop("_total").rename("Total")
+    matriz = tabela.iloc[:, np.argsort(ordem)]
+    matriz.columns = limites
+    matriz = _ordenar_rotulos(matriz)
+    return matriz, totais.reindex(matriz.index)
+
+def varrer_em_blocos(file_like, limites, grupo: str = "Prefixo", encoding="utf-8", sep=",",
+                     linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Mesma saída de varrer_datas_limite, lendo só a data e o grupo do CSV, bloco a bloco."""
+    limites = pd.DatetimeIndex(limites)
+    ordem = np.argsort(limites.to_numpy(dtype="datetime64[ns]"), kind="stable")
+    limites_ord = limites.to_numpy(dtype="datetime64[ns]")[ordem]
+
+    acumulado = None
+    for bloco in ler_em_blocos(file_like, [grupo, "Data_Ultimo_Eps"], encoding, sep, linhas_por_bloco):
+        bloco = preparar_df(bloco)
+        parcial = _contar_varredura(bloco["Data_Ultimo_Eps"], bloco[grupo], limites_ord)
+        acumulado = parcial if acumulado is None else acumulado.add(parcial, fill_value=0)
+
+    if acumulado is None:
+        acumulado = pd.DataFrame(columns=list(range(len(limites))) + ["_total"])
+    acumulado = acumulado.astype("int64")
+    totais = acumulado.pop("_total").rename("Total")
+    matriz = acumulado.iloc[:, np.argsort(ordem)]
+    matriz.columns = limites
+    matriz = _ordenar_rotulos(matriz)
+    return matriz, totais.reindex(matriz.index)
+
+# =========================
+# Meta por Prefixo
+# =========================
+METODOS_META = ["Arredondado", "Compensado (maior resto)"]
+NIVEIS_META = ["Ajure", "Prefixo", "Uor"]
+
+def rotulo_meta(meta_pct: float) -> str:
+    """0.9 -> "90%", 0.925 -> "92.5%"."""
+    return f"{round(meta_pct * 100, 2):g}%"
+
+def colunas_meta(meta_pct: float, metodo: str):
+    """Nomes das colunas (meta, faltam) da tabela_meta para a meta e o método escolhidos."""
+    r = rotulo_meta(meta_pct)
+    if metodo == "Arredondado":
+        return f"Meta_{r}_Qtd", f"Faltam para {r}"
+    return f"Meta_{r}_Qtd (compensado)", f"Faltam para {r} (compensado)"
+
+def _meta_exata(meta_pct, totais) -> np.ndarray:
+    # meta_pct * Total sem ruído de ponto flutuante (0.9 * 70 = 63.00000000000001)
+    return np.round(np.asarray(meta_pct, dtype=float) * np.asarray(totais, dtype=float), 9)
+
+def _maior_resto(resto: np.ndarray, grupo: np.ndarray, vagas: np.ndarray) -> np.ndarray:
+    """
+    Método do maior resto dentro de cada grupo, sem laço: ordena por (grupo, resto desc.) e
+    dá +1 às `vagas[g]` primeiras posições de cada grupo g. Empates ficam na ordem original.
+    """
+    n = len(resto)
+    # Restos arredondados como as metas: 16.4 - 16 e 21.4 - 21 não podem desempatar pelo ruído do float
+    ordem = np.lexsort((np.arange(n), -np.round(resto, 9), grupo))
+    grupo_ord = grupo[ordem]
+    posicao = np.arange(n) - np.searchsorted(grupo_ord, grupo_ord, side="left")
+    extra = np.zeros(n, dtype=np.int64)
+    extra[ordem] = posicao < vagas[grupo_ord]
+    return extra
+
+def tabela_meta(totais: pd.Series, antes: pd.Series, meta_pct: float = DEFAULT_META_PCT,
+                metodo: str = "Arredondado") -> pd.DataFrame:
+    """
+    Total, pendentes e quanto falta para a meta em cada Prefixo.
+    "Arredondado": meta = ceil(meta_pct * Total) em cada Prefixo.
+    "Compensado (maior resto)": distribui as frações pelo método do maior resto,
+    para a soma das faltas bater com a meta do conjunto.
+    """
+    idx = sorted(totais.index.union(antes.index), key=lambda x: str(x))
+    dfm = pd.DataFrame(index=idx)
+    dfm["Total"] = totais.reindex(idx).fillna(0).astype(int)
+    dfm["Pendentes"] = antes.reindex(idx).fillna(0).astype(int)
+    meta_col, faltam_col = colunas_meta(meta_pct, metodo)
+
+    if metodo == "Arredondado":
+        dfm[meta_col] = np.ceil(_meta_exata(meta_pct, dfm["Total"])).astype(int)
+        dfm[faltam_col] = (dfm[meta_col] - dfm["Pendentes"]).clip(lower=0).astype(int)
+        return dfm
+
+    ideal_pos = np.clip(_meta_exata(meta_pct, dfm["Total"]) - dfm["Pendentes"].to_numpy(), 0, None)
+    base = np.floor(ideal_pos).astype(np.int64)
+    vagas = np.array([max(0, int(round(ideal_pos.sum())) - int(base.sum()))])
+    faltam_comp = base + _maior_resto(ideal_pos - base, np.zeros(len(base), dtype=np.int64), vagas)
+
+    dfm[meta_col] = dfm["Pendentes"] + faltam_comp
+    dfm[faltam_col] = faltam_comp
+    return dfm
+
+def alocar_meta_hierarquica(contagens: pd.DataFrame, meta_pct=DEFAULT_META_PCT,
+                            niveis=NIVEIS_META) -> pd.DataFrame:
+    """
+    Distribui quanto falta para a meta descendo a hierarquia (por padrão Ajure -> Prefixo -> Uor):
+    o total geral é arredondado uma vez e cada nível recebe o piso do seu ideal mais as sobras do
+    pai pelo maior resto. Assim a soma das UORs bate com o Prefixo, a dos Prefixos com a Ajure
+    e a das Ajures com o total.
+
+    `contagens` é a saída de contar_por_grupo. `meta_pct` pode ser um número ou uma Series
+    indexada pelos valores do primeiro nível (meta por Ajure, por exemplo).
+    Retorna uma linha por caminho completo com Total, Pendentes, Meta e Faltam.
+    """
+    niveis = list(niveis)
+    folhas = contagens.groupby(level=niveis, observed=True, dropna=False, sort=True)[["Total", "Pendentes"]].sum()
+    folhas = folhas[folhas["Total"] > 0]
+
+    if isinstance(meta_pct, pd.Series):
+        pct = meta_pct.reindex(folhas.index.get_level_values(0)).fillna(DEFAULT_META_PCT).to_numpy()
+    else:
+        pct = meta_pct
+    ideal = np.clip(_meta_exata(pct, folhas["Total"]) - folhas["Pendentes"].to_numpy(), 0, None)
+
+    # Código do nó de cada folha em cada nível (caminho até aquele nível)
+    codigos = [folhas.groupby(level=niveis[:k + 1], observed=True, dropna=False, sort=False).ngroup().to_numpy()
+               for k in range(len(niveis))]
+
+    alocado_pai = np.array([int(round(ideal.sum()))])
+    pai_da_folha = np.zeros(len(folhas), dtype=np.int64)
+    for cod in codigos:
+        n_nos = cod.max() + 1 if len(cod) else 0
+        valor = np.round(np.bincount(cod, weights=ideal, minlength=n_nos), 9)
+        pai = np.zeros(n_nos, dtype=np.int64)
+        pai[cod] = pai_da_folha
+
+        base = np.floor(valor).astype(np.int64)
+        vagas = np.maximum(alocado_pai - np.bincount(pai, weights=base, minlength=len(alocado_pai)).astype(np.int64), 0)
+        alocado_pai = base + _maior_resto(valor - base, pai, vagas)
+        pai_da_folha = cod
+
+    saida = folhas.copy()
+    saida["Faltam"] = alocado_pai[pai_da_folha]
+    saida["Meta"] = saida["Pendentes"] + saida["Faltam"]
+    return saida[["Total", "Pendentes", "Meta", "Faltam"]]
+
+def resumir_meta(alocacao: pd.DataFrame, nivel: str) -> pd.DataFrame:
+    """Soma a alocação hierárquica até um nível (ex.: "Prefixo") e acrescenta %Pendentes."""
+    resumo = alocacao.groupby(level=nivel, observed=True, dropna=False).sum()
+    resumo["%Pendentes"] = (resumo["Pendentes"] / resumo["Total"] * 100).round(1)
+    return resumo
+
+# =========================
+# Comparação entre datasets (semana anterior x atual)
+# =========================
+COLS_LISTA_DIFF = ["Matricula", "Nome_Funcionario", "Ajure", "Prefixo", "Uor", "Cargo", "Data_Ultimo_Eps"]
+
+def deltas_por_grupo(cubo_antes: "CuboEps", cubo_depois: "CuboEps", niveis=("Prefixo",)) -> pd.DataFrame:
+    """
+    Total e Pendentes antes/depois por `niveis` (grupos que só existem num lado contam 0 no outro),
+    com as diferenças e a variação do % pendente. Ordenado do que mais melhorou para o que mais piorou.
+    """
+    antes = cubo_antes.por(*niveis)
+    depois = cubo_depois.por(*niveis)
+    tabela = antes.join(depois, how="outer", lsuffix="_antes", rsuffix="_depois").fillna(0).astype("int64")
+    tabela["Delta_total"] = tabela["Total_depois"] - tabela["Total_antes"]
+    tabela["Delta_pendentes"] = tabela["Pendentes_depois"] - tabela["Pendentes_antes"]
+    for lado in ("antes", "depois"):
+        total = tabela[f"Total_{lado}"]
+        tabela[f"%Pendentes_{lado}"] = (tabela[f"Pendentes_{lado}"] / total.where(total > 0) * 100).fillna(0).round(1)
+    tabela["Delta_%"] = (tabela["%Pendentes_depois"] - tabela["%Pendentes_antes"]).round(1)
+    return tabela.sort_values(["Delta_%", "Delta_pendentes"], kind="stable")
+
+def _uma_linha_por_matricula(df: pd.DataFrame) -> pd.DataFrame:
+    # Só copia o DataFrame se houver Matricula vazia ou repetida
+    sem_matricula = df["Matricula"].isna()
+    if sem_matricula.any():
+        df = df[~sem_matricula]
+    return deduplicar_matricula(df, REGRAS_DEDUP[0])[0]
+
+def comparar_datasets(antes: pd.DataFrame, depois: pd.DataFrame, limite, niveis=("Prefixo", "Uor"),
+                      cubo_antes: "CuboEps" = None, cubo_depois: "CuboEps" = None) -> dict:
+    """
+    Compara dois datasets (mesma data-limite) casando os funcionários pela Matricula, sem laços por linha:
+    um índice de hash das matrículas de `antes` dá, para cada linha de `depois`, a linha correspondente.
+    Matrícula repetida num lado fica com a data mais recente; linhas sem Matricula só entram nas contagens.
+
+    Retorna um dict com:
+      - "por_grupo": deltas_por_grupo por `niveis`; "por_prefixo": idem só por Prefixo
+      - "regularizados": pendentes antes que não estão mais pendentes
+      - "novos_pendentes": pendentes agora que não estavam (inclusive os que não existiam antes)
+      - "entradas" / "saidas": matrículas que só aparecem em `depois` / só em `antes`
+      - "resumo": as quantidades de cada lista
+    As listas trazem COLS_LISTA_DIFF de `depois` (de `antes` nas saídas) e Data_anterior quando houver.
+    """
+    cubo_antes = cubo_antes or CuboEps.de_dados(antes, limite)
+    cubo_depois = cubo_depois or CuboEps.de_dados(depois, limite)
+
+    antes, depois = _uma_linha_por_matricula(antes), _uma_linha_por_matricula(depois)
+
+    pos_antes = pd.Index(antes["Matricula"]).get_indexer(depois["Matricula"])
+    casado = pos_antes >= 0
+    pendente_antes = (antes["Data_Ultimo_Eps"] < limite).to_numpy()
+    pendente_depois = (depois["Data_Ultimo_Eps"] < limite).to_numpy()
+    estava_pendente = np.zeros(len(depois), dtype=bool)
+    estava_pendente[casado] = pendente_antes[pos_antes[casado]]
+
+    presente_depois = np.zeros(len(antes), dtype=bool)
+    presente_depois[pos_antes[casado]] = True
+
+    def _lista(mascara):
+        lista = depois.loc[mascara, COLS_LISTA_DIFF].reset_index(drop=True)
+        anteriores = pos_antes[mascara]
+        datas = antes["Data_Ultimo_Eps"].to_numpy()[np.where(anteriores >= 0, anteriores, 0)]
+        lista["Data_anterior"] = pd.Series(datas).where(anteriores >= 0)
+        return lista
+
+    resultado = {
+        "por_grupo": deltas_por_grupo(cubo_antes, cubo_depois, niveis),
+        "por_prefixo": deltas_por_grupo(cubo_antes, cubo_depois, ("Prefixo",)),
+        "regularizados": _lista(casado & estava_pendente & ~pendente_depois),
+        "novos_pendentes": _lista(pendente_depois & ~estava_pendente),
+        "entradas": _lista(~casado),
+        "saidas": antes.loc[~presente_depois, COLS_LISTA_DIFF].reset_index(drop=True),
+    }
+    resultado["resumo"] = {
+        "pendentes_antes": cubo_antes.pendentes,
+        "pendentes_depois": cubo_depois.pendentes,
+        **{nome: len(resultado[nome]) for nome in ("regularizados", "novos_pendentes", "entradas", "saidas")},
+    }
+    return resultado
+
+# =========================
+# Correções (CSV delta com upserts por Matricula)
+# =========================
+def indice_matriculas(df: pd.DataFrame) -> pd.Series:
+    """
+    Posição da linha de cada Matricula em `df` (a última, se repetida; sem as vazias).
+    Montar custa uma passada no arquivo; guardado junto do dataset, cada correção só consulta o índice.
+    """
+    posicoes = pd.Series(np.arange(len(df)), index=pd.Index(df["Matricula"]))
+    posicoes = posicoes[posicoes.index.notna()]
+    if not posicoes.index.is_unique:
+        posicoes = posicoes[~posicoes.index.duplicated(keep="last")]
+    return posicoes
+
+def _tipos_com_categorias_novas(df: pd.DataFrame, extra: pd.DataFrame) -> dict:
+    # Categorias que só existem em `extra` vão para o fim: os códigos de `df` continuam valendo
+    tipos = {}
+    for col in df.columns:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype) or col not in extra.columns:
+            continue
+        atuais = df[col].cat.categories
+        valores = extra[col].cat.categories if isinstance(extra[col].dtype, pd.CategoricalDtype) \
+            else pd.Index(extra[col].dropna().unique())
+        novas = valores.difference(atuais, sort=False)
+        tipos[col] = pd.CategoricalDtype(atuais.append(novas)) if len(novas) else df[col].dtype
+    return tipos
+
+def aplicar_delta(dados: pd.DataFrame, delta: pd.DataFrame, posicoes: pd.Series = None):
+    """
+    Aplica as correções de `delta` (já passado por preparar_df) em `dados`: a linha de cada Matricula
+    do delta substitui a existente, no mesmo lugar, ou entra no fim. Repetida no delta, vale a última;
+    sem Matricula, é ignorada. `posicoes` é o indice_matriculas(dados), se já existir.
+    Retorna (df, info): info traz "saiu" (linhas substituídas) e "entrou" (linhas aplicadas), com as
+    posições de cada uma ("linhas_saiu", "linhas_entrou"), para CuboEps.com_delta e IndiceGrupos.com_delta,
+    e as quantidades "atualizadas", "inseridas", "sem_matricula" e "repetidas".
+    """
+    sem_matricula = int(delta["Matricula"].isna().sum())
+    if sem_matricula:
+        delta = delta[delta["Matricula"].notna()]
+    delta, repetidas = deduplicar_matricula(delta.reset_index(drop=True), REGRAS_DEDUP[2])
+
+    posicoes = indice_matriculas(dados) if posicoes is None else posicoes
+    encontradas = posicoes.index.get_indexer(delta["Matricula"])
+    existe = encontradas >= 0
+    linhas = posicoes.to_numpy()[encontradas[existe]]
+
+    # Coluna a coluna (o pd.concat do DataFrame inteiro é bem mais lento): junta e reordena com um take,
+    # sem reler nem reconverter o arquivo
+    tipos = _tipos_com_categorias_novas(dados, delta)
+    n = len(dados)
+    ordem = np.concatenate([np.arange(n), n + np.flatnonzero(~existe)])
+    ordem[linhas] = n + np.flatnonzero(existe)
+    def _no_tipo(serie, tipo):
+        # Só converte quando o tipo muda (o astype(copy=False) está obsoleto no pandas 3)
+        return serie if serie.dtype == tipo else serie.astype(tipo)
+    def _coluna(col):
+        tipo = tipos.get(col, dados[col].dtype)
+        juntos = pd.concat([_no_tipo(dados[col], tipo), _no_tipo(delta[col], tipo)], ignore_index=True)
+        return juntos.array.take(ordem)
+
+    df = pd.DataFrame({col: _coluna(col) for col in dados.columns})
+    df.attrs.update(
+        motor_csv=dados.attrs.get("motor_csv", "?"),
+        relatorio_datas=somar_relatorios_datas([dados.attrs.get("relatorio_datas"), delta.attrs.get("relatorio_datas")]),
+    )
+
+    # Onde cada linha do delta ficou no dataset corrigido (para IndiceGrupos.com_delta)
+    linhas_entrou = np.empty(len(delta), dtype=np.intp)
+    linhas_entrou[existe] = linhas
+    linhas_entrou[~existe] = n + np.arange(int((~existe).sum()))
+    info = {
+        "saiu": dados.take(linhas),
+        "entrou": delta,
+        "linhas_saiu": linhas,
+        "linhas_entrou": linhas_entrou,
+        "atualizadas": int(existe.sum()),
+        "inseridas": int((~existe).sum()),
+        "sem_matricula": sem_matricula,
+        "repetidas": repetidas,
+    }
+    return df, info
@@ -0,0 +1,220 @@
+"""
+Processamento em lote das exportações de EPS, sem Streamlit nem plotly.
+
+Para cada CSV (arquivos ou pastas com *.csv) ou snapshot .arrow do dashboard grava em <saida>/<nome_do_arquivo>/:
+  - por_prefixo.csv            Total, Pendentes, % pendente e a meta por Prefixo
+  - por_prefixo_uor_ajure.csv  Total e Pendentes por (Prefixo, Uor, Ajure)
+  - por_cargo.csv              Total e Pendentes por Cargo
+  - meta_ajure_prefixo_uor.csv quanto falta para a meta, distribuído Ajure -> Prefixo -> Uor
+  - pendentes.csv              linhas pendentes (mesmas colunas do download do dashboard)
+  - imagens/                   com --imagens: donut e barras de cada Prefixo em PNG e relatorio.pdf
+                               (precisa do kaleido)
+  - evolucao_por_prefixo.csv   com --comparar-com: Total e Pendentes antes/depois por Prefixo e as diferenças
+  - regularizados.csv, novos_pendentes.csv, entradas.csv, saidas.csv
+                               com --comparar-com: funcionários (Matricula) que mudaram desde o outro arquivo
+
+Exemplo:
+    python eps_cli.py exportacoes/ --saida resultados/ --data-limite 30/06/2026
+    python eps_cli.py atual.csv --saida resultados/ --comparar-com semana_passada.arrow
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import eps_calculo as calc
+
+# Mesmas colunas que o dashboard remove dos downloads
+COLS_FORA_DA_EXPORTACAO = ["Situacao_Eps", "Status_Indicador"]
+
+EXTENSAO_SNAPSHOT = ".arrow"
+# Colunas que bastam quando as linhas pendentes não são gravadas
+COLS_SO_CONTAGENS = calc.COLS_AGREGACAO + ["Data_Ultimo_Eps"]
+
+METODOS_CLI = {"arredondado": calc.METODOS_META[0], "compensado": calc.METODOS_META[1]}
+
+def listar_csvs(entradas) -> list:
+    arquivos = []
+    for entrada in map(Path, entradas):
+        if entrada.is_dir():
+            arquivos.extend(sorted(entrada.glob("*.csv")) + sorted(entrada.glob("*" + EXTENSAO_SNAPSHOT)))
+        else:
+            arquivos.append(entrada)
+    return arquivos
+
+def ler_dados(caminho: Path, colunas=None):
+    """CSV (carregar_dados + preparar_df) ou snapshot .arrow (só as `colunas`, se informadas)."""
+    if caminho.suffix == EXTENSAO_SNAPSHOT:
+        # Snapshot do dashboard: já tipado e com datas; abre por memory-map
+        from eps_snapshots import abrir_snapshot
+        return abrir_snapshot(caminho, colunas=colunas)
+    return calc.preparar_df(calc.carregar_dados(str(caminho)))
+
+def processar_arquivo(caminho: Path, pasta_saida: Path, data_limite_ui, metodo: str,
+                      meta_pct: float = calc.DEFAULT_META_PCT, blocos: bool = False,
+                      gravar_pendentes: bool = True, imagens: bool = False, top_n: int = 44,
+                      pdf: bool = True, anterior: Path = None) -> dict:
+    """
+    Roda o mesmo cálculo do dashboard para um CSV (ou snapshot) e grava as tabelas. Retorna um resumo.
+    Com `anterior` (CSV ou snapshot) também grava a evolução desde ele (calc.comparar_datasets).
+    """
+    inicio = time.perf_counter()
+    limite = calc.limite_calculo(data_limite_ui)
+    if anterior is not None and blocos and caminho.suffix != EXTENSAO_SNAPSHOT:
+        raise ValueError("--comparar-com precisa das linhas em memória (não combina com --blocos)")
+
+    dados = pendentes = None
+    if caminho.suffix == EXTENSAO_SNAPSHOT:
+        # Sem pendentes nem comparação, só as colunas das contagens chegam a ser lidas
+        so_contagens = not gravar_pendentes and anterior is None
+        dados = ler_dados(caminho, colunas=COLS_SO_CONTAGENS if so_contagens else None)
+        cubo = calc.CuboEps.de_dados(dados, limite)
+        if gravar_pendentes:
+            pendentes = dados[dados["Data_Ultimo_Eps"] < limite]
+    elif blocos:
+        with open(caminho, "rb") as f:
+            cubo = calc.CuboEps(calc.agregar_em_blocos(f, limite)[0])
+        if gravar_pendentes:
+            with open(caminho, "rb") as f:
+                pendentes = calc.ler_pendentes_em_blocos(f, limite)
+    else:
+        dados = ler_dados(caminho)
+        cubo = calc.CuboEps.de_dados(dados, limite)
+        if gravar_pendentes:
+            pendentes = dados[dados["Data_Ultimo_Eps"] < limite]
+
+    totais, antes = cubo.totais_por_prefixo()
+    tabela = calc.tabela_meta(totais, antes, meta_pct=meta_pct, metodo=metodo)
+    tabela.insert(2, "Percentual pendente (%)",
+                  (tabela["Pendentes"] / tabela["Total"].where(tabela["Total"] > 0) * 100).fillna(0).round(2))
+
+    destino = pasta_saida / caminho.stem
+    destino.mkdir(parents=True, exist_ok=True)
+    tabela.to_csv(destino / "por_prefixo.csv", index_label="Prefixo")
+    cubo.por("Prefixo", "Uor", "Ajure").to_csv(destino / "por_prefixo_uor_ajure.csv")
+    cubo.por("Cargo").to_csv(destino / "por_cargo.csv")
+    calc.alocar_meta_hierarquica(cubo.contagens, meta_pct).to_csv(destino / "meta_ajure_prefixo_uor.csv")
+    if pendentes is not None:
+        (pendentes.drop(columns=COLS_FORA_DA_EXPORTACAO, errors="ignore")
+                  .to_csv(destino / "pendentes.csv", index=False, date_format="%d/%m/%Y"))
+
+    evolucao = None
+    if anterior is not None:
+        diff = calc.comparar_datasets(ler_dados(anterior), dados, limite, cubo_depois=cubo)
+        diff["por_prefixo"].to_csv(destino / "evolucao_por_prefixo.csv")
+        for nome in ("regularizados", "novos_pendentes", "entradas", "saidas"):
+            diff[nome].to_csv(destino / f"{nome}.csv", index=False, date_format="%d/%m/%Y")
+        evolucao = diff["resumo"]
+
+    relatorio = None
+    if imagens:
+        import eps_relatorio  # só aqui: puxa o plotly, que o resto do processamento em lote não usa
+        relatorio = eps_relatorio.gerar_relatorio(cubo, destino / "imagens", data_limite_ui, top_n, pdf=pdf)
+
+    # No modo em blocos (CSV) o relatório das datas vem nas contagens; nos outros, no DataFrame
+    datas = (dados if dados is not None else cubo.contagens).attrs.get("relatorio_datas") or {}
+    return {
+        "arquivo": str(caminho),
+        "registros": cubo.total,
+        "pendentes": cubo.pendentes,
+        "prefixos": len(totais),
+        "datas_rejeitadas": datas.get("rejeitadas", 0),
+        "exemplos_rejeitados": datas.get("exemplos_rejeitados", []),
+        "relatorio": relatorio,
+        "evolucao": evolucao,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def _data_ui(texto: str):
+    try:
+        return datetime.strptime(texto, "%d/%m/%Y").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto!r} (use DD/MM/AAAA)")
+
+def _meta(texto: str) -> float:
+    try:
+        valor = float(texto.replace(",", ".").rstrip("%"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"meta inválida: {texto!r} (use um percentual, ex.: 90)")
+    if not 0 < valor <= 100:
+        raise argparse.ArgumentTypeError(f"meta fora de 0–100: {texto!r}")
+    return valor / 100
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="eps_cli",
+        description="Calcula as tabelas por Prefixo e as listas de pendentes para vários CSVs de EPS."
+    )
+    parser.add_argument("entradas", nargs="+", help="arquivos CSV ou pastas contendo *.csv")
+    parser.add_argument("--saida", required=True, type=Path, help="pasta onde os resultados são gravados")
+    parser.add_argument("--data-limite", type=_data_ui, default=calc.DEFAULT_DATA_LIMITE_UI,
+                        help="data-limite como aparece no dashboard, DD/MM/AAAA "
+                             f"(padrão: {calc.DEFAULT_DATA_LIMITE_UI:%d/%m/%Y})")
+    parser.add_argument("--metodo", choices=sorted(METODOS_CLI), default="arredondado",
+                        help="como calcular a coluna de quanto falta para a meta")
+    parser.add_argument("--meta", type=_meta, default=calc.DEFAULT_META_PCT,
+                        help=f"meta de pendentes em %% (padrão: {calc.DEFAULT_META_PCT * 100:g})")
+    parser.add_argument("--blocos", action="store_true",
+                        help="lê cada CSV em blocos (memória limitada, para arquivos muito grandes)")
+    parser.add_argument("--sem-pendentes", action="store_true", help="não grava pendentes.csv")
+    parser.add_argument("--imagens", action="store_true",
+                        help="grava o donut e as barras de cada Prefixo em PNG e um PDF único (precisa do kaleido)")
+    parser.add_argument("--sem-pdf", action="store_true", help="com --imagens, não junta as imagens em PDF")
+    parser.add_argument("--top-n", type=int, default=44, help="Prefixos no gráfico de barras (padrão: 44)")
+    parser.add_argument("--comparar-com", type=Path, metavar="ANTERIOR",
+                        help="CSV ou snapshot .arrow anterior: grava a evolução por Prefixo e por Matricula")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="quantos arquivos processar em paralelo (padrão: 1)")
+    return parser
+
+def main(argv=None) -> int:
+    args = criar_parser().parse_args(argv)
+    arquivos = listar_csvs(args.entradas)
+    if not arquivos:
+        print("Nenhum CSV encontrado.", file=sys.stderr)
+        return 1
+
+    parametros = dict(pasta_saida=args.saida, data_limite_ui=args.data_limite,
+                      metodo=METODOS_CLI[args.metodo], meta_pct=args.meta, blocos=args.blocos,
+                      gravar_pendentes=not args.sem_pendentes, imagens=args.imagens, top_n=args.top_n,
+                      pdf=not args.sem_pdf, anterior=args.comparar_com)
+
+    falhas = 0
+    for caminho, obter_resultado in _executar(arquivos, parametros, args.processos):
+        try:
+            r = obter_resultado()
+        except Exception as e:
+            falhas += 1
+            print(f"ERRO  {caminho}: {e}", file=sys.stderr)
+            continue
+        pct = r["pendentes"] / r["registros"] * 100 if r["registros"] else 0.0
+        print(f"ok    {r['arquivo']}: {r['registros']} registros, {r['pendentes']} pendentes "
+              f"({pct:.1f}%), {r['prefixos']} prefixos em {r['segundos']:.2f}s")
+        if r["relatorio"]:
+            print(f"      {r['relatorio']['imagens']} imagens ({r['relatorio']['prefixos']} prefixos) "
+                  f"em {r['relatorio']['segundos_imagens']:.1f}s")
+        if r["evolucao"]:
+            ev = r["evolucao"]
+            print(f"      desde {args.comparar_com.name}: pendentes {ev['pendentes_antes']} -> {ev['pendentes_depois']}, "
+                  f"{ev['regularizados']} regularizados, {ev['novos_pendentes']} novos pendentes, "
+                  f"{ev['entradas']} entradas, {ev['saidas']} saídas")
+        if r["datas_rejeitadas"]:
+            print(f"aviso {r['arquivo']}: {r['datas_rejeitadas']} datas inválidas fora dos pendentes "
+                  f"(ex.: {', '.join(r['exemplos_rejeitados'])})", file=sys.stderr)
+    return 1 if falhas else 0
+
+def _executar(arquivos, parametros: dict, processos: int):
+    # Gera (arquivo, função que devolve o resumo) – em paralelo ou no próprio processo
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = [(c, executor.submit(processar_arquivo, c, **parametros)) for c in arquivos]
+            for caminho, futuro in futuros:
+                yield caminho, futuro.result
+    else:
+        for caminho in arquivos:
+            yield caminho, (lambda c=caminho: processar_arquivo(c, **parametros))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,506 @@
+"""
+Geração dos arquivos de exportação (Excel/ZIP, Parquet e CSV.gz) das pendências.
+
+Fica fora do Projeto_EPS.py para poder ser importado pelos processos do pool
+(o script do Streamlit não é um módulo importável) e não depende de Streamlit.
+"""
+import gzip
+import io
+import os
+import re
+import time
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pyarrow é opcional: sem ele não há Parquet e o CSV sai pelo pandas
+    pa = None
+
+# A partir deste total de linhas, o Excel via openpyxl é gravado em modo streaming (memória constante)
+EXCEL_LINHAS_STREAMING = int(os.environ.get("EPS_EXCEL_LINHAS_STREAMING", "50000"))
+# Processos usados para montar as abas por Prefixo (padrão: nº de CPUs)
+EXPORTACAO_PROCESSOS = int(os.environ.get("EPS_EXPORTACAO_PROCESSOS", "0")) or (os.cpu_count() or 1)
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_ZIP = "application/zip"
+MIME_PARQUET = "application/vnd.apache.parquet"
+MIME_GZIP = "application/gzip"
+
+# =========================
+# Nomes de abas e arquivos
+# =========================
+def _sanitize_sheet_title(s: str) -> str:
+    invalid = set('\\/:*?[]:"<>|')
+    out = "".join("_" if ch in invalid else ch for ch in (s or "").strip())
+    out = " ".join(out.split())
+    out = out[:31] if out else "Pendentes"
+    return out
+
+def _sanitize_filename(s: str) -> str:
+    invalid = set('\\/:*?[]:"<>|')
+    out = "".join("_" if ch in invalid else ch for ch in (s or "").strip())
+    out = " ".join(out.split())
+    return out or "Pendentes"
+
+def _nomes_unicos(nomes, limite: int = None) -> list:
+    # Abas/arquivos não podem repetir nome (ex.: dois Prefixos que viram o mesmo texto após sanitizar)
+    vistos, out = set(), []
+    for nome in nomes:
+        candidato, n = nome, 1
+        while candidato.lower() in vistos:
+            n += 1
+            sufixo = f" ({n})"
+            candidato = (nome[:limite - len(sufixo)] if limite else nome) + sufixo
+        vistos.add(candidato.lower())
+        out.append(candidato)
+    return out
+
+# =========================
+# Excel via pandas/openpyxl
+# =========================
+def _sem_progresso(feitas, total=None, texto=""):
+    pass
+
+def _escrever_aba_streaming(ws, df: pd.DataFrame, linhas_por_lote: int = 10_000, ao_gravar=None):
+    ws.append([str(c) for c in df.columns])
+    for inicio in range(0, len(df), linhas_por_lote):
+        lote = df.iloc[inicio:inicio + linhas_por_lote].astype(object)
+        lote = lote.where(lote.notna(), None)
+        for linha in lote.itertuples(index=False, name=None):
+            ws.append(linha)
+        if ao_gravar is not None:
+            ao_gravar(len(lote))
+
+def escrever_xlsx(abas, total_linhas: int, progresso=None) -> bytes:
+    """
+    Gera um .xlsx em memória a partir de pares (nome_da_aba, DataFrame).
+    Até EXCEL_LINHAS_STREAMING linhas usa o pandas.ExcelWriter (cabeçalho formatado);
+    acima disso usa o modo write_only do openpyxl, que grava linha a linha com memória constante.
+    `abas` pode ser um gerador: cada aba é consumida e descartada antes da próxima.
+    `progresso(linhas_gravadas, total_linhas, texto)` é chamado a cada aba (a cada lote, no streaming).
+    """
+    progresso = progresso or _sem_progresso
+    gravadas = 0
+    buf = io.BytesIO()
+    if total_linhas <= EXCEL_LINHAS_STREAMING:
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            for nome, df in abas:
+                df.to_excel(writer, sheet_name=nome, index=False)
+                gravadas += len(df)
+                progresso(gravadas, total_linhas, "linhas")
+    else:
+        from openpyxl import Workbook
+
+        def _ao_gravar(n):
+            nonlocal gravadas
+            gravadas += n
+            progresso(gravadas, total_linhas, "linhas")
+
+        wb = Workbook(write_only=True)
+        for nome, df in abas:
+            _escrever_aba_streaming(wb.create_sheet(title=nome), df, ao_gravar=_ao_gravar)
+        wb.save(buf)
+    return buf.getvalue()
+
+# =========================
+# Excel montado direto em XML (usado pelas partes paralelas)
+# =========================
+_CONTROLE_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ESPECIAIS_XML = re.compile("[&<>\x00-\x08\x0b\x0c\x0e-\x1f]")
+_EPOCA_EXCEL = pd.Timestamp("1899-12-30")
+_CELULA_VAZIA = "<c/>"
+
+def _texto_xml(valores: pd.Series) -> pd.Series:
+    texto = valores.astype("string")
+    # Uma busca só: o texto comum (matrículas, nomes) não tem nada a escapar
+    if texto.str.contains(_ESPECIAIS_XML, regex=True).any():
+        texto = texto.str.replace(_CONTROLE_XML, "", regex=True)
+        texto = (texto.str.replace("&", "&amp;", regex=False)
+                      .str.replace("<", "&lt;", regex=False)
+                      .str.replace(">", "&gt;", regex=False))
+    return '<c t="inlineStr"><is><t xml:space="preserve">' + texto + "</t></is></c>"
+
+def _celulas_coluna(serie: pd.Series) -> np.ndarray:
+    """XML de cada célula da coluna, montado de forma vetorizada (NA vira célula vazia)."""
+    dtype = serie.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), dtype.categories
+    elif (pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype)
+          or pd.api.types.is_datetime64_any_dtype(dtype)):
+        # Datas e números se repetem muito: formata cada valor distinto uma vez
+        codigos, valores = pd.factorize(serie)
+    else:
+        return _celulas_valores(serie)
+    # Escapa cada valor uma vez e distribui pelos códigos (-1 = NA pega a célula vazia do fim)
+    celulas = np.append(_celulas_valores(pd.Series(valores)), _CELULA_VAZIA)
+    return celulas[codigos]
+
+def _celulas_valores(serie: pd.Series) -> np.ndarray:
+    dtype = serie.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        celulas = '<c t="b"><v>' + serie.astype("Int8").astype("string") + "</v></c>"
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        datas = serie.dt.tz_localize(None) if getattr(dtype, "tz", None) is not None else serie
+        serial = (datas - _EPOCA_EXCEL) / pd.Timedelta(days=1)
+        celulas = '<c s="1"><v>' + serial.astype("string") + "</v></c>"
+    elif pd.api.types.is_numeric_dtype(dtype):
+        numeros = serie.where(np.isfinite(serie.astype("float64")))
+        celulas = "<c><v>" + numeros.astype("string") + "</v></c>"
+    else:
+        celulas = _texto_xml(serie)
+    return celulas.fillna(_CELULA_VAZIA).to_numpy(dtype=object)
+
+def _matriz_celulas(df: pd.DataFrame) -> np.ndarray:
+    """Matriz (linha, célula) com o XML de cada célula, incluindo as marcas <row> e </row>."""
+    celulas = np.empty((len(df), len(df.columns) + 2), dtype=object)
+    celulas[:, 0], celulas[:, -1] = "<row>", "</row>"
+    for i, col in enumerate(df.columns, start=1):
+        celulas[:, i] = _celulas_coluna(df[col])
+    return celulas
+
+def _xml_linhas(celulas: np.ndarray) -> str:
+    # Juntada de uma vez: somar as colunas texto a texto recopiaria cada linha
+    return "".join(celulas.ravel().tolist())
+
+def _abertura_planilha(colunas) -> str:
+    cabecalho = "".join(_texto_xml(pd.Series([str(c) for c in colunas])).tolist())
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"<sheetData><row>{cabecalho}</row>")
+
+_FECHAMENTO_PLANILHA = "</sheetData></worksheet>"
+
+def xml_planilha(df: pd.DataFrame, progresso=None, linhas_por_lote: int = 100_000) -> bytes:
+    """
+    Worksheet XML (SpreadsheetML) com cabeçalho + linhas do DataFrame, strings inline.
+    As linhas são montadas em lotes; `progresso(linhas_prontas, total, texto)` é chamado a cada lote.
+    """
+    progresso = progresso or _sem_progresso
+    partes = [_abertura_planilha(df.columns)]
+    for inicio in range(0, len(df), linhas_por_lote):
+        partes.append(_xml_linhas(_matriz_celulas(df.iloc[inicio:inicio + linhas_por_lote])))
+        progresso(min(inicio + linhas_por_lote, len(df)), len(df), "linhas")
+    partes.append(_FECHAMENTO_PLANILHA)
+    return "".join(partes).encode("utf-8")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "{planilhas}</Types>"
+)
+_RELS_RAIZ = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+# Estilo 1 = data/hora (mesmo formato que o pandas usa no ExcelWriter)
+_ESTILOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy\\-mm\\-dd\\ hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+def montar_xlsx(planilhas) -> bytes:
+    """
+    Empacota pares (nome_da_aba, worksheet_xml) num .xlsx.
+    Nomes são sanitizados e desduplicados pelas regras de aba do Excel.
+    """
+    planilhas = list(planilhas)
+    nomes = _nomes_unicos([_sanitize_sheet_title(n) for n, _ in planilhas], limite=31)
+
+    overrides = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(planilhas) + 1)
+    )
+    sheets = "".join(
+        f"<sheet name={quoteattr(nome)} sheetId=\"{i}\" r:id=\"rId{i}\"/>"
+        for i, nome in enumerate(nomes, start=1)
+    )
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f"<sheets>{sheets}</sheets></workbook>"
+    )
+    rels = "".join(
+        f'<Relationship Id="rId{i}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(planilhas) + 1)
+    )
+    n = len(planilhas)
+    rels += (f'<Relationship Id="rId{n + 1}" '
+             'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+             'Target="styles.xml"/>')
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f"{rels}</Relationships>"
+    )
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES.format(planilhas=overrides))
+        zf.writestr("_rels/.rels", _RELS_RAIZ)
+        zf.writestr("xl/workbook.xml", workbook)
+        zf.writestr("xl/_rels/workbook.xml.rels", workbook_rels)
+        zf.writestr("xl/styles.xml", _ESTILOS)
+        for i, (_, xml) in enumerate(planilhas, start=1):
+            zf.writestr(f"xl/worksheets/sheet{i}.xml", xml)
+    return buf.getvalue()
+
+def xlsx_rapido(df: pd.DataFrame, nome_aba: str = "Pendentes", progresso=None) -> bytes:
+    """
+    Excel de uma aba montado direto em XML (xml_planilha + montar_xlsx), sem openpyxl.
+    Mesmo conteúdo do escrever_xlsx, sem o cabeçalho formatado, em uma fração do tempo.
+    """
+    xml = xml_planilha(df, progresso)
+    progresso = progresso or _sem_progresso
+    progresso(len(df), len(df), "compactando")
+    return montar_xlsx([(nome_aba, xml)])
+
+# =========================
+# Exportação paralela por Prefixo
+# =========================
+LINHAS_POR_LOTE_EXPORTACAO = 50_000
+
+@dataclass
+class ParteExportacao:
+    """Uma aba/arquivo por Prefixo, renderizada por um processo do pool."""
+    nome: str
+    xml: bytes
+    linhas: int
+    segundos: float
+
+def _renderizar_lote(item) -> list:
+    """
+    Renderiza um lote de Prefixos vizinhos: a matriz de células sai uma vez para o lote todo
+    e cada Prefixo é só uma fatia de linhas dela (montar coluna a coluna por Prefixo custava
+    ~30 ms por parte, quase tudo sobrecarga do pandas, com qualquer número de linhas).
+    """
+    nomes, cortes, df = item
+    inicio = time.perf_counter()
+    celulas = _matriz_celulas(df)
+    abertura = _abertura_planilha(df.columns)
+    por_linha = (time.perf_counter() - inicio) / max(1, len(df))
+    partes = []
+    for nome, de, ate in zip(nomes, cortes[:-1], cortes[1:]):
+        inicio = time.perf_counter()
+        xml = (abertura + _xml_linhas(celulas[de:ate]) + _FECHAMENTO_PLANILHA).encode("utf-8")
+        segundos = time.perf_counter() - inicio + por_linha * (ate - de)
+        partes.append(ParteExportacao(nome, xml, int(ate - de), segundos))
+    return partes
+
+_pool = None
+
+def _obter_pool() -> ProcessPoolExecutor:
+    # Pool único e persistente: os processos já sobem com pandas importado para os próximos pedidos.
+    # forkserver/spawn evitam fazer fork do processo do Streamlit, que tem várias threads.
+    global _pool
+    if _pool is None:
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+        _pool = ProcessPoolExecutor(max_workers=EXPORTACAO_PROCESSOS, mp_context=contexto)
+    return _pool
+
+def _renderizar_em_serie(lotes, total, progresso) -> list:
+    partes = []
+    for lote in lotes:
+        partes.extend(_renderizar_lote(lote))
+        progresso(len(partes), total, "abas")
+    return partes
+
+def renderizar_partes(lotes, processos: int = None, progresso=None) -> list:
+    """
+    Renderiza os lotes (nomes, cortes, DataFrame) de _lotes_por_prefixo em paralelo num pool
+    de processos. Com um lote só (ou um processo só) roda em série; se o pool quebrar, refaz em série.
+    `progresso(partes_prontas, total, texto)` é chamado a cada lote que fica pronto.
+    """
+    global _pool
+    lotes = list(lotes)
+    total = sum(len(nomes) for nomes, _, _ in lotes)
+    progresso = progresso or _sem_progresso
+    processos = EXPORTACAO_PROCESSOS if processos is None else processos
+    if len(lotes) <= 1 or processos <= 1:
+        return _renderizar_em_serie(lotes, total, progresso)
+    try:
+        partes = []
+        for prontas in _obter_pool().map(_renderizar_lote, lotes):
+            partes.extend(prontas)
+            progresso(len(partes), total, "abas")
+        return partes
+    except BrokenProcessPool:
+        _pool = None
+        return _renderizar_em_serie(lotes, total, progresso)
+
+def _posicoes_por_prefixo(df: pd.DataFrame):
+    """(nomes, ordem, inícios): posições das linhas agrupadas por Prefixo (NA por último)."""
+    codigos, prefixos = pd.factorize(df["Prefixo"], sort=True, use_na_sentinel=False)
+    ordem = np.argsort(codigos, kind="stable")
+    inicios = np.searchsorted(codigos[ordem], np.arange(len(prefixos) + 1))
+    nomes = ["NA" if pd.isna(p) else str(p) for p in prefixos]
+    return nomes, ordem, inicios
+
+def _lotes_por_prefixo(pendentes: pd.DataFrame, cols_to_drop,
+                       linhas_por_lote: int = LINHAS_POR_LOTE_EXPORTACAO) -> list:
+    """Junta Prefixos vizinhos em lotes de até `linhas_por_lote` linhas (um Prefixo maior vai sozinho)."""
+    dados = pendentes.drop(columns=cols_to_drop, errors="ignore")
+    nomes, ordem, inicios = _posicoes_por_prefixo(dados)
+    lotes, primeiro = [], 0
+    while primeiro < len(nomes):
+        fim = primeiro + 1
+        while fim < len(nomes) and inicios[fim + 1] - inicios[primeiro] <= linhas_por_lote:
+            fim += 1
+        de, ate = inicios[primeiro], inicios[fim]
+        lotes.append((nomes[primeiro:fim], inicios[primeiro:fim + 1] - de, dados.iloc[ordem[de:ate]]))
+        primeiro = fim
+    return lotes
+
+def exportar_por_prefixo(pendentes: pd.DataFrame, cols_to_drop=(), formato: str = "abas", progresso=None):
+    """
+    Gera as pendências separadas por Prefixo, com as partes renderizadas em paralelo.
+      formato="abas": um .xlsx com uma aba por Prefixo;
+      formato="zip":  um .zip com um .xlsx por Prefixo (para cada agência pegar o seu).
+    `progresso(partes_prontas, total, texto)` acompanha as partes (ver renderizar_partes).
+    Retorna (bytes, tempos) – `tempos` tem linhas e segundos gastos em cada parte.
+    """
+    partes = renderizar_partes(_lotes_por_prefixo(pendentes, list(cols_to_drop)), progresso=progresso)
+    (progresso or _sem_progresso)(len(partes), len(partes), "compactando")
+
+    if formato == "abas":
+        conteudo = montar_xlsx((p.nome, p.xml) for p in partes)
+    elif formato == "zip":
+        nomes = _nomes_unicos([_sanitize_filename(f"{p.nome} Pendentes") for p in partes])
+        buf = io.BytesIO()
+        # Os .xlsx já são ZIP comprimidos: guardar sem recomprimir
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+            for nome, parte in zip(nomes, partes):
+                zf.writestr(f"{nome}.xlsx", montar_xlsx([(parte.nome, parte.xml)]))
+        conteudo = buf.getvalue()
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    tempos = pd.DataFrame(
+        {"Linhas": [p.linhas for p in partes], "Segundos": [round(p.segundos, 3) for p in partes]},
+        index=pd.Index([p.nome for p in partes], name="Prefixo"),
+    )
+    return conteudo, tempos
+
+# =========================
+# Parquet e CSV.gz (para BI)
+# =========================
+# Formato -> (extensão, MIME)
+FORMATOS_DADOS = {"parquet": (".parquet", MIME_PARQUET), "csv.gz": (".csv.gz", MIME_GZIP)}
+
+def formato_disponivel(formato: str) -> bool:
+    """Parquet precisa do pyarrow; CSV.gz sempre sai (pelo pandas, se faltar o pyarrow)."""
+    return formato != "parquet" or pa is not None
+
+def _tabela_csv(tabela):
+    # O CSV do Arrow não escreve dicionários, e datas sem hora saem como AAAA-MM-DD (igual ao pandas)
+    colunas = []
+    for coluna in tabela.columns:
+        if pa.types.is_dictionary(coluna.type):
+            coluna = coluna.cast(coluna.type.value_type)
+        elif pa.types.is_timestamp(coluna.type):
+            so_datas = pa.compute.all(pa.compute.equal(coluna, pa.compute.floor_temporal(coluna, unit="day")))
+            if so_datas.as_py() is not False:
+                coluna = coluna.cast(pa.date32())
+        colunas.append(coluna)
+    return pa.table(colunas, names=tabela.column_names)
+
+def _dicionarios_compactos(tabela):
+    # Um pedaço (take) mantém o dicionário inteiro: cada arquivo por Prefixo levaria todas as UORs
+    colunas = [pa.compute.dictionary_encode(c.cast(c.type.value_type)) if pa.types.is_dictionary(c.type) else c
+               for c in tabela.columns]
+    return pa.table(colunas, names=tabela.column_names, metadata=tabela.schema.metadata)
+
+def _escrever_tabela(tabela, formato: str) -> bytes:
+    buf = io.BytesIO()
+    if formato == "parquet":
+        pa_parquet.write_table(tabela, buf)
+        return buf.getvalue()
+    # Nível 1: o gzip mais alto custa várias vezes o tempo para poucos % de tamanho
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=1, mtime=0) as gz:
+        pa_csv.write_csv(_tabela_csv(tabela), gz, write_options=pa_csv.WriteOptions(quoting_style="needed"))
+    return buf.getvalue()
+
+def escrever_dados(df: pd.DataFrame, formato: str) -> bytes:
+    """
+    `df` como Parquet (snappy, tipos preservados) ou CSV.gz (UTF-8, separador vírgula, com cabeçalho).
+    O CSV é escrito pelo Arrow quando o pyarrow está instalado (várias vezes mais rápido que o pandas).
+    """
+    if formato not in FORMATOS_DADOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    if pa is not None:
+        return _escrever_tabela(pa.Table.from_pandas(df, preserve_index=False), formato)
+    if formato == "parquet":
+        raise RuntimeError("Exportar em Parquet precisa do pyarrow (pip install pyarrow).")
+    return gzip.compress(df.to_csv(index=False).encode("utf-8"), compresslevel=1, mtime=0)
+
+def _arquivos_por_prefixo(df: pd.DataFrame, formato: str):
+    """Pares (Prefixo, bytes) na ordem dos Prefixos (NA por último)."""
+    nomes, ordem, inicios = _posicoes_por_prefixo(df)
+    if pa is None:
+        for nome, de, ate in zip(nomes, inicios[:-1], inicios[1:]):
+            yield nome, escrever_dados(df.iloc[ordem[de:ate]], formato)
+        return
+    # Converte para Arrow uma vez e fatia por posição (sem um DataFrame por Prefixo)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for nome, de, ate in zip(nomes, inicios[:-1], inicios[1:]):
+        yield nome, _escrever_tabela(_dicionarios_compactos(tabela.take(ordem[de:ate])), formato)
+
+def exportar_dados(pendentes: pd.DataFrame, cols_to_drop=(), formato: str = "parquet",
+                   por_prefixo: bool = False, progresso=None) -> bytes:
+    """
+    Pendências em Parquet ou CSV.gz (FORMATOS_DADOS), sem as `cols_to_drop`.
+    Com `por_prefixo`, um .zip com um arquivo por Prefixo (mesmos nomes do ZIP de Excel).
+    """
+    progresso = progresso or _sem_progresso
+    extensao = FORMATOS_DADOS[formato][0]
+    dados = pendentes.drop(columns=list(cols_to_drop), errors="ignore")
+    if not por_prefixo:
+        progresso(0, 1, "arquivo")
+        return escrever_dados(dados, formato)
+
+    total = dados["Prefixo"].nunique(dropna=False)
+    arquivos = []
+    for nome, conteudo in _arquivos_por_prefixo(dados, formato):
+        arquivos.append((nome, conteudo))
+        progresso(len(arquivos), total, "arquivos")
+
+    nomes = _nomes_unicos([_sanitize_filename(f"{nome} Pendentes") for nome, _ in arquivos])
+    buf = io.BytesIO()
+    # Parquet e gzip já são comprimidos: guardar sem recomprimir
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for nome, (_, conteudo) in zip(nomes, arquivos):
+            zf.writestr(f"{nome}{extensao}", conteudo)
+    return buf.getvalue()
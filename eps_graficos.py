@@ -0,0 +1,166 @@
+"""
+Figuras plotly do Dashboard EPS (donut e barras por Prefixo), sem Streamlit.
+
+Fica fora do Projeto_EPS.py para poder ser usado fora do app (benchmarks, geração em lote).
+"""
+import os
+from datetime import date
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from eps_calculo import DEFAULT_DATA_LIMITE_UI
+
+# A partir de quantas barras o gráfico por Prefixo usa o layout compacto
+BARRAS_COMPACTAS = int(os.environ.get("EPS_BARRAS_COMPACTAS", 60))
+
+def donut_eps_plotly(
+    porcentagem,
+    data_limite_ui: date = DEFAULT_DATA_LIMITE_UI,
+    filtro_atual="Todos",
+    cor_precisam="#e72914",
+    cor_nao_precisam="#0fe267"
+):
+    if filtro_atual == "Todos":
+        filtro_texto = "Geral"
+    else:
+        filtro_texto = str(filtro_atual)
+
+    fig = go.Figure(data=[go.Pie(
+        labels=["Precisam fazer", f"Vencem até {data_limite_ui.strftime('%d/%m')}"],
+        values=[porcentagem, 100 - porcentagem],
+        hole=0.6,
+        sort=False,
+        direction="clockwise",
+        marker=dict(colors=[cor_precisam, cor_nao_precisam], line=dict(color="#7c7c7c", width=2)),
+        textfont_size=18,
+        hoverinfo="label+percent"
+    )])
+
+    fig.update_layout(
+        title=f"Percentual de pessoas que precisam fazer o EPS até {data_limite_ui.strftime('%d/%m/%Y')}",
+        template="plotly_white",
+        height=500,
+        annotations=[
+            dict(
+                text=filtro_texto,
+                x=0.5, y=0.5,
+                showarrow=False,
+                font=dict(size=30, color="#7c7c7c", family="Source Sans")
+            )
+        ],
+        margin=dict(l=40, r=40, t=60, b=40)
+    )
+    return fig
+
+def _rotulo_prefixo(x) -> str:
+    return "NA" if pd.isna(x) else str(x)
+
+def selecionar_barras(porc_por_prefixo: pd.Series, top_n: int = 40, prefixo_destacar=None,
+                      ensure_visible: bool = True):
+    """
+    As `top_n` barras de maior percentual, em ordem crescente, com rótulos em texto.
+    Com `ensure_visible`, um Prefixo destacado fora do top entra no lugar da menor barra.
+    Retorna (serie, rótulo destacado ou None, rótulo que entrou à força ou None).
+    """
+    serie = porc_por_prefixo.set_axis(porc_por_prefixo.index.map(_rotulo_prefixo))
+    top_n = max(1, int(top_n))
+    base = serie.sort_values(ascending=True).tail(top_n)
+
+    if prefixo_destacar is None or prefixo_destacar == "Todos":
+        return base, None, None
+    alvo = "NA" if (isinstance(prefixo_destacar, float) and pd.isna(prefixo_destacar)) else str(prefixo_destacar)
+
+    if alvo in base.index:
+        return base, alvo, None
+    if not ensure_visible or alvo not in serie.index:
+        return base, None, None
+    base = pd.concat([serie.loc[[alvo]], base.iloc[1:] if len(base) >= top_n else base]).sort_values(ascending=True)
+    return base, alvo, alvo
+
+def barras_prefixo_base(base: pd.Series, tema: str = "plotly_white") -> dict:
+    """
+    Figura das barras sem destaque, como dict (é o que vai para o cache).
+    Acima de BARRAS_COMPACTAS barras o layout fica compacto: sem texto em cada barra
+    (o valor aparece no hover) e barras mais baixas, para o JSON e o desenho ficarem leves.
+    """
+    n = len(base)
+    compacto = n > BARRAS_COMPACTAS
+    altura = max(420, int((16 if compacto else 30) * n))
+    default_line = "#7c7c7c" if tema != "plotly_dark" else "rgba(255,255,255,0.6)"
+
+    fig = go.Figure(go.Bar(
+        x=base.to_numpy().round(2),
+        y=base.index.tolist(),
+        orientation="h",
+        marker=dict(
+            color=base.to_numpy().round(2),
+            coloraxis="coloraxis",
+            line=dict(color=default_line, width=0 if compacto else 1.2)
+        ),
+        text=None if compacto else base.to_numpy().round(2),
+        texttemplate=None if compacto else "%{x:.1f}%",
+        textposition=None if compacto else "outside",
+        cliponaxis=False,
+        hovertemplate="Prefixo %{y}<br>%{x:.1f}%<extra></extra>"
+    ))
+
+    fig.update_layout(
+        template=tema,
+        height=altura,
+        title=dict(text="Percentual pendente por Prefixo", x=0.5),
+        xaxis=dict(
+            title="Porcentagem",
+            range=[0, 100],
+            ticksuffix="%",
+            showgrid=True,
+            gridcolor="rgba(0,0,0,0.12)",
+            gridwidth=1,
+            zeroline=False
+        ),
+        yaxis=dict(
+            title="Prefixo",
+            categoryorder="array",
+            categoryarray=base.index.tolist(),
+            showgrid=not compacto,
+            gridcolor="rgba(0,0,0,0.08)",
+            gridwidth=1,
+            tickfont=dict(size=9) if compacto else None
+        ),
+        bargap=0.1 if compacto else 0.25,
+        margin=dict(l=90, r=40 if compacto else 150, t=60, b=40),
+        coloraxis=dict(colorscale="Plasma_r", colorbar=dict(title="%", ticksuffix="%")),
+        showlegend=False
+    )
+    return fig.to_dict()
+
+def destacar_barra(fig_base: dict, alvo_label) -> dict:
+    """
+    Aplica o contorno verde na barra do Prefixo escolhido sobre uma cópia rasa da figura base:
+    só o dict do marker é refeito, o resto (eixos, cores, textos) é compartilhado com o cache.
+    """
+    if alvo_label is None:
+        return fig_base
+    barras = fig_base["data"][0]
+    rotulos = barras["y"]
+    if alvo_label not in rotulos:
+        return fig_base
+    linha = barras["marker"]["line"]
+    n = len(rotulos)
+    pos = list(rotulos).index(alvo_label)
+    cores = [linha["color"]] * n
+    larguras = [linha["width"]] * n
+    cores[pos], larguras[pos] = "#00ff00", 3
+
+    marker = {**barras["marker"], "line": {"color": cores, "width": larguras}}
+    return {**fig_base, "data": [{**barras, "marker": marker}, *fig_base["data"][1:]]}
+
+def barras_prefixo_plotly_gradiente(
+    porc_por_prefixo: pd.Series,
+    top_n: int = 40,
+    tema: str = "plotly_white",
+    prefixo_destacar=None,
+    ensure_visible: bool = True,
+):
+    base, alvo_label, _ = selecionar_barras(porc_por_prefixo, top_n, prefixo_destacar, ensure_visible)
+    return go.Figure(destacar_barra(barras_prefixo_base(base, tema), alvo_label))
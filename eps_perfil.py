@@ -0,0 +1,113 @@
+"""
+Instrumentação opcional do dashboard: tempo, linhas e variação de memória de cada etapa.
+
+Desligada por padrão. No Projeto_EPS.py liga com `?perfil=1` na URL ou EPS_PERFIL=1 no ambiente;
+com EPS_PERFIL_LOG=<arquivo> cada etapa também é anexada ao arquivo como uma linha JSON.
+Não depende de Streamlit.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VALORES_LIGADO = {"1", "true", "sim", "on"}
+PERFIL_LOG = os.environ.get("EPS_PERFIL_LOG") or None
+
+def perfil_ligado(parametro=None) -> bool:
+    """True se o parâmetro da URL (ex.: st.query_params.get("perfil")) ou EPS_PERFIL pedirem o perfil."""
+    valores = [parametro, os.environ.get("EPS_PERFIL")]
+    return any(str(v).strip().lower() in VALORES_LIGADO for v in valores if v is not None)
+
+def memoria_processo() -> int:
+    """Memória residente (RSS) do processo em bytes; 0 se não der para medir."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Sem /proc (macOS): pico de RSS, em bytes no macOS
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return 0
+
+class Perfilador:
+    """
+    Acumula o registro de cada etapa medida com `etapa()` (as `max_etapas` mais recentes).
+    Desligado, `etapa()` não mede nada e custa só a entrada no gerenciador de contexto.
+    """
+
+    def __init__(self, ativo: bool = False, log: str = PERFIL_LOG, max_etapas: int = 500):
+        self.ativo = ativo
+        self.log = log
+        self.etapas = deque(maxlen=max_etapas)
+        self._trava = threading.Lock()
+        self.nova_execucao()
+
+    def nova_execucao(self):
+        """Marca o início de uma execução do script (as etapas seguintes ficam com este id)."""
+        self.execucao = uuid.uuid4().hex[:8]
+
+    @contextmanager
+    def etapa(self, nome: str, linhas: int = None):
+        """
+        Mede o bloco `with`. O dict devolvido pode receber "linhas" (ou outros campos)
+        quando o número de linhas só é conhecido no fim.
+        """
+        registro = {"etapa": nome, "linhas": linhas}
+        if not self.ativo:
+            yield registro
+            return
+
+        memoria_antes = memoria_processo()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro.update(
+                segundos=round(time.perf_counter() - inicio, 6),
+                memoria_mb=round((memoria_processo() - memoria_antes) / 2**20, 2),
+                execucao=self.execucao,
+                horario=datetime.now().isoformat(timespec="milliseconds"),
+            )
+            with self._trava:
+                self.etapas.append(registro)
+            if self.log:
+                self._anexar_log(registro)
+
+    def registrar(self, nome: str, segundos: float, linhas: int = None):
+        """Registra uma etapa cronometrada fora do perfilador (ex.: fases dentro de uma função do núcleo)."""
+        if not self.ativo:
+            return
+        registro = {
+            "etapa": nome, "linhas": linhas, "segundos": round(segundos, 6), "memoria_mb": None,
+            "execucao": self.execucao, "horario": datetime.now().isoformat(timespec="milliseconds"),
+        }
+        with self._trava:
+            self.etapas.append(registro)
+        if self.log:
+            self._anexar_log(registro)
+
+    def _anexar_log(self, registro: dict):
+        try:
+            with open(self.log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            pass  # o log é diagnóstico: não derruba o dashboard
+
+    def tabela(self, execucao: str = None) -> pd.DataFrame:
+        """Etapas registradas (só as da `execucao`, se informada), da mais antiga para a mais nova."""
+        colunas = ["etapa", "segundos", "linhas", "memoria_mb", "horario", "execucao"]
+        with self._trava:
+            etapas = [e for e in self.etapas if execucao is None or e["execucao"] == execucao]
+        return pd.DataFrame(etapas, columns=colunas)
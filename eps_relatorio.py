@@ -0,0 +1,251 @@
+"""
+Relatório em lote com as figuras do dashboard: o donut e as barras gerais e, para cada Prefixo,
+o donut do Prefixo e as barras com ele em destaque, em PNG e (opcional) num PDF único.
+
+As imagens saem do kaleido (dependência opcional). Com kaleido >= 1 um só Chrome fica aberto
+durante o lote inteiro, renderizando várias figuras ao mesmo tempo; com o kaleido 0.2 cada processo
+do pool reaproveita o seu processo do kaleido entre as figuras. Não depende de Streamlit.
+"""
+import io
+import os
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+
+from eps_calculo import DEFAULT_DATA_LIMITE_UI
+from eps_exportacao import _nomes_unicos, _sanitize_filename
+from eps_graficos import _rotulo_prefixo, barras_prefixo_base, destacar_barra, donut_eps_plotly, selecionar_barras
+
+try:
+    import kaleido
+except ImportError:  # kaleido é opcional: sem ele o relatório não é gerado
+    kaleido = None
+
+# Figuras renderizadas ao mesmo tempo (abas do Chrome no kaleido >= 1, processos no 0.2)
+RELATORIO_WORKERS = int(os.environ.get("EPS_RELATORIO_WORKERS", "0")) or (os.cpu_count() or 1)
+LARGURA_IMAGEM = 1000
+
+def kaleido_disponivel() -> bool:
+    return kaleido is not None
+
+def _kaleido_servidor() -> bool:
+    # kaleido >= 1 (com plotly >= 6.1): servidor persistente + gravação de várias figuras de uma vez
+    return hasattr(kaleido, "start_sync_server") and hasattr(pio, "write_images")
+
+# =========================
+# Figuras
+# =========================
+def _trocar_barras(fig_base: dict, base) -> dict:
+    # Mesmo número de barras, outros Prefixos/valores: refaz só os vetores (como o destacar_barra)
+    barras = fig_base["data"][0]
+    valores = base.to_numpy().round(2)
+    rotulos = base.index.tolist()
+    trocas = {"x": valores, "y": rotulos, "marker": {**barras["marker"], "color": valores}}
+    if barras.get("text") is not None:
+        trocas["text"] = valores
+    layout = {**fig_base["layout"], "yaxis": {**fig_base["layout"]["yaxis"], "categoryarray": rotulos}}
+    return {**fig_base, "data": [{**barras, **trocas}, *fig_base["data"][1:]], "layout": layout}
+
+def _trocar_donut(fig_base: dict, porcentagem: float, filtro: str) -> dict:
+    fatia = fig_base["data"][0]
+    anotacao = {**fig_base["layout"]["annotations"][0], "text": filtro}
+    return {
+        **fig_base,
+        "data": [{**fatia, "values": [porcentagem, 100 - porcentagem]}],
+        "layout": {**fig_base["layout"], "annotations": [anotacao]},
+    }
+
+def figuras_do_relatorio(cubo, data_limite_ui=DEFAULT_DATA_LIMITE_UI, top_n: int = 40, prefixos=None):
+    """
+    Gera (Prefixo, donut, barras) – primeiro "Todos", depois cada Prefixo (todos, ou só `prefixos`).
+    As figuras são dicts: o donut e as barras são montados pelo plotly uma vez e, para cada Prefixo,
+    só os valores, os rótulos e o destaque são trocados (montar 300 figuras no plotly leva segundos).
+    """
+    totais, antes = cubo.totais_por_prefixo()
+    porc = (antes / totais * 100).fillna(0).sort_index()
+
+    base_geral = selecionar_barras(porc, top_n)[0]
+    barras_geral = barras_prefixo_base(base_geral)
+    donut_geral = donut_eps_plotly(cubo.porcentagem()[0], data_limite_ui).to_dict()
+    yield "Todos", donut_geral, barras_geral
+
+    rotulos = [_rotulo_prefixo(p) for p in porc.index]
+    if prefixos is not None:
+        pedidos = {str(p) for p in prefixos}
+        rotulos = [r for r in rotulos if r in pedidos]
+
+    for prefixo in rotulos:
+        base, alvo, extra = selecionar_barras(porc, top_n, prefixo)
+        # Prefixo fora do top: entra no lugar da menor barra (mesmo número de barras, mesmo layout)
+        barras = barras_geral if extra is None else _trocar_barras(barras_geral, base)
+        donut = _trocar_donut(donut_geral, cubo.porcentagem(prefixo)[0], prefixo)
+        yield prefixo, donut, destacar_barra(barras, alvo)
+
+# =========================
+# Renderização
+# =========================
+def _renderizar_lote(itens):
+    # Roda num processo do pool (kaleido 0.2): o processo do kaleido fica aberto entre as figuras
+    for fig, caminho, formato, escala in itens:
+        pio.write_image(fig, caminho, format=formato, scale=escala, width=LARGURA_IMAGEM)
+    return len(itens)
+
+def renderizar_imagens(figuras, caminhos, formato: str = "png", escala: float = 2, workers: int = None):
+    """Grava cada figura (dict ou go.Figure) no caminho correspondente, com um renderizador quente."""
+    if kaleido is None:
+        raise RuntimeError("O kaleido não está instalado (pip install kaleido).")
+    figuras, caminhos = list(figuras), [str(c) for c in caminhos]
+    workers = max(1, min(len(figuras), workers or RELATORIO_WORKERS))
+
+    if _kaleido_servidor():
+        try:
+            kaleido.start_sync_server(n=workers, silence_warnings=True)
+            iniciou = True
+        except RuntimeError:
+            iniciou = False  # já havia um servidor aberto: usa o mesmo
+        try:
+            pio.write_images(figuras, caminhos, format=formato, scale=escala, width=LARGURA_IMAGEM)
+        finally:
+            if iniciou:
+                kaleido.stop_sync_server(silence_warnings=True)
+        return
+
+    itens = [(f, c, formato, escala) for f, c in zip(figuras, caminhos)]
+    if workers == 1:
+        _renderizar_lote(itens)
+        return
+    lotes = [itens[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_renderizar_lote, lotes))
+
+# =========================
+# PDF
+# =========================
+class PdfImagens:
+    """
+    PDF mínimo com imagens empilhadas (uma página por lista de imagens), gravado aos poucos:
+    só a página atual fica em memória, diferente do save_all do Pillow, que segura todas.
+    """
+
+    def __init__(self, arquivo):
+        self._f = arquivo
+        self._offsets = {}
+        self._paginas = []
+        self._proximo = 3  # 1 = catálogo, 2 = árvore de páginas (gravados no fim)
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _objeto(self, corpo: bytes, fluxo: bytes = None) -> int:
+        num = self._proximo
+        self._proximo += 1
+        self._gravar(num, corpo, fluxo)
+        return num
+
+    def _gravar(self, num: int, corpo: bytes, fluxo: bytes = None):
+        self._offsets[num] = self._f.tell()
+        self._f.write(b"%d 0 obj\n" % num + corpo)
+        if fluxo is not None:
+            self._f.write(b"\nstream\n" + fluxo + b"\nendstream")
+        self._f.write(b"\nendobj\n")
+
+    def adicionar_pagina(self, imagens, escala: float = 2):
+        """`imagens`: imagens do Pillow, empilhadas de cima para baixo (o tamanho é dividido por `escala`)."""
+        largura = max(im.width for im in imagens) / escala
+        altura = sum(im.height for im in imagens) / escala
+        recursos, desenho, y = [], [], altura
+        for i, im in enumerate(imagens):
+            pixels = zlib.compress(im.convert("RGB").tobytes(), 6)
+            num = self._objeto(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>" % (im.width, im.height, len(pixels)),
+                pixels
+            )
+            w, h = im.width / escala, im.height / escala
+            y -= h
+            recursos.append(b"/Im%d %d 0 R" % (i, num))
+            desenho.append(b"q %.2f 0 0 %.2f 0 %.2f cm /Im%d Do Q" % (w, h, y, i))
+        conteudo = b"\n".join(desenho)
+        num_conteudo = self._objeto(b"<< /Length %d >>" % len(conteudo), conteudo)
+        self._paginas.append(self._objeto(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /XObject << %s >> >> "
+            b"/Contents %d 0 R >>" % (largura, altura, b" ".join(recursos), num_conteudo)
+        ))
+
+    def fechar(self):
+        kids = b" ".join(b"%d 0 R" % n for n in self._paginas)
+        self._gravar(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._paginas)))
+        self._gravar(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        inicio_xref = self._f.tell()
+        self._f.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._proximo)
+        for num in range(1, self._proximo):
+            self._f.write(b"%010d 00000 n \n" % self._offsets[num])
+        self._f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._proximo, inicio_xref))
+
+def escrever_pdf(caminho, paginas, escala: float = 2):
+    """Um PDF com uma página por item de `paginas` (lista de caminhos PNG empilhados na página)."""
+    from PIL import Image  # o Pillow já vem com o Streamlit
+
+    with open(caminho, "wb") as f:
+        pdf = PdfImagens(f)
+        for arquivos in paginas:
+            imagens = [Image.open(a) for a in arquivos]
+            try:
+                pdf.adicionar_pagina(imagens, escala)
+            finally:
+                for im in imagens:
+                    im.close()
+        pdf.fechar()
+
+# =========================
+# Relatório
+# =========================
+def gerar_relatorio(cubo, pasta, data_limite_ui=DEFAULT_DATA_LIMITE_UI, top_n: int = 40, prefixos=None,
+                    pdf: bool = True, escala: float = 2, workers: int = None) -> dict:
+    """
+    Grava em `pasta` um PNG do donut e um das barras por Prefixo (mais os gerais, "Todos")
+    e, com `pdf`, relatorio.pdf com uma página por Prefixo. Retorna um resumo com os tempos.
+    """
+    inicio = time.perf_counter()
+    os.makedirs(pasta, exist_ok=True)
+    itens = list(figuras_do_relatorio(cubo, data_limite_ui, top_n, prefixos))
+    nomes = _nomes_unicos([_sanitize_filename(f"Prefixo {p}") for p, _, _ in itens])
+
+    figuras, caminhos, paginas = [], [], []
+    for nome, (_, donut, barras) in zip(nomes, itens):
+        pagina = [os.path.join(pasta, f"{nome} - donut.png"), os.path.join(pasta, f"{nome} - barras.png")]
+        figuras += [donut, barras]
+        caminhos += pagina
+        paginas.append(pagina)
+    montagem = time.perf_counter() - inicio
+
+    renderizar_imagens(figuras, caminhos, "png", escala, workers)
+    renderizacao = time.perf_counter() - inicio - montagem
+
+    caminho_pdf = None
+    if pdf:
+        caminho_pdf = os.path.join(pasta, "relatorio.pdf")
+        escrever_pdf(caminho_pdf, paginas, escala)
+
+    return {
+        "prefixos": len(itens) - 1,
+        "imagens": len(caminhos),
+        "pdf": caminho_pdf,
+        "segundos_figuras": montagem,
+        "segundos_imagens": renderizacao,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def relatorio_zip(cubo, data_limite_ui=DEFAULT_DATA_LIMITE_UI, top_n: int = 40, pdf: bool = True,
+                  workers: int = None) -> bytes:
+    """gerar_relatorio numa pasta temporária, devolvido como ZIP (PNGs já são comprimidos: ZIP_STORED)."""
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="eps_relatorio_") as pasta:
+        gerar_relatorio(cubo, pasta, data_limite_ui, top_n, pdf=pdf, workers=workers)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+            for nome in sorted(os.listdir(pasta)):
+                zf.write(os.path.join(pasta, nome), nome)
+        return buffer.getvalue()
@@ -0,0 +1,133 @@
+"""
+Snapshots em disco dos dados já interpretados (saída de carregar_dados + preparar_df), sem Streamlit.
+
+Cada snapshot é um arquivo Arrow IPC (formato "file", sem compressão) datado, com o hash do dataset e a
+origem nos metadados do esquema. Sem compressão o arquivo abre por memory-map: abrir é só ler o esquema,
+e só as páginas das colunas pedidas (e efetivamente usadas) chegam a ser lidas do disco.
+Parquet ocuparia menos disco, mas precisa ser decodificado inteiro para a memória a cada abertura.
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from eps_calculo import DTYPE_TEXTO
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pyarrow é opcional: sem ele não há snapshots
+    pa = None
+
+PASTA_SNAPSHOTS = os.environ.get("EPS_SNAPSHOTS_DIR", "snapshots")
+EXTENSAO = ".arrow"
+_CHAVE_META = b"eps_snapshot"
+
+def snapshots_disponiveis() -> bool:
+    return pa is not None
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise RuntimeError("Snapshots precisam do pyarrow (pip install pyarrow).")
+
+def _nome_arquivo(criado: datetime, hash_dataset: str) -> str:
+    return f"eps_{criado:%Y-%m-%d_%H%M%S}_{hash_dataset[:12]}{EXTENSAO}"
+
+def _ler_metadados(caminho) -> dict:
+    with pa.memory_map(str(caminho), "r") as fonte:
+        esquema = pa_ipc.open_file(fonte).schema
+    return json.loads((esquema.metadata or {}).get(_CHAVE_META, b"{}"))
+
+def listar_snapshots(pasta=PASTA_SNAPSHOTS) -> pd.DataFrame:
+    """Snapshots da pasta, do mais novo para o mais antigo (só os esquemas são lidos)."""
+    colunas = ["caminho", "criado", "linhas", "hash", "origem"]
+    if pa is None or not os.path.isdir(pasta):
+        return pd.DataFrame(columns=colunas)
+    registros = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith(EXTENSAO):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            meta = _ler_metadados(caminho)
+        except (OSError, pa.ArrowInvalid, ValueError):
+            continue  # arquivo incompleto ou de outro programa
+        registros.append({
+            "caminho": caminho,
+            "criado": pd.Timestamp(meta.get("criado")),
+            "linhas": meta.get("linhas"),
+            "hash": meta.get("hash"),
+            "origem": ", ".join(meta.get("origem") or []),
+        })
+    tabela = pd.DataFrame(registros, columns=colunas)
+    return tabela.sort_values("criado", ascending=False, ignore_index=True)
+
+def procurar_snapshot(hash_dataset: str, pasta=PASTA_SNAPSHOTS):
+    """Caminho do snapshot mais novo com este hash, ou None."""
+    tabela = listar_snapshots(pasta)
+    achados = tabela.loc[tabela["hash"] == hash_dataset, "caminho"]
+    return achados.iloc[0] if len(achados) else None
+
+def salvar_snapshot(df: pd.DataFrame, hash_dataset: str, origem=(), pasta=PASTA_SNAPSHOTS) -> str:
+    """
+    Grava `df` (já tipado e com as datas convertidas) como snapshot e devolve o caminho.
+    Se já existe um snapshot com o mesmo hash, devolve o existente sem gravar de novo.
+    """
+    _exigir_pyarrow()
+    existente = procurar_snapshot(hash_dataset, pasta)
+    if existente is not None:
+        return existente
+
+    criado = datetime.now()
+    meta = {
+        "hash": hash_dataset,
+        "criado": criado.isoformat(timespec="seconds"),
+        "linhas": len(df),
+        "origem": list(origem),
+        "relatorio_datas": df.attrs.get("relatorio_datas"),
+    }
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        _CHAVE_META: json.dumps(meta, ensure_ascii=False, default=str).encode(),
+    })
+
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, _nome_arquivo(criado, hash_dataset))
+    temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+    # Grava com outro nome e renomeia: quem lista a pasta nunca vê um snapshot pela metade
+    with pa.OSFile(temporario, "wb") as destino, pa_ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+    return caminho
+
+def abrir_snapshot(caminho, colunas=None, linhas=None) -> pd.DataFrame:
+    """
+    Abre o snapshot por memory-map, só com as `colunas` pedidas (padrão: todas).
+    Com `linhas` (posições), converte só essas linhas e as usa como índice.
+    O texto continua apontando para o arquivo mapeado (string Arrow, sem cópia).
+    Os metadados ficam em df.attrs["snapshot"] e o relatório das datas em df.attrs["relatorio_datas"].
+    """
+    _exigir_pyarrow()
+    with pa.memory_map(str(caminho), "r") as fonte:
+        tabela = pa_ipc.open_file(fonte).read_all()
+    meta = json.loads((tabela.schema.metadata or {}).get(_CHAVE_META, b"{}"))
+    if colunas is not None:
+        tabela = tabela.select(list(colunas))
+    if linhas is not None:
+        tabela = tabela.take(pa.array(linhas, type=pa.int64()))
+
+    mapa_tipos = {pa.string(): DTYPE_TEXTO, pa.large_string(): DTYPE_TEXTO, pa.int32(): pd.Int32Dtype()}
+    df = tabela.to_pandas(types_mapper=mapa_tipos.get)
+    if linhas is not None:
+        df.index = pd.Index(linhas)
+    df.attrs.update(motor_csv="snapshot", snapshot=meta, relatorio_datas=meta.get("relatorio_datas"))
+    return df
+
+def rotulo_snapshot(registro) -> str:
+    """Texto do snapshot para a lista da sidebar: data, linhas e arquivos de origem."""
+    origem = f" · {registro['origem']}" if registro["origem"] else ""
+    linhas = f"{int(registro['linhas']):,}".replace(",", ".") if pd.notna(registro["linhas"]) else "?"
+    return f"{registro['criado']:%d/%m/%Y %H:%M} · {linhas} linhas{origem}"
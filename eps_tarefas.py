@@ -0,0 +1,122 @@
+"""
+Tarefas em segundo plano do dashboard (geração dos arquivos de download), sem Streamlit.
+
+Cada tarefa roda numa thread do pool e informa o andamento por `progresso(feitas, total, texto)`;
+o script do Streamlit só submete e consulta o estado, então a página continua respondendo enquanto
+o arquivo é gerado. Threads bastam: as partes pesadas (abas por Prefixo, imagens) já vão para
+processos próprios. O resultado fica na tarefa (nas MAX_RESULTADOS terminadas mais recentes), além do
+que quem submete fizer com ele (no dashboard, o CacheLRU compartilhado).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Tarefas gerando ao mesmo tempo (as demais esperam na fila)
+TAREFAS_WORKERS = int(os.environ.get("EPS_TAREFAS_WORKERS", "2"))
+# Tarefas terminadas guardadas para consulta (as mais antigas saem primeiro)
+MAX_TAREFAS = 200
+# Delas, quantas (as mais recentes) ainda guardam o arquivo gerado
+MAX_RESULTADOS = 20
+
+NA_FILA, GERANDO, PRONTA, ERRO = "na fila", "gerando", "pronta", "erro"
+ESTADOS = [NA_FILA, GERANDO, PRONTA, ERRO]
+
+class Tarefa:
+    """Estado de uma tarefa: um de ESTADOS, o andamento (feitas de total), os horários e o resultado."""
+
+    def __init__(self, chave, rotulo: str = ""):
+        self.chave = chave
+        self.rotulo = rotulo
+        self.estado = NA_FILA
+        self.feitas, self.total, self.texto = 0, None, ""
+        self.criada = time.monotonic()
+        self.inicio = self.fim = None
+        self.erro = None
+        self.resultado = None
+
+    def progresso(self, feitas: int, total: int = None, texto: str = ""):
+        """Chamado por quem gera o arquivo (na thread da tarefa)."""
+        self.feitas, self.total, self.texto = feitas, total, texto
+
+    @property
+    def terminada(self) -> bool:
+        return self.estado in (PRONTA, ERRO)
+
+    @property
+    def fracao(self) -> float:
+        if self.estado == PRONTA:
+            return 1.0
+        total = self.total
+        return min(1.0, self.feitas / total) if total else 0.0
+
+    @property
+    def segundos(self) -> float:
+        if self.inicio is None:
+            return 0.0
+        return (self.fim or time.monotonic()) - self.inicio
+
+class GerenciadorTarefas:
+    """
+    Fila de tarefas com um pool de threads. Uma chave só tem uma tarefa na fila ou gerando por vez:
+    pedir de novo (outra sessão, outro rerun) devolve a mesma tarefa.
+    """
+
+    def __init__(self, workers: int = TAREFAS_WORKERS, max_tarefas: int = MAX_TAREFAS,
+                 max_resultados: int = MAX_RESULTADOS):
+        self.max_tarefas = max_tarefas
+        self.max_resultados = max_resultados
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="eps-tarefa")
+        self._tarefas = OrderedDict()   # chave -> Tarefa (a mais recente por chave)
+        self._lock = threading.Lock()
+
+    def submeter(self, chave, gerar, rotulo: str = "") -> Tarefa:
+        """
+        Agenda `gerar(progresso)`, cujo retorno fica em `tarefa.resultado`.
+        Se a chave já tem tarefa na fila ou gerando, devolve essa.
+        """
+        with self._lock:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and not tarefa.terminada:
+                return tarefa
+            tarefa = Tarefa(chave, rotulo)
+            self._tarefas.pop(chave, None)
+            self._tarefas[chave] = tarefa
+            self._podar()
+        self._executor.submit(self._rodar, tarefa, gerar)
+        return tarefa
+
+    def _rodar(self, tarefa: Tarefa, gerar):
+        tarefa.estado, tarefa.inicio = GERANDO, time.monotonic()
+        try:
+            tarefa.resultado = gerar(tarefa.progresso)
+            tarefa.estado = PRONTA
+        except Exception as e:  # a falha fica na tarefa, para a página mostrar
+            tarefa.erro = str(e) or type(e).__name__
+            tarefa.estado = ERRO
+        finally:
+            tarefa.fim = time.monotonic()
+        with self._lock:
+            self._podar()
+
+    def _podar(self):
+        # Só tarefas terminadas saem; as que estão na fila ou gerando continuam visíveis
+        terminadas = [c for c, t in self._tarefas.items() if t.terminada]
+        excesso = len(self._tarefas) - self.max_tarefas
+        for chave in terminadas[:max(0, excesso)]:
+            del self._tarefas[chave]
+        # Das que ficam, só as mais recentes seguram o arquivo gerado
+        terminadas = [c for c in terminadas if c in self._tarefas]
+        for chave in terminadas[:max(0, len(terminadas) - self.max_resultados)]:
+            self._tarefas[chave].resultado = None
+
+    def obter(self, chave):
+        """Tarefa mais recente da chave, ou None."""
+        with self._lock:
+            return self._tarefas.get(chave)
+
+    def ativas(self) -> list:
+        """Tarefas na fila ou gerando, da mais antiga para a mais nova."""
+        with self._lock:
+            return [t for t in self._tarefas.values() if not t.terminada]
@@ -0,0 +1,44 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Os módulos do app ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eps_calculo import COLS, carregar_dados, preparar_df  # noqa: E402
+
+LIMITE = pd.Timestamp("2025-06-30")
+
+def csv_sintetico(n: int, seed: int = 0, prefixo_matricula: str = "F") -> bytes:
+    """CSV sem cabeçalho no formato do app, com vazios, datas inválidas e Matrículas repetidas."""
+    rng = np.random.default_rng(seed)
+    ajures = rng.choice(["AJURE SP", "AJURE RJ", "AJURE MG", ""], n, p=[0.45, 0.3, 0.2, 0.05])
+    prefixos = rng.choice(["1001", "1002", "2001", "2002", "3001", ""], n)
+    uors = rng.choice(["UOR 0", "UOR 1", "UOR 2", ""], n)
+    cargos = rng.choice(["Caixa", "Gerente Geral", "Escriturario"], n)
+    dias = rng.integers(0, 900, n)
+    datas = (pd.Timestamp("2024-01-01") + pd.to_timedelta(dias, unit="D")).strftime("%d/%m/%Y").to_numpy(dtype=object)
+    datas[rng.random(n) < 0.05] = ""
+    datas[rng.random(n) < 0.02] = "31/02/2024"
+    matriculas = np.array([f"{prefixo_matricula}{i:05d}" for i in rng.integers(0, int(n * 0.9), n)], dtype=object)
+    matriculas[rng.random(n) < 0.02] = ""
+
+    linhas = []
+    for i in range(n):
+        valores = [matriculas[i], f"Nome {i}", "Sim", datas[i], "Vencido", str(int(dias[i])), "Vermelho",
+                   cargos[i], prefixos[i], f"Agencia {prefixos[i]}", f"1{i % 50:05d}", uors[i],
+                   "9000", ajures[i]]
+        assert len(valores) == len(COLS)
+        linhas.append(",".join(valores))
+    return ("\n".join(linhas) + "\n").encode("utf-8")
+
+def ler_sintetico(n: int, seed: int = 0, prefixo_matricula: str = "F") -> pd.DataFrame:
+    return preparar_df(carregar_dados(io.BytesIO(csv_sintetico(n, seed, prefixo_matricula))))
+
+@pytest.fixture
+def dados() -> pd.DataFrame:
+    return ler_sintetico(2_000)
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from eps_calculo import CacheLRU
+
+class CacheReferencia:
+    """Modelo ingênuo do CacheLRU (sem threads): uma lista em ordem de uso e um laço de despejo."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.itens = OrderedDict()
+        self.sessoes = {}
+
+    def obter(self, chave, valor):
+        if chave in self.itens:
+            self.itens.move_to_end(chave)
+            return self.itens[chave]
+        if len(valor) <= self.max_bytes:
+            self.itens[chave] = valor
+            self._despejar()
+        return valor
+
+    def pegar(self, chave):
+        if chave not in self.itens:
+            return None
+        self.itens.move_to_end(chave)
+        return self.itens[chave]
+
+    def _despejar(self):
+        em_uso = set(self.sessoes.values())
+        for so_protegidas in (False, True):
+            for chave in list(self.itens):
+                if sum(len(v) for v in self.itens.values()) <= self.max_bytes:
+                    return
+                protegida = isinstance(chave, tuple) and chave[0] in em_uso
+                if so_protegidas or not protegida:
+                    del self.itens[chave]
+
+def test_cache_lru_confere_com_modelo():
+    rng = random.Random(0)
+    cache, modelo = CacheLRU(max_bytes=1_000), CacheReferencia(1_000)
+    chaves = [(h, i) for h in "abc" for i in range(6)] + ["solta1", "solta2"]
+    for _ in range(3_000):
+        op = rng.random()
+        if op < 0.6:
+            chave = rng.choice(chaves)
+            valor = bytes(rng.choice([10, 80, 200, 400, 1_200]))
+            assert cache.obter(chave, lambda: valor) == modelo.obter(chave, valor)
+        elif op < 0.8:
+            chave = rng.choice(chaves)
+            assert cache.pegar(chave) == modelo.pegar(chave)
+        elif op < 0.95:
+            sessao, dataset = rng.choice("xyz"), rng.choice("abc")
+            cache.usar_dataset(sessao, dataset)
+            modelo.sessoes[sessao] = dataset
+        else:
+            sessao = rng.choice("xyz")
+            cache.liberar_sessao(sessao)
+            modelo.sessoes.pop(sessao, None)
+        assert list(cache._itens) == list(modelo.itens)
+        assert cache.estatisticas()["bytes"] == sum(len(v) for v in modelo.itens.values()) <= 1_000
+
+def test_cache_lru_sessao_expirada_nao_protege():
+    cache = CacheLRU(max_bytes=100, ttl_sessao=-1)
+    cache.usar_dataset("s1", "a")
+    cache.obter(("a", 1), lambda: bytes(60))
+    cache.obter(("b", 1), lambda: bytes(60))
+    # A sessão já expirou: o item de "a" é o mais antigo e sai primeiro
+    assert not cache.contem(("a", 1)) and cache.contem(("b", 1))
+    assert cache.sessoes_usando("a") == 0
+
+def test_cache_lru_gera_uma_vez_por_chave():
+    cache = CacheLRU(max_bytes=10_000)
+    chamadas, resultados = [], []
+    comecou = threading.Event()
+
+    def gerar():
+        chamadas.append(1)
+        comecou.set()
+        time.sleep(0.2)
+        return bytes(10)
+
+    def pedir():
+        resultados.append(cache.obter("chave", gerar))
+
+    threads = [threading.Thread(target=pedir) for _ in range(8)]
+    threads[0].start()
+    comecou.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(chamadas) == 1
+    assert len(resultados) == 8 and all(r is resultados[0] for r in resultados)
+    assert cache.estatisticas()["misses"] == 1 and cache.estatisticas()["hits"] == 7
+
+def test_cache_lru_erro_na_geracao_nao_fica_guardado():
+    cache = CacheLRU(max_bytes=10_000)
+
+    def falhar():
+        raise RuntimeError("falhou")
+
+    with pytest.raises(RuntimeError):
+        cache.obter("chave", falhar)
+    assert not cache.contem("chave")
+    assert cache.obter("chave", lambda: b"ok") == b"ok"
+
+def test_cache_lru_valor_maior_que_orcamento_nao_e_guardado():
+    cache = CacheLRU(max_bytes=100)
+    cache.obter("pequeno", lambda: bytes(50))
+    assert cache.obter("grande", lambda: bytes(500)) == bytes(500)
+    assert not cache.contem("grande") and cache.contem("pequeno")
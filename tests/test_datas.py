@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from eps_calculo import converter_datas
+
+def _converter_forca_bruta(valores, formato):
+    """Cada valor convertido sozinho, no formato dado."""
+    datas, vazias, rejeitadas = [], 0, 0
+    for v in valores:
+        texto = "" if v is None else str(v).strip()
+        data = pd.to_datetime(texto, format=formato, errors="coerce") if texto else pd.NaT
+        if pd.isna(data):
+            vazias += texto == ""
+            rejeitadas += texto != ""
+        datas.append(data)
+    return datas, vazias, rejeitadas
+
+@pytest.mark.parametrize("formato, valores", [
+    ("%d/%m/%Y", ["01/02/2024", "31/12/2023", "", None, "31/02/2024", "01/02/2024", " 15/07/2025 ", "lixo"]),
+    ("%Y-%m-%d", ["2024-02-01", "2023-12-31", "2024-13-01", None, "2024-02-01", "2025-07-15"]),
+    ("%d-%m-%Y", ["01-02-2024", "31-12-2023", "", "01-02-2024"]),
+])
+@pytest.mark.parametrize("como", ["string", "category"])
+def test_converter_datas_confere_com_valor_a_valor(formato, valores, como):
+    serie = pd.Series(valores * 3, dtype=como)
+    datas, relatorio = converter_datas(serie)
+    esperadas, vazias, rejeitadas = _converter_forca_bruta(valores * 3, formato)
+
+    assert relatorio["formato"] == formato
+    pd.testing.assert_series_equal(datas, pd.Series(esperadas).astype(datas.dtype))
+    assert relatorio["vazias"] == vazias
+    assert relatorio["rejeitadas"] == rejeitadas
+    assert set(relatorio["exemplos_rejeitados"]) <= {str(v).strip() for v in valores if v is not None}
+
+def test_converter_datas_mantem_datetime():
+    serie = pd.Series(pd.to_datetime(["2024-02-01", None]))
+    datas, relatorio = converter_datas(serie)
+    assert datas is serie
+    assert relatorio["vazias"] == 1 and relatorio["rejeitadas"] == 0
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from conftest import LIMITE, ler_sintetico
+from eps_calculo import CuboEps, IndiceGrupos, aplicar_delta
+
+def _linhas(df: pd.DataFrame) -> list:
+    return [tuple(None if pd.isna(v) else v for v in linha) for linha in df.astype(object).itertuples(index=False)]
+
+def _aplicar_forca_bruta(dados: pd.DataFrame, delta: pd.DataFrame) -> list:
+    """Upsert linha a linha: a última linha de cada Matricula do delta substitui a última da base."""
+    linhas = _linhas(dados)
+    i_mat = list(dados.columns).index("Matricula")
+    posicao = {linha[i_mat]: i for i, linha in enumerate(linhas) if linha[i_mat] is not None}
+    ultima = {}
+    for linha in _linhas(delta):
+        if linha[i_mat] is not None:
+            ultima.pop(linha[i_mat], None)
+            ultima[linha[i_mat]] = linha
+    for matricula, linha in ultima.items():
+        if matricula in posicao:
+            linhas[posicao[matricula]] = linha
+        else:
+            linhas.append(linha)
+    return linhas
+
+def _delta():
+    # Matrículas de 0 a ~270 (parte já existe na base); Prefixo "4001" e Uor "UOR 9" só existem aqui
+    delta = ler_sintetico(300, seed=1)
+    novas = delta.index[::7]
+    for col, valor in (("Prefixo", "4001"), ("Uor", "UOR 9")):
+        delta[col] = delta[col].cat.add_categories([valor])
+        delta.loc[novas, col] = valor
+    return delta
+
+def test_aplicar_delta_confere_com_forca_bruta(dados):
+    delta = _delta()
+    corrigido, info = aplicar_delta(dados, delta)
+
+    assert _linhas(corrigido) == _aplicar_forca_bruta(dados, delta)
+    # As colunas category continuam category (com as categorias novas do delta acrescentadas)
+    assert [isinstance(t, pd.CategoricalDtype) for t in corrigido.dtypes] == \
+        [isinstance(t, pd.CategoricalDtype) for t in dados.dtypes]
+    assert info["atualizadas"] + info["inseridas"] == len(info["entrou"])
+    assert len(corrigido) == len(dados) + info["inseridas"]
+    assert info["sem_matricula"] == int(delta["Matricula"].isna().sum())
+
+def test_cubo_com_delta_igual_a_recalcular(dados):
+    delta = _delta()
+    corrigido, info = aplicar_delta(dados, delta)
+    incremental = CuboEps.de_dados(dados, LIMITE).com_delta(info["saiu"], info["entrou"], LIMITE)
+    do_zero = CuboEps.de_dados(corrigido, LIMITE)
+
+    assert incremental.total == do_zero.total and incremental.pendentes == do_zero.pendentes
+    for niveis in (("Prefixo",), ("Ajure", "Prefixo", "Uor"), ("Cargo",)):
+        pd.testing.assert_frame_equal(incremental.por(*niveis), do_zero.por(*niveis))
+
+def test_indice_com_delta_igual_a_recalcular(dados):
+    delta = _delta()
+    corrigido, info = aplicar_delta(dados, delta)
+    incremental = IndiceGrupos(dados).com_delta(len(corrigido), info["linhas_saiu"], info["saiu"],
+                                                info["linhas_entrou"], info["entrou"])
+    do_zero = IndiceGrupos(corrigido)
+
+    for atributo in ("por_prefixo", "por_uor"):
+        a, b = getattr(incremental, atributo), getattr(do_zero, atributo)
+        assert a.keys() == b.keys()
+        for rotulo in a:
+            np.testing.assert_array_equal(a[rotulo], b[rotulo])
+    assert incremental.uors_por_prefixo == do_zero.uors_por_prefixo
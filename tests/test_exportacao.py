@@ -0,0 +1,69 @@
+import io
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from eps_exportacao import exportar_por_prefixo, xlsx_rapido
+
+def _ler_aba(ws) -> list:
+    return [list(linha) for linha in ws.iter_rows(values_only=True)]
+
+def _esperado(df: pd.DataFrame) -> list:
+    """O que o openpyxl deve ler de volta: texto sem caracteres de controle, datas como datetime, NA vazio."""
+    linhas = [list(df.columns)]
+    for linha in df.astype(object).itertuples(index=False):
+        valores = []
+        for v in linha:
+            if v is None or (not isinstance(v, str) and pd.isna(v)):
+                valores.append(None)
+            elif isinstance(v, pd.Timestamp):
+                valores.append(v.to_pydatetime())
+            elif isinstance(v, str):
+                valores.append("".join(c for c in v if c >= " " or c in "\t\n\r"))
+            elif isinstance(v, (bool, np.bool_)):
+                valores.append(bool(v))
+            else:
+                valores.append(v)
+        linhas.append(valores)
+    return linhas
+
+def _amostra() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Matricula": pd.Series(["F001", "F002", None, "F004", "F005"], dtype="string"),
+        "Nome": pd.Series(["Ana & Bia", "<Carlos>", "Dora\x01", "  espaços  ", ""], dtype="string"),
+        "Prefixo": pd.Series(["1001", "1001", None, "2002", "2002"], dtype="category"),
+        "Data": pd.to_datetime(["2024-02-01", None, "2023-12-31 10:30", "2024-02-01", "2025-06-30"], format="ISO8601"),
+        "Dias": pd.Series([10, None, -3, 0, 2_000_000], dtype="Int32"),
+        "Fator": [0.5, np.nan, 1e-7, np.inf, 3.25],
+        "Ativo": [True, False, True, False, True],
+    })
+
+def test_xlsx_rapido_ida_e_volta_no_openpyxl():
+    df = _amostra()
+    wb = openpyxl.load_workbook(io.BytesIO(xlsx_rapido(df, "Pendentes")))
+    assert wb.sheetnames == ["Pendentes"]
+    lidas = _ler_aba(wb["Pendentes"])
+
+    esperado = _esperado(df)
+    esperado[4][5] = None   # infinito não existe no Excel: célula vazia
+    assert lidas == esperado
+    assert isinstance(lidas[1][3], datetime)
+
+def test_exportar_por_prefixo_uma_aba_por_prefixo():
+    df = _amostra()
+    conteudo, tempos = exportar_por_prefixo(df, ["Fator"], "abas")
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo))
+    assert wb.sheetnames == ["1001", "2002", "NA"]
+    assert tempos["Linhas"].tolist() == [2, 2, 1]
+
+    sem_fator = df.drop(columns="Fator")
+    for aba, posicoes in (("1001", [0, 1]), ("2002", [3, 4]), ("NA", [2])):
+        assert _ler_aba(wb[aba]) == _esperado(sem_fator.iloc[posicoes])
+
+def test_exportar_por_prefixo_zip_um_arquivo_por_prefixo():
+    conteudo, _ = exportar_por_prefixo(_amostra(), [], "zip")
+    nomes = zipfile.ZipFile(io.BytesIO(conteudo)).namelist()
+    assert nomes == ["1001 Pendentes.xlsx", "2002 Pendentes.xlsx", "NA Pendentes.xlsx"]
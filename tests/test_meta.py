@@ -0,0 +1,112 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import LIMITE
+from eps_calculo import alocar_meta_hierarquica, colunas_meta, contar_por_grupo, tabela_meta
+
+def _chave(valor):
+    # Ordem do groupby: valores em ordem alfabética, ausentes por último
+    return (1, "") if pd.isna(valor) else (0, str(valor))
+
+def _maior_resto(ideais, vagas):
+    """Piso de cada ideal + 1 para os `vagas` maiores restos (empate: o que vem antes)."""
+    base = [math.floor(x) for x in ideais]
+    ordem = sorted(range(len(ideais)), key=lambda i: (-(ideais[i] - base[i]), i))
+    for i in ordem[:vagas]:
+        base[i] += 1
+    return base
+
+@pytest.mark.parametrize("meta_pct", [0.9, 0.925])
+def test_tabela_meta_arredondado_confere_com_ceil(meta_pct):
+    rng = np.random.default_rng(1)
+    totais = pd.Series(rng.integers(1, 200, 40), index=[f"P{i:02d}" for i in range(40)])
+    antes = (totais * rng.random(40)).astype(int)
+    tabela = tabela_meta(totais, antes, meta_pct, "Arredondado")
+    meta_col, faltam_col = colunas_meta(meta_pct, "Arredondado")
+
+    pct = Fraction(str(meta_pct))
+    for prefixo in totais.index:
+        meta = math.ceil(pct * int(totais[prefixo]))
+        assert tabela.loc[prefixo, meta_col] == meta
+        assert tabela.loc[prefixo, faltam_col] == max(0, meta - int(antes[prefixo]))
+
+@pytest.mark.parametrize("meta_pct", [0.9, 0.925])
+def test_tabela_meta_compensado_confere_com_maior_resto(meta_pct):
+    rng = np.random.default_rng(2)
+    totais = pd.Series(rng.integers(1, 200, 40), index=[f"P{i:02d}" for i in range(40)])
+    antes = (totais * rng.random(40) * 0.3).astype(int)
+    tabela = tabela_meta(totais, antes, meta_pct, "Compensado (maior resto)")
+    meta_col, faltam_col = colunas_meta(meta_pct, "Compensado (maior resto)")
+
+    pct = Fraction(str(meta_pct))
+    prefixos = sorted(totais.index)
+    ideais = [max(Fraction(0), pct * int(totais[p]) - int(antes[p])) for p in prefixos]
+    vagas = max(0, round(sum(ideais)) - sum(math.floor(x) for x in ideais))
+    esperado = _maior_resto(ideais, vagas)
+
+    assert tabela.loc[prefixos, faltam_col].tolist() == esperado
+    assert (tabela[meta_col] == tabela["Pendentes"] + tabela[faltam_col]).all()
+    assert tabela[faltam_col].sum() == round(sum(ideais))
+
+def _alocar_forca_bruta(folhas: pd.DataFrame, pct_por_folha) -> dict:
+    """Mesma regra de alocar_meta_hierarquica, nó a nó em Python com frações exatas."""
+    contagens = {k: (int(t), int(p)) for k, t, p in zip(folhas.index, folhas["Total"], folhas["Pendentes"])}
+    chaves = sorted(contagens, key=lambda k: tuple(_chave(v) for v in k))
+    ideal = {k: max(Fraction(0), pct_por_folha(k) * contagens[k][0] - contagens[k][1]) for k in chaves}
+
+    alocado = {(): round(sum(ideal.values()))}
+    for nivel in range(1, len(chaves[0]) + 1):
+        filhos = {}
+        for k in chaves:
+            filhos.setdefault(k[:nivel - 1], {}).setdefault(k[:nivel], Fraction(0))
+            filhos[k[:nivel - 1]][k[:nivel]] += ideal[k]
+        novo = {}
+        for pai, valores in filhos.items():
+            nos = list(valores)
+            vagas = max(0, alocado[pai] - sum(math.floor(valores[n]) for n in nos))
+            novo.update(zip(nos, _maior_resto([valores[n] for n in nos], vagas)))
+        alocado = novo
+    return alocado
+
+def _folhas(dados):
+    folhas = contar_por_grupo(dados, LIMITE).groupby(level=["Ajure", "Prefixo", "Uor"], observed=True,
+                                                     dropna=False).sum()
+    return folhas[folhas["Total"] > 0]
+
+def test_alocar_meta_hierarquica_confere_com_forca_bruta(dados):
+    # Poucas pendências: a meta de 90% deixa bastante coisa a alocar em todos os níveis
+    dados = dados.assign(Data_Ultimo_Eps=dados["Data_Ultimo_Eps"] + pd.Timedelta(days=500))
+    alocacao = alocar_meta_hierarquica(contar_por_grupo(dados, LIMITE), 0.9)
+    esperado = _alocar_forca_bruta(_folhas(dados), lambda k: Fraction("0.9"))
+
+    obtido = {tuple(k): int(v) for k, v in alocacao["Faltam"].items()}
+    assert obtido.keys() == {k for k in esperado}
+    assert all(obtido[k] == esperado[k] for k in esperado)
+    assert (alocacao["Meta"] == alocacao["Pendentes"] + alocacao["Faltam"]).all()
+
+def test_alocar_meta_hierarquica_meta_por_ajure(dados):
+    dados = dados.assign(Data_Ultimo_Eps=dados["Data_Ultimo_Eps"] + pd.Timedelta(days=500))
+    metas = pd.Series({"AJURE SP": 0.95, "AJURE RJ": 0.8})
+    alocacao = alocar_meta_hierarquica(contar_por_grupo(dados, LIMITE), metas)
+    # Ajure sem meta própria (e a ausente) usa a meta padrão de 90%
+    esperado = _alocar_forca_bruta(
+        _folhas(dados), lambda k: Fraction(str(metas.get(k[0], 0.9))) if not pd.isna(k[0]) else Fraction("0.9")
+    )
+    obtido = {tuple(k): int(v) for k, v in alocacao["Faltam"].items()}
+    assert all(obtido[k] == esperado[k] for k in esperado)
+
+def test_alocar_meta_hierarquica_somas_batem_entre_niveis(dados):
+    dados = dados.assign(Data_Ultimo_Eps=dados["Data_Ultimo_Eps"] + pd.Timedelta(days=500))
+    alocacao = alocar_meta_hierarquica(contar_por_grupo(dados, LIMITE), 0.9)
+    folhas = _folhas(dados)
+    ideal = np.clip(0.9 * folhas["Total"] - folhas["Pendentes"], 0, None)
+
+    assert alocacao["Faltam"].sum() == round(ideal.sum())
+    por_prefixo = alocacao.groupby(level=["Ajure", "Prefixo"], observed=True, dropna=False)["Faltam"].sum()
+    ideal_prefixo = ideal.groupby(level=["Ajure", "Prefixo"], observed=True, dropna=False).sum()
+    # Cada Prefixo recebe o piso ou o teto do seu ideal
+    assert ((por_prefixo - np.floor(ideal_prefixo.round(9))).between(0, 1)).all()
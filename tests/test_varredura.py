@@ -0,0 +1,37 @@
+import io
+
+import pandas as pd
+
+from conftest import csv_sintetico
+from eps_calculo import varrer_datas_limite, varrer_em_blocos
+
+LIMITES = pd.to_datetime(["2025-06-30", "2024-03-01", "2025-01-31", "2024-03-01", "2026-12-31", "2023-01-01"])
+
+def _rotulo(valor) -> str:
+    return "NA" if pd.isna(valor) or str(valor).strip() == "" else str(valor)
+
+def _varrer_forca_bruta(dados: pd.DataFrame, grupo: str):
+    rotulos = [_rotulo(v) for v in dados[grupo]]
+    datas = dados["Data_Ultimo_Eps"].tolist()
+    linhas = sorted(set(rotulos))
+    matriz = pd.DataFrame(0, index=linhas, columns=LIMITES, dtype="int64")
+    totais = pd.Series(0, index=linhas, dtype="int64", name="Total")
+    for rotulo, data in zip(rotulos, datas):
+        totais[rotulo] += 1
+        for j, limite in enumerate(LIMITES):
+            if not pd.isna(data) and data < limite:
+                matriz.iloc[linhas.index(rotulo), j] += 1
+    return matriz, totais
+
+def test_varrer_datas_limite_confere_com_forca_bruta(dados):
+    for grupo in ("Prefixo", "Uor"):
+        matriz, totais = varrer_datas_limite(dados["Data_Ultimo_Eps"], dados[grupo], LIMITES)
+        esperada, totais_esperados = _varrer_forca_bruta(dados, grupo)
+        pd.testing.assert_frame_equal(matriz, esperada, check_names=False)
+        pd.testing.assert_series_equal(totais, totais_esperados, check_names=False)
+
+def test_varrer_em_blocos_igual_a_memoria(dados):
+    matriz, totais = varrer_datas_limite(dados["Data_Ultimo_Eps"], dados["Prefixo"], LIMITES)
+    em_blocos, totais_blocos = varrer_em_blocos(io.BytesIO(csv_sintetico(2_000)), LIMITES, linhas_por_bloco=300)
+    pd.testing.assert_frame_equal(em_blocos, matriz)
+    pd.testing.assert_series_equal(totais_blocos, totais)